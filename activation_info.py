@@ -1,37 +1,90 @@
 import datetime
 
-from helpers import is_todays_date, ModeType
+from helpers import is_todays_date, ModeType, format_mhz, mhz_to_hz, parse_utc_timestamp
 
 
 class ActivationInfo:
-    """Represents an activation listing, plus worked_day if we've moved them to the bottom list"""
-    def __init__(self, activation_type: str, spot_time: datetime, callsign: str, frequency: str,
+    """
+    Represents an activation listing, plus worked_day if we've moved them to the bottom list.
+    Spots compare and hash on identity_key(), so the same spot from two refreshes is equal.
+    """
+    __slots__ = ("activation_type", "spot_time", "callsign", "frequency_hz", "mode", "description", "worked_day")
+
+    def __init__(self, activation_type: str, spot_time: datetime, callsign: str, frequency_hz: int,
                  mode: ModeType, description: str, worked_day: str = ""):
         self.activation_type = activation_type
         self.spot_time = spot_time
         self.callsign = callsign
-        self.frequency = frequency
+        self.frequency_hz = frequency_hz
         self.mode = mode
         self.description = description
         self.worked_day = worked_day
 
     SPOT_TIMESTAMP_FORMAT = "%Y-%m-%dT%H:%M:%S"
 
+    def identity_key(self) -> tuple:
+        """Which spot this is: spot_time and worked_day aren't included, so a re-spot matches"""
+        return self.activation_type, self.callsign, self.description, self.frequency_hz, self.mode.mode_str
+
+    def with_worked_day(self, worked_day: str):
+        """A copy of this spot with a different worked_day"""
+        return ActivationInfo(self.activation_type, self.spot_time, self.callsign, self.frequency_hz, self.mode,
+                              self.description, worked_day)
+
+    def worked_key(self) -> tuple:
+        """Spots are considered worked if the call and park match"""
+        return self.callsign, self.reference()
+
+    def reference(self) -> str:
+        """The summit or park code, without the POTA location that follows it in description"""
+        return self.description.split(" ", 1)[0]
+
+    def __eq__(self, other):
+        if not isinstance(other, ActivationInfo):
+            return NotImplemented
+        return self.identity_key() == other.identity_key()
+
+    def __hash__(self):
+        return hash(self.identity_key())
+
+    def __str__(self):
+        return self.to_string()
+
+    def frequency_mhz(self) -> str:
+        return format_mhz(self.frequency_hz)
+
     def to_string(self) -> str:
         spot_time_str = self.spot_time.strftime(self.SPOT_TIMESTAMP_FORMAT)
-        return "|".join([self.activation_type, spot_time_str, self.callsign, self.frequency,
+        return "|".join([self.activation_type, spot_time_str, self.callsign, self.frequency_mhz(),
                          self.mode.mode_str, self.description, self.worked_day])
 
     @staticmethod
     def from_string(str_val: str):
         line_parts = str_val.split("|")
         spot_time_str = line_parts[1]
-        spot_timestamp = datetime.datetime.strptime(spot_time_str, ActivationInfo.SPOT_TIMESTAMP_FORMAT).replace(tzinfo=datetime.timezone.utc)
+        spot_timestamp = parse_utc_timestamp(spot_time_str)
         mode = ModeType(line_parts[4])
-        return ActivationInfo(line_parts[0], spot_timestamp, line_parts[2], line_parts[3], mode, line_parts[5], line_parts[6])
+        return ActivationInfo(line_parts[0], spot_timestamp, line_parts[2], mhz_to_hz(line_parts[3]), mode,
+                              line_parts[5], line_parts[6])
+
+    def to_dict(self) -> dict:
+        """For JSON, e.g. in the spot feed"""
+        return {"activation_type": self.activation_type,
+                "spot_time": self.spot_time.strftime(self.SPOT_TIMESTAMP_FORMAT), "callsign": self.callsign,
+                "frequency_hz": self.frequency_hz, "mode": self.mode.mode_str, "description": self.description,
+                "worked_day": self.worked_day}
+
+    @staticmethod
+    def from_dict(spot_dict: dict):
+        return ActivationInfo(spot_dict["activation_type"], parse_utc_timestamp(spot_dict["spot_time"]),
+                              spot_dict["callsign"], int(spot_dict["frequency_hz"]), ModeType(spot_dict["mode"]),
+                              spot_dict["description"], spot_dict.get("worked_day", ""))
 
     def worked_today(self) -> bool:
         return is_todays_date(self.worked_day)
 
-    def spot_age_mins(self) -> int:
-        return int((datetime.datetime.now(datetime.timezone.utc) - self.spot_time).total_seconds() / 60)
+    def spot_age_mins(self, now: datetime = None) -> int:
+        """Pass now when comparing many spots, so they're all aged against the same instant"""
+        if now is None:
+            now = datetime.datetime.now(datetime.timezone.utc)
+        return int((now - self.spot_time).total_seconds() / 60)
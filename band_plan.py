@@ -0,0 +1,37 @@
+from typing import Optional, Tuple
+
+BANDS = [
+    ("160m", 1800000, 2000000),
+    ("80m", 3500000, 4000000),
+    ("60m", 5250000, 5450000),
+    ("40m", 7000000, 7300000),
+    ("30m", 10100000, 10150000),
+    ("20m", 14000000, 14350000),
+    ("17m", 18068000, 18168000),
+    ("15m", 21000000, 21450000),
+    ("12m", 24890000, 24990000),
+    ("10m", 28000000, 29700000),
+    ("6m", 50000000, 54000000),
+    ("2m", 144000000, 148000000),
+    ("70cm", 420000000, 450000000),
+]
+"""(name, lowest Hz, highest Hz) of the amateur bands, using the widest IARU region limits"""
+
+
+BAND_NAMES = [name for name, _, _ in BANDS]
+
+
+def band_range(band_name: str) -> Tuple[int, int]:
+    """(lowest Hz, highest Hz) of a band in BANDS, raises KeyError for an unknown name"""
+    for name, low_hz, high_hz in BANDS:
+        if name == band_name:
+            return low_hz, high_hz
+    raise KeyError(band_name)
+
+
+def band_for_freq(freq_hz: int) -> Optional[str]:
+    """Name of the band containing freq_hz, or None if it's outside every band"""
+    for name, low_hz, high_hz in BANDS:
+        if low_hz <= freq_hz <= high_hz:
+            return name
+    return None
@@ -0,0 +1,145 @@
+"""
+Times each stage of the refresh pipeline on synthetic spots, without network access.
+
+Run from the repo root, for example:
+    python -m benchmarks.bench_pipeline --sizes 100 1000 10000 --output bench_output.txt
+
+Each result is one JSON object per line, with sorted keys, so runs from different commits can be diffed
+or loaded with pandas. The render stage needs a Tk display (xvfb-run works on headless machines);
+without one it is recorded as skipped and the other stages still run.
+"""
+import argparse
+import datetime
+import json
+import statistics
+import subprocess
+import sys
+import time
+
+from benchmarks.synthetic_spots import SyntheticSpots
+from data_query import spot_reducer
+from data_query.spot_store import SpotStore
+from data_query.backends.pota_lookup import PotaLookup
+from data_query.backends.sota_lookup import SotaLookup
+from helpers import ModeFilter
+
+MAX_AGE_MINS = 30
+
+
+def time_stage(func, repeat):
+    """Returns (min, median) seconds over repeat calls of func"""
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - start)
+    return min(timings), statistics.median(timings)
+
+
+def current_commit() -> str:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return ""
+
+
+def make_tk_root():
+    """A Tk root which is never shown, or None when there's no display"""
+    try:
+        import tkinter as tk
+        root = tk.Tk()
+    except Exception as e:
+        print("No Tk display, skipping render stage:", e, file=sys.stderr)
+        return None
+    root.withdraw()
+    return root
+
+
+def bench_size(size, duplicate_ratio, worked_ratio, repeat, tk_root, seed=0):
+    now = datetime.datetime.now(datetime.timezone.utc)
+    generator = SyntheticSpots(seed=seed, duplicate_ratio=duplicate_ratio, max_age_mins=MAX_AGE_MINS, now=now)
+    results = []
+
+    def record(stage, backend, timing, records_in, records_out=None):
+        results.append({"stage": stage, "backend": backend, "size": size, "duplicate_ratio": duplicate_ratio,
+                        "worked_ratio": worked_ratio, "repeat": repeat, "min_s": round(timing[0], 6),
+                        "median_s": round(timing[1], 6), "records_in": records_in, "records_out": records_out})
+
+    all_spots = []
+    for lookup, payload in ((SotaLookup(), generator.sota_payload(size)), (PotaLookup(), generator.pota_payload(size))):
+        backend = lookup.get_activation_type_name()
+        timing = time_stage(lambda: [lookup.convert_to_activation_info(record) for record in payload], repeat)
+        record("convert_to_activation_info", backend, timing, len(payload), len(payload))
+
+        spots = lookup.filter_results_by_time(payload, MAX_AGE_MINS, now)
+        timing = time_stage(lambda: lookup.filter_results_by_time(payload, MAX_AGE_MINS, now), repeat)
+        record("filter_results_by_time", backend, timing, len(payload), len(spots))
+        all_spots.extend(spots)
+
+    worked_spots = generator.worked_spots(all_spots, worked_ratio)
+    mode_filters = [mode_filter for mode_filter in ModeFilter if mode_filter != ModeFilter.FM]
+    reduced = spot_reducer.reduce_spots(all_spots, worked_spots, mode_filters, now=now)
+    timing = time_stage(lambda: spot_reducer.reduce_spots(all_spots, worked_spots, mode_filters, now=now), repeat)
+    record("reduce_spots", "all", timing, len(all_spots), len(reduced))
+
+    activation_types = ("sota", "pota")
+    store = SpotStore()
+    store.merge_all(all_spots, activation_types)
+    timing = time_stage(lambda: store.merge_all(all_spots, activation_types), repeat)
+    record("merge_spots_unchanged", "all", timing, len(all_spots), 0)
+
+    if tk_root:
+        from tkinter import ttk
+        from main import SpotTreeview
+
+        def new_view():
+            tv = ttk.Treeview(tk_root, columns=('all', 'n', 'e', 's', 'ne'), show='headings')
+            return SpotTreeview(tv)
+
+        def first_fill():
+            new_view().fill(reduced.copy(), now)
+        record("fill_treeview_initial", "all", time_stage(first_fill, repeat), len(reduced), len(reduced))
+
+        view = new_view()
+        view.fill(reduced.copy(), now)
+        record("fill_treeview_unchanged", "all", time_stage(lambda: view.fill(reduced.copy(), now), repeat),
+               len(reduced), len(reduced))
+        later = now + datetime.timedelta(minutes=1)
+        record("refresh_ages", "all", time_stage(lambda: view.refresh_ages(later), repeat),
+               len(reduced), len(reduced))
+    else:
+        results.append({"stage": "fill_treeview_initial", "size": size, "skipped": "no display"})
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[100, 1000, 10000, 100000],
+                        help="records per backend payload")
+    parser.add_argument("--duplicate-ratio", type=float, default=0.2)
+    parser.add_argument("--worked-ratio", type=float, default=0.05)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--no-render", action="store_true", help="skip the Tk stage")
+    parser.add_argument("--output", help="file to append results to, default stdout")
+    args = parser.parse_args()
+
+    tk_root = None if args.no_render else make_tk_root()
+    commit = current_commit()
+    run_at = datetime.datetime.now(datetime.timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ")
+    out = open(args.output, "a") if args.output else sys.stdout
+    try:
+        for size in args.sizes:
+            for result in bench_size(size, args.duplicate_ratio, args.worked_ratio, args.repeat, tk_root):
+                result.update({"commit": commit, "run_at": run_at, "python": sys.version.split()[0]})
+                out.write(json.dumps(result, sort_keys=True) + "\n")
+                out.flush()
+    finally:
+        if args.output:
+            out.close()
+        if tk_root:
+            tk_root.destroy()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,130 @@
+"""
+Soak test for memory growth: runs thousands of refresh cycles without network access and fails if memory keeps growing.
+
+Each cycle converts and filters a SOTA and a POTA payload, merges them into a SpotStore, reduces them and
+(with a Tk display) fills a SpotTreeview, like a refresh in the app. Payloads are synthetic, or replayed
+from a file captured with [RECORDING] record_file. For example:
+    python -m benchmarks.soak_memory --cycles 5000 --max-growth-mb 5
+    python -m benchmarks.soak_memory --recording responses.jsonl --replay-speed 600
+
+After --warmup cycles the traced memory is taken as the baseline. The result is one JSON line;
+the exit status is 1 if traced memory grew by more than --max-growth-mb, or RSS is over --max-rss-mb.
+"""
+import argparse
+import datetime
+import json
+import sys
+import tracemalloc
+
+from benchmarks.bench_pipeline import current_commit, make_tk_root
+from benchmarks.synthetic_spots import SyntheticSpots
+from data_query import spot_reducer
+from data_query.spot_store import SpotStore
+from data_query.backends.pota_lookup import PotaLookup
+from data_query.backends.sota_lookup import SotaLookup
+from helpers import ModeFilter
+from memory_watchdog import MemoryWatchdog, read_rss_bytes
+
+MAX_AGE_MINS = 30
+SEEDS = 50
+"""Synthetic payloads cycle through this many seeds, so the same activators keep coming back"""
+
+
+def synthetic_payloads(size):
+    """Yields [(lookup, act_list)] for each cycle, forever"""
+    lookups = (SotaLookup(), PotaLookup())
+    cycle = 0
+    while True:
+        generator = SyntheticSpots(seed=cycle % SEEDS, max_age_mins=MAX_AGE_MINS)
+        cycle += 1
+        yield [(lookups[0], generator.sota_payload(size)), (lookups[1], generator.pota_payload(size))]
+
+
+def recorded_payloads(path, speed, spot_limit=1000):
+    from data_query.backends.replay_lookup import ReplayLookup
+    from data_query.recording import load_recording
+    entries = load_recording(path)
+    lookups = [ReplayLookup(lookup, entries[lookup.get_activation_type_name()], speed)
+               for lookup in (SotaLookup(), PotaLookup()) if lookup.get_activation_type_name() in entries]
+    if not lookups:
+        sys.exit("No SOTA or POTA responses in " + path)
+    while True:
+        payloads = []
+        for lookup in lookups:
+            try:
+                payloads.append((lookup, lookup.query_api(spot_limit)))
+            except Exception as e:  # a recorded error response, the app keeps going too
+                print("Replayed error:", e, file=sys.stderr)
+        yield payloads
+
+
+def run_cycle(payloads, store, view, mode_filters):
+    now = datetime.datetime.now(datetime.timezone.utc)
+    spots = []
+    for lookup, act_list in payloads:
+        spots.extend(lookup.filter_results_by_time(act_list, MAX_AGE_MINS, now))
+    store.merge_all(spots, ("sota", "pota"))
+    reduced = spot_reducer.reduce_spots(store.current_spots(), [], mode_filters, now=now)
+    if view:
+        view.fill(reduced, now)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--cycles", type=int, default=3000)
+    parser.add_argument("--warmup", type=int, default=100, help="cycles before the baseline is taken")
+    parser.add_argument("--size", type=int, default=500, help="records per synthetic payload")
+    parser.add_argument("--recording", help="replay this file instead of synthetic payloads")
+    parser.add_argument("--replay-speed", type=float, default=600.0)
+    parser.add_argument("--max-growth-mb", type=float, default=5.0, help="allowed traced memory growth")
+    parser.add_argument("--max-rss-mb", type=float, help="optional RSS ceiling at the end")
+    parser.add_argument("--samples", type=int, default=10, help="watchdog samples taken over the run")
+    parser.add_argument("--no-render", action="store_true", help="skip the Tk stage")
+    args = parser.parse_args()
+
+    if args.recording:
+        payload_source = recorded_payloads(args.recording, args.replay_speed)
+    else:
+        payload_source = synthetic_payloads(args.size)
+    tk_root = None if args.no_render else make_tk_root()
+    view = None
+    if tk_root:
+        from tkinter import ttk
+        from main import SpotTreeview
+        view = SpotTreeview(ttk.Treeview(tk_root, columns=('all', 'n', 'e', 's', 'ne'), show='headings'))
+    store = SpotStore()
+    mode_filters = list(ModeFilter)
+
+    for _ in range(args.warmup):
+        run_cycle(next(payload_source), store, view, mode_filters)
+    watchdog = MemoryWatchdog()
+    tracemalloc.start()
+    baseline_bytes = tracemalloc.get_traced_memory()[0]
+    sample_every = max(1, args.cycles // args.samples)
+    warnings = []
+    for cycle in range(1, args.cycles + 1):
+        run_cycle(next(payload_source), store, view, mode_filters)
+        if cycle % sample_every == 0:
+            warnings = watchdog.sample()
+    growth_bytes = tracemalloc.get_traced_memory()[0] - baseline_bytes
+    rss_bytes = read_rss_bytes()
+    tracemalloc.stop()
+    if tk_root:
+        tk_root.destroy()
+
+    failures = []
+    if growth_bytes > args.max_growth_mb * 1e6:
+        failures.append("traced memory grew {0:.1f} MB".format(growth_bytes / 1e6))
+    if args.max_rss_mb and rss_bytes > args.max_rss_mb * 1e6:
+        failures.append("RSS is {0:.1f} MB".format(rss_bytes / 1e6))
+    result = {"commit": current_commit(), "cycles": args.cycles, "source": args.recording or "synthetic",
+              "size": args.size, "growth_mb": round(growth_bytes / 1e6, 3), "rss_mb": round(rss_bytes / 1e6, 1),
+              "growing": warnings, "failures": failures}
+    print(json.dumps(result, sort_keys=True))
+    if failures:
+        print(watchdog.report(), file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,76 @@
+"""
+Measures the import cost of starting the app, using python -X importtime.
+
+Run from the repo root:
+    python -m benchmarks.startup_importtime --runs 5 --output bench_output.txt
+
+Each run imports main in a fresh interpreter. The result line has the median total import time
+and the slowest top-level imports, in the same JSON-lines format as bench_pipeline,
+so it can be tracked across commits.
+"""
+import argparse
+import datetime
+import json
+import re
+import statistics
+import subprocess
+import sys
+
+from benchmarks.bench_pipeline import current_commit
+
+IMPORTTIME_LINE = re.compile(r"^import time:\s+(\d+)\s+\|\s+(\d+)\s+\|(\s*)(\S+)")
+
+
+def measure_once(module: str):
+    """
+    Returns (total, {name: cumulative microseconds}) where total is the cumulative import time of module,
+    and the dict has each import that module triggers directly
+    """
+    completed = subprocess.run([sys.executable, "-X", "importtime", "-c", "import " + module],
+                               capture_output=True, text=True)
+    if completed.returncode != 0:
+        raise RuntimeError("import failed:\n" + completed.stderr[-2000:])
+    total = 0
+    cumulative = {}
+    for line in completed.stderr.splitlines():
+        match = IMPORTTIME_LINE.match(line)
+        if not match:
+            continue
+        # -X importtime indents by two spaces per level of nesting
+        depth = (len(match.group(3)) - 1) // 2
+        if depth == 0 and match.group(4) == module:
+            total = int(match.group(2))
+        elif depth == 1:
+            cumulative[match.group(4)] = int(match.group(2))
+    return total, cumulative
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--module", default="main")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--top", type=int, default=10, help="how many of the slowest imports to list")
+    parser.add_argument("--output", help="file to append results to, default stdout")
+    args = parser.parse_args()
+
+    runs = [measure_once(args.module) for _ in range(args.runs)]
+    totals = [total for total, _ in runs]
+    medians = {name: statistics.median(run.get(name, 0) for _, run in runs) for name in runs[0][1]}
+    slowest = sorted(medians.items(), key=lambda item: item[1], reverse=True)[:args.top]
+    result = {
+        "stage": "startup_imports", "module": args.module, "runs": args.runs,
+        "median_total_us": statistics.median(totals), "min_total_us": min(totals),
+        "slowest_us": dict(slowest),
+        "commit": current_commit(), "python": sys.version.split()[0],
+        "run_at": datetime.datetime.now(datetime.timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ"),
+    }
+    line = json.dumps(result, sort_keys=True) + "\n"
+    if args.output:
+        with open(args.output, "a") as out:
+            out.write(line)
+    else:
+        sys.stdout.write(line)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,70 @@
+import datetime
+import random
+from typing import List
+
+from activation_info import ActivationInfo
+from helpers import format_mhz, get_yyyymmdd_now
+
+MODES = ["CW", "SSB", "FT8", "FM", "AM", "FT4", "DV"]
+BAND_CENTRES_KHZ = [3560, 7030, 10116, 14060, 18086, 21060, 24906, 28060, 50096, 144050]
+
+
+class SyntheticSpots:
+    """
+    Generates raw SOTA and POTA API payloads for benchmarking, matching the fields the lookups read.
+    duplicate_ratio is the fraction of records that re-use an earlier callsign,
+    and ages are spread evenly over max_age_mins (a few are older, to exercise the time filter).
+    """
+    def __init__(self, seed=0, duplicate_ratio=0.2, max_age_mins=60, now=None):
+        self.rng = random.Random(seed)
+        self.duplicate_ratio = duplicate_ratio
+        self.max_age_mins = max_age_mins
+        self.now = now or datetime.datetime.now(datetime.timezone.utc)
+        self.callsigns = []
+
+    def next_callsign(self) -> str:
+        if self.callsigns and self.rng.random() < self.duplicate_ratio:
+            return self.rng.choice(self.callsigns)
+        callsign = "K{0}{1}".format(len(self.callsigns), "".join(self.rng.choice("ABCDEFGHIJ") for _ in range(3)))
+        self.callsigns.append(callsign)
+        return callsign
+
+    def next_spot_time(self) -> datetime.datetime:
+        age_secs = self.rng.uniform(0, self.max_age_mins * 60 * 1.2)
+        return self.now - datetime.timedelta(seconds=age_secs)
+
+    def next_frequency_hz(self) -> int:
+        return (self.rng.choice(BAND_CENTRES_KHZ) + self.rng.randint(0, 60)) * 1000 + self.rng.choice([0, 500])
+
+    def sota_payload(self, count: int) -> List[dict]:
+        payload = []
+        for i in range(count):
+            payload.append({
+                "timeStamp": self.next_spot_time().strftime("%Y-%m-%dT%H:%M:%S.%f")[:22],
+                "activatorCallsign": self.next_callsign().lower(),
+                "frequency": format_mhz(self.next_frequency_hz()),
+                "mode": self.rng.choice(MODES).lower(),
+                "associationCode": "W7W",
+                "summitCode": "LC-{0:03d}".format(i % 1000),
+            })
+        return payload
+
+    def pota_payload(self, count: int) -> List[dict]:
+        payload = []
+        for i in range(count):
+            payload.append({
+                "spotTime": self.next_spot_time().strftime("%Y-%m-%dT%H:%M:%S"),
+                "activator": self.next_callsign(),
+                "frequency": str(self.next_frequency_hz() / 1000),
+                "mode": self.rng.choice(MODES),
+                "reference": "K-{0:04d}".format(i % 10000),
+                "locationDesc": "US-WA",
+            })
+        return payload
+
+    def worked_spots(self, spots: List[ActivationInfo], worked_ratio: float) -> List[ActivationInfo]:
+        """Copies of a random worked_ratio share of spots, marked as worked today"""
+        today = get_yyyymmdd_now()
+        chosen = self.rng.sample(spots, int(len(spots) * worked_ratio))
+        return [ActivationInfo(spot.activation_type, spot.spot_time, spot.callsign, spot.frequency_hz,
+                               spot.mode, spot.description, today) for spot in chosen]
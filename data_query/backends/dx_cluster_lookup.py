@@ -0,0 +1,276 @@
+"""
+Spots from a DX cluster node, pushed over a telnet connection as they're posted instead of polled.
+
+Only spots with a SOTA summit or POTA park reference in the comment are kept, e.g.
+    DX de W1AW:      14062.0  K7ABC        SOTA W7W/LC-001 CW                 1905Z
+"""
+import datetime
+import logging
+import random
+import re
+import socket
+import threading
+from collections import deque
+from typing import List, Optional
+
+import activation_info
+from activation_info import ActivationInfo
+from data_query.backends.generic_lookup import GenericLookup, QueryError
+from helpers import DATA_MODES, ModeFilter, ModeType, khz_to_hz, parse_utc_timestamp
+from metrics import METRICS
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_PORT = 7300
+
+MAX_BUFFERED_SPOTS = 500
+"""Oldest spots are dropped past this; the time filter drops them long before on any normal cluster"""
+
+CONNECT_TIMEOUT_SECS = 10
+READ_TIMEOUT_SECS = 60
+"""recv() wakes up this often on a quiet connection, to notice stop()"""
+
+FIRST_RETRY_SECS = 2.0
+MAX_RETRY_SECS = 120.0
+
+SPOT_LINE = re.compile(r"^DX de (?P<spotter>[\w/#-]+):?\s+(?P<frequency>\d+(?:\.\d+)?)\s+(?P<callsign>[\w/]+)"
+                       r"\s*(?P<comment>.*?)\s*(?P<time>\d{4})Z")
+SOTA_REFERENCE = re.compile(r"\b[A-Z0-9]{1,4}/[A-Z]{2}-\d{3}\b")
+POTA_REFERENCE = re.compile(r"\b[A-Z0-9]{1,3}-\d{4,5}\b")
+
+SPOT_MODES = {mode.upper(): mode for mode in DATA_MODES}
+SPOT_MODES.update({mode_filter.value.upper(): mode_filter.value for mode_filter in ModeFilter
+                   if mode_filter != ModeFilter.OTHER and mode_filter != ModeFilter.DATA})
+SPOT_MODES.update({"USB": "SSB", "LSB": "SSB"})
+"""Words in a spot comment which give its mode"""
+
+IAC, SB, SE = 255, 250, 240
+OPTION_COMMANDS = (251, 252, 253, 254)  # WILL, WONT, DO, DONT
+
+
+class TelnetLineParser:
+    """
+    Splits received bytes into lines, dropping telnet negotiation.
+    Anything after the last newline is kept for the next feed(), and is in partial (e.g. a login prompt).
+    """
+    def __init__(self):
+        self.raw = b""
+        self.partial = ""
+
+    def feed(self, data: bytes) -> List[str]:
+        self.raw += data
+        if IAC in self.raw:
+            text = self.strip_negotiation()
+        else:
+            text, self.raw = self.raw, b""
+        lines = (self.partial + text.decode("latin-1")).split("\n")
+        self.partial = lines.pop()
+        return [line.rstrip("\r") for line in lines]
+
+    def strip_negotiation(self) -> bytes:
+        """Removes complete IAC sequences from raw, leaving an incomplete one at the end for later"""
+        raw = self.raw
+        text = bytearray()
+        i = 0
+        while i < len(raw):
+            if raw[i] != IAC:
+                text.append(raw[i])
+                i += 1
+                continue
+            if i + 1 >= len(raw):
+                break
+            command = raw[i + 1]
+            if command == IAC:  # escaped 255
+                text.append(IAC)
+                i += 2
+            elif command in OPTION_COMMANDS:
+                if i + 2 >= len(raw):
+                    break
+                i += 3
+            elif command == SB:
+                end = raw.find(bytes((IAC, SE)), i + 2)
+                if end < 0:
+                    break
+                i = end + 2
+            else:
+                i += 2
+        self.raw = raw[i:]
+        return bytes(text)
+
+
+def parse_spot_line(line: str, received: datetime.datetime) -> Optional[dict]:
+    """
+    A record for a SOTA or POTA spot line, or None for anything else.
+    spotTime is when it was received: the line's own time is only to the minute.
+    """
+    match = SPOT_LINE.match(line)
+    if not match:
+        return None
+    comment = match.group("comment").upper()
+    reference = SOTA_REFERENCE.search(comment) or POTA_REFERENCE.search(comment)
+    if not reference:
+        return None
+    mode = next((SPOT_MODES[word] for word in comment.split() if word in SPOT_MODES), "")
+    return {"spotTime": received.strftime(ActivationInfo.SPOT_TIMESTAMP_FORMAT), "activator": match.group("callsign"),
+            "frequency": match.group("frequency"), "mode": mode, "reference": reference.group(),
+            "spotter": match.group("spotter"), "comment": match.group("comment")}
+
+
+class DxClusterLookup(GenericLookup):
+    """
+    Holds a connection to a DX cluster node on a background thread, reconnecting with backoff.
+    query_api() returns the spots buffered so far, so it never waits on the network after the first connection attempt.
+    on_spot(name) is called on the connection thread for each new spot, to start a refresh straight away.
+    """
+    query_timeout = 5
+    SPOT_TIME_FIELD = "spotTime"
+
+    def __init__(self, host: str, port: int = DEFAULT_PORT, callsign: str = "", on_spot=None):
+        super().__init__()
+        self.host = host
+        self.port = port
+        self.callsign = callsign.upper()
+        self.on_spot = on_spot
+        self.spots = deque(maxlen=MAX_BUFFERED_SPOTS)
+        self.lock = threading.Lock()
+        self.connected = threading.Event()
+        self.first_attempt_done = threading.Event()
+        self.stop_event = threading.Event()
+        self.sock = None
+        self.lines_received = 0
+        self.thread = None
+
+    def get_activation_type_name(self):
+        return "cluster"
+
+    def get_lookup_url(self, spot_limit: int):
+        return "telnet://{0}:{1}".format(self.host, self.port)
+
+    def start(self):
+        self.thread = threading.Thread(target=self.run, name="dx-cluster", daemon=True)
+        self.thread.start()
+
+    def query_api(self, spot_limit):
+        """
+        The buffered spots, waiting up to query_timeout for the first connection attempt.
+        Raises straight away while disconnected, so the last spots returned are served and marked stale.
+        """
+        if not self.thread:
+            self.start()
+        self.first_attempt_done.wait(self.query_timeout)
+        if not self.connected.is_set():
+            raise QueryError(self.__class__.__name__)
+        with self.lock:
+            return list(self.spots)
+
+    def run(self):
+        retry_secs = FIRST_RETRY_SECS
+        while not self.stop_event.is_set():
+            self.lines_received = 0
+            try:
+                self.sock = socket.create_connection((self.host, self.port), timeout=CONNECT_TIMEOUT_SECS)
+                self.sock.settimeout(READ_TIMEOUT_SECS)
+                self.sock.setsockopt(socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1)
+                logger.info("Connected to DX cluster %s:%s", self.host, self.port)
+                METRICS.inc("cluster_connects_total")
+                self.connected.set()
+                self.first_attempt_done.set()
+                self.read_spots()
+            except OSError as e:
+                if self.stop_event.is_set():
+                    break
+                logger.warning("DX cluster %s:%s: %s", self.host, self.port, e)
+                if self.lines_received:
+                    retry_secs = FIRST_RETRY_SECS  # it was working, so this is a new outage
+            finally:
+                self.connected.clear()
+                self.first_attempt_done.set()
+                if self.sock:
+                    self.sock.close()
+                    self.sock = None
+            # jitter so a restarted node isn't hit by every client at once
+            delay = random.uniform(retry_secs / 2, retry_secs)
+            logger.info("Reconnecting to DX cluster in %.1f secs", delay)
+            if self.stop_event.wait(delay):
+                break
+            retry_secs = min(MAX_RETRY_SECS, retry_secs * 2)
+
+    def read_spots(self):
+        """Reads until the connection closes or stop() is called"""
+        parser = TelnetLineParser()
+        logged_in = False
+        while not self.stop_event.is_set():
+            try:
+                data = self.sock.recv(4096)
+            except socket.timeout:
+                continue
+            if not data:
+                raise ConnectionError("Connection closed by the cluster")
+            lines = parser.feed(data)
+            self.lines_received += len(lines)
+            if not logged_in and self.is_login_prompt(parser.partial):
+                self.sock.sendall(self.callsign.encode("ascii") + b"\r\n")
+                logged_in = True
+            received = datetime.datetime.now(datetime.timezone.utc)
+            for line in lines:
+                self.handle_line(line, received)
+
+    @staticmethod
+    def is_login_prompt(text: str) -> bool:
+        text = text.strip().lower()
+        return text.endswith(":") and ("login" in text or "call" in text)
+
+    def handle_line(self, line: str, received: datetime.datetime):
+        METRICS.inc("cluster_lines_total")
+        record = parse_spot_line(line, received)
+        if not record:
+            return
+        logger.debug("Cluster spot: %s", line)
+        METRICS.inc("cluster_spots_total")
+        with self.lock:
+            self.spots.append(record)
+        if self.on_spot:
+            self.on_spot(self.get_activation_type_name())
+
+    def get_spot_time(self, activator_json_obj) -> datetime.datetime:
+        return parse_utc_timestamp(activator_json_obj[self.SPOT_TIME_FIELD])
+
+    def convert_to_activation_info(self, activator_json_obj, spot_time: datetime.datetime = None) -> ActivationInfo:
+        spot_timestamp = spot_time or self.get_spot_time(activator_json_obj)
+        reference = activator_json_obj["reference"]
+        activation_type = "sota" if SOTA_REFERENCE.match(reference) else "pota"
+        return activation_info.ActivationInfo(activation_type, spot_timestamp,
+                                              activator_json_obj["activator"].upper(),
+                                              khz_to_hz(activator_json_obj["frequency"]),
+                                              ModeType(activator_json_obj["mode"]), reference)
+
+    def close(self, timeout: float = 2):
+        """Doesn't wait more than timeout for the connection thread, which could be stuck connecting"""
+        self.stop_event.set()
+        sock = self.sock
+        if sock:
+            try:
+                sock.shutdown(socket.SHUT_RDWR)  # wakes up recv()
+            except OSError:
+                pass
+        if self.thread:
+            self.thread.join(timeout)
+            if self.thread.is_alive():
+                logger.warning("DX cluster thread still running after %s secs, leaving it", timeout)
+
+
+if __name__ == '__main__':
+    import argparse
+    parser = argparse.ArgumentParser(description="Prints SOTA/POTA spots from a DX cluster as they arrive")
+    parser.add_argument("host")
+    parser.add_argument("callsign")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+    cluster_lookup = DxClusterLookup(args.host, args.port, args.callsign,
+                                     on_spot=lambda name: print(cluster_lookup.spots[-1]))
+    cluster_lookup.start()
+    try:
+        cluster_lookup.thread.join()
+    except KeyboardInterrupt:
+        cluster_lookup.close()
@@ -0,0 +1,102 @@
+import datetime
+import logging
+import random
+import threading
+
+from activation_info import ActivationInfo
+from data_query.backends.generic_lookup import GenericLookup
+from helpers import parse_utc_timestamp
+
+logger = logging.getLogger(__name__)
+
+FIRST_RETRY_SECS = 2.0
+MAX_RETRY_SECS = 60.0
+
+EVENTS_READ_TIMEOUT_SECS = 45
+"""Longer than the server's keepalive, so only a dead stream times out"""
+
+
+class FeedLookup(GenericLookup):
+    """
+    Spots from a spot_feed_server shared by other operators, instead of from the public APIs.
+    /spots is polled like any other backend, with conditional requests so an unchanged list is a 304.
+    With on_spot, the /events stream is also followed on a background thread,
+    and on_spot(name) is called for each change, and each time it (re)connects, so spots are fetched straight away.
+    """
+    SPOT_TIME_FIELD = "spot_time"
+
+    def __init__(self, base_url: str, on_spot=None):
+        super().__init__(base_url)
+        self.on_spot = on_spot
+        self.stop_event = threading.Event()
+        self.events_response = None
+        self.thread = None
+
+    def get_activation_type_name(self):
+        return "feed"
+
+    def get_lookup_url(self, spot_limit: int):
+        return self.base_url + "/spots"
+
+    def query_api(self, spot_limit):
+        if self.on_spot and not self.thread:
+            self.thread = threading.Thread(target=self.follow_events, name="spot-feed-events", daemon=True)
+            self.thread.start()
+        return super().query_api(spot_limit)
+
+    def follow_events(self):
+        import requests
+        retry_secs = FIRST_RETRY_SECS
+        # a session of its own, as the stream holds its connection open
+        with requests.Session() as session:
+            while not self.stop_event.is_set():
+                try:
+                    with session.get(self.base_url + "/events", stream=True,
+                                     timeout=(self.query_timeout, EVENTS_READ_TIMEOUT_SECS)) as response:
+                        response.raise_for_status()
+                        self.events_response = response
+                        logger.info("Following spot feed events from %s", self.base_url)
+                        retry_secs = FIRST_RETRY_SECS
+                        # changes while the stream was down weren't sent, so fetch /spots now rather than when due
+                        self.on_spot(self.get_activation_type_name())
+                        self.read_events(response)
+                except (requests.exceptions.RequestException, AttributeError, ValueError) as e:
+                    # closing the response from close() can surface as any of these
+                    if self.stop_event.is_set():
+                        return
+                    logger.warning("Spot feed events from %s: %s", self.base_url, e)
+                finally:
+                    self.events_response = None
+                delay = random.uniform(retry_secs / 2, retry_secs)
+                if self.stop_event.wait(delay):
+                    return
+                retry_secs = min(MAX_RETRY_SECS, retry_secs * 2)
+
+    def read_events(self, response):
+        has_data = False
+        partial = b""
+        # chunk_size=None hands over data as it arrives; iter_lines() would wait to fill its buffer
+        for chunk in response.iter_content(chunk_size=None):
+            if self.stop_event.is_set():
+                return
+            lines = (partial + chunk).split(b"\n")
+            partial = lines.pop()
+            for line in lines:
+                if line.startswith(b"data:"):
+                    has_data = True
+                elif not line.strip() and has_data:  # a blank line ends an event
+                    has_data = False
+                    self.on_spot(self.get_activation_type_name())
+
+    def get_spot_time(self, activator_json_obj) -> datetime.datetime:
+        return parse_utc_timestamp(activator_json_obj[self.SPOT_TIME_FIELD])
+
+    def convert_to_activation_info(self, activator_json_obj, spot_time: datetime.datetime = None) -> ActivationInfo:
+        return ActivationInfo.from_dict(activator_json_obj)
+
+    def close(self):
+        self.stop_event.set()
+        response = self.events_response
+        if response:
+            response.close()
+        super().close()
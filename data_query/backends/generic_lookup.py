@@ -1,31 +1,98 @@
 import abc
+import datetime
+import logging
+import time
 from typing import List
 
-import requests
-
 from activation_info import ActivationInfo
+from log_config import TRACE
+from metrics import BYTES_BUCKETS, METRICS
+
+logger = logging.getLogger(__name__)
 
 
 class GenericLookup:
+    query_timeout = 15
+    """Seconds allowed for this backend to respond before DataFetcher gives up on it"""
+
+    DEFAULT_BASE_URL = ""
+    SPOT_TIME_FIELD = ""
+    """Name of the timestamp field in each JSON record, used when replaying recordings"""
+
+    def __init__(self, base_url: str = None):
+        """base_url replaces DEFAULT_BASE_URL, e.g. to point at data_query.fake_api_server"""
+        self.base_url = (base_url or self.DEFAULT_BASE_URL).rstrip("/")
+        self.recorder = None  # set to a recording.ResponseRecorder to capture raw responses
+        self.session = None
+        self.cached_url = None
+        self.cached_validators = {}
+        self.cached_act_list = None
+
     @abc.abstractmethod
     def get_activation_type_name(self):
         raise NotImplementedError("abstract")
 
+    def get_session(self):
+        """Persistent session so polls reuse the same keep-alive connection"""
+        if not self.session:
+            # imported here so the HTTP stack only loads when the first fetch starts
+            import requests
+            from requests.adapters import HTTPAdapter
+
+            self.session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=1, pool_maxsize=2)
+            self.session.mount("https://", adapter)
+            self.session.mount("http://", adapter)
+            self.session.headers.update({"Accept-Encoding": "gzip, deflate"})
+        return self.session
+
+    def get_conditional_headers(self, url):
+        """If-None-Match/If-Modified-Since from the last response, if it was for the same url"""
+        if url != self.cached_url:
+            return {}
+        headers = {}
+        if "ETag" in self.cached_validators:
+            headers["If-None-Match"] = self.cached_validators["ETag"]
+        if "Last-Modified" in self.cached_validators:
+            headers["If-Modified-Since"] = self.cached_validators["Last-Modified"]
+        return headers
+
     def query_api(self, spot_limit):
         if spot_limit < 1 or spot_limit > 100:
-            print("Defaulting spot_limit to 100")
+            logger.warning("Defaulting spot_limit to 100")
             spot_limit = 100
         url = self.get_lookup_url(spot_limit)
-        print("url", url)
+        logger.debug("url %s", url)
+        import requests
+        labels = {"backend": self.get_activation_type_name()}
         try:
-            r = requests.get(url)
+            # includes DNS, connecting and downloading the body
+            with METRICS.timer("lookup_request_seconds", labels):
+                r = self.get_session().get(url, headers=self.get_conditional_headers(url),
+                                           timeout=self.query_timeout)
         except requests.exceptions.RequestException as re:
-            print("Problem hitting", url, re)
+            logger.warning("Problem hitting %s %s", url, re)
+            METRICS.inc("lookup_responses_total", labels=dict(labels, status="exception"))
             raise QueryError(self.__class__.__name__)
-        act_list = r.json()
+        METRICS.inc("lookup_responses_total", labels=dict(labels, status=r.status_code))
+        METRICS.observe("lookup_response_bytes", len(r.content), labels, BYTES_BUCKETS)
+        if self.recorder:
+            self.recorder.record(self.get_activation_type_name(), url, r.status_code, r.headers, r.text)
+        if r.status_code == 304 and self.cached_act_list is not None:
+            logger.debug("Not modified since last query %s", url)
+            return self.cached_act_list
         if r.status_code != 200:
-            print("Problem hitting", url, r.status_code)
+            logger.warning("Problem hitting %s %s", url, r.status_code)
+            raise QueryError(self.__class__.__name__)
+        try:
+            with METRICS.timer("lookup_decode_seconds", labels):
+                act_list = r.json()
+        except ValueError as ve:
+            logger.warning("Invalid JSON from %s %s", url, ve)
             raise QueryError(self.__class__.__name__)
+        self.cached_url = url
+        self.cached_validators = {key: r.headers[key] for key in ("ETag", "Last-Modified") if key in r.headers}
+        self.cached_act_list = act_list
         return act_list
 
     @abc.abstractmethod
@@ -33,22 +100,45 @@ class GenericLookup:
         raise NotImplementedError("abstract")
 
     @abc.abstractmethod
-    def convert_to_activation_info(self, activator_json_obj) -> ActivationInfo:
+    def get_spot_time(self, activator_json_obj) -> datetime.datetime:
+        """Parses just the spot timestamp, so old spots can be skipped before the rest is converted"""
         raise NotImplementedError("abstract")
 
-    def filter_results_by_time(self, act_list, time_limit) -> List[ActivationInfo]:
-        print(act_list)
+    @abc.abstractmethod
+    def convert_to_activation_info(self, activator_json_obj, spot_time: datetime.datetime = None) -> ActivationInfo:
+        """spot_time can be passed in if get_spot_time() was already called"""
+        raise NotImplementedError("abstract")
+
+    def filter_results_by_time(self, act_list, time_limit, now: datetime.datetime = None) -> List[ActivationInfo]:
+        logger.log(TRACE, "%s payload: %s", self.get_activation_type_name(), act_list)
+        if now is None:
+            now = datetime.datetime.now(datetime.timezone.utc)
+        # spot_age_mins() rounds down, so a spot is too old once it's a whole minute past time_limit
+        cutoff = now - datetime.timedelta(minutes=time_limit + 1) if time_limit else None
+        start = time.perf_counter()
         filtered_results = []
         for activator in act_list:
-            activation_info = self.convert_to_activation_info(activator)
-            print(activation_info.to_string())
-            if time_limit and activation_info.spot_age_mins() > time_limit:
-                print("too old, age is:", activation_info.spot_age_mins())
+            try:
+                spot_time = self.get_spot_time(activator)
+                if cutoff and spot_time <= cutoff:
+                    continue
+                activation_info = self.convert_to_activation_info(activator, spot_time)
+            except (KeyError, ValueError, AttributeError) as e:
+                logger.debug("Skipping invalid spot %s %s", activator, e)
                 continue
-            print("match is within time limit")
+            logger.debug("match is within time limit %s", activation_info)
             filtered_results.append(activation_info)
+        labels = {"backend": self.get_activation_type_name()}
+        METRICS.observe("filter_seconds", time.perf_counter() - start, labels)
+        METRICS.inc("records_in_total", len(act_list), labels)
+        METRICS.inc("records_kept_total", len(filtered_results), labels)
         return filtered_results
 
+    def close(self):
+        if self.session:
+            self.session.close()
+            self.session = None
+
 
 class QueryError(Exception):
     pass
@@ -3,29 +3,35 @@ import datetime
 import activation_info
 from activation_info import ActivationInfo
 from data_query.backends.generic_lookup import GenericLookup
-from helpers import ModeType
+from helpers import ModeType, khz_to_hz, parse_utc_timestamp
 
 
 class PotaLookup(GenericLookup):
+    DEFAULT_BASE_URL = 'https://api.pota.app'
+    SPOT_TIME_FIELD = "spotTime"
+
     def get_activation_type_name(self):
         return "pota"
 
     def get_lookup_url(self, spot_limit=0):
         """spot_limit is ignored"""
-        return 'https://api.pota.app/spot/activator'
+        return f'{self.base_url}/spot/activator'
 
     @staticmethod
-    def format_freq(frequency):
-        return str(float(frequency) * 1000 / 1000000)  # for floating point
+    def format_freq(frequency) -> int:
+        """POTA frequencies are in kHz"""
+        return khz_to_hz(frequency)
 
     @staticmethod
     def str_to_timestamp(time_str):
         """POTA format: 2021-02-04T18:57:03"""
-        return datetime.datetime.strptime(time_str, "%Y-%m-%dT%H:%M:%S").replace(tzinfo=datetime.timezone.utc)
+        return parse_utc_timestamp(time_str)
+
+    def get_spot_time(self, activator_json_obj) -> datetime:
+        return PotaLookup.str_to_timestamp(activator_json_obj[self.SPOT_TIME_FIELD].strip())
 
-    def convert_to_activation_info(self, activator_json_obj) -> ActivationInfo:
-        spot_time_str = activator_json_obj["spotTime"].strip()
-        spot_timestamp = PotaLookup.str_to_timestamp(spot_time_str)
+    def convert_to_activation_info(self, activator_json_obj, spot_time: datetime = None) -> ActivationInfo:
+        spot_timestamp = spot_time or self.get_spot_time(activator_json_obj)
         callsign = activator_json_obj["activator"].strip().upper()
         frequency = PotaLookup.format_freq(activator_json_obj["frequency"].strip())
         mode_str = activator_json_obj["mode"].strip().upper()
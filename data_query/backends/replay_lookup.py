@@ -0,0 +1,50 @@
+import datetime
+import json
+import logging
+
+from activation_info import ActivationInfo
+from data_query.backends.generic_lookup import GenericLookup, QueryError
+from data_query.recording import RecordingTimeline, shift_spot_times
+
+logger = logging.getLogger(__name__)
+
+
+class ReplayLookup(GenericLookup):
+    """
+    Serves responses captured by recording.ResponseRecorder instead of hitting the network.
+    Parsing is delegated to the lookup that made the recording, e.g. ReplayLookup(SotaLookup(), entries).
+    Spot times are moved forward so each spot has the age it had when it was recorded.
+    """
+    def __init__(self, wrapped: GenericLookup, entries, speed: float = 1.0):
+        super().__init__()
+        self.wrapped = wrapped
+        self.timeline = RecordingTimeline(entries, speed)
+        self.last_entry = None
+        self.last_act_list = None
+
+    def get_activation_type_name(self):
+        return self.wrapped.get_activation_type_name()
+
+    def get_lookup_url(self, spot_limit: int):
+        return self.wrapped.get_lookup_url(spot_limit)
+
+    def query_api(self, spot_limit):
+        entry = self.timeline.current()
+        logger.debug("Replaying %s response from %s", self.get_activation_type_name(), entry["t"])
+        if entry["status"] == 304 and self.last_act_list is not None:
+            return self.last_act_list
+        if entry["status"] != 200:
+            raise QueryError(self.wrapped.__class__.__name__)
+        if entry is not self.last_entry:
+            try:
+                self.last_act_list = json.loads(entry["body"])
+            except ValueError:
+                raise QueryError(self.wrapped.__class__.__name__)
+            self.last_entry = entry
+        return shift_spot_times(self.last_act_list, self.wrapped.SPOT_TIME_FIELD, self.timeline.time_shift(entry))
+
+    def get_spot_time(self, activator_json_obj) -> datetime.datetime:
+        return self.wrapped.get_spot_time(activator_json_obj)
+
+    def convert_to_activation_info(self, activator_json_obj, spot_time: datetime.datetime = None) -> ActivationInfo:
+        return self.wrapped.convert_to_activation_info(activator_json_obj, spot_time)
@@ -3,15 +3,18 @@ import datetime
 import activation_info
 from activation_info import ActivationInfo
 from data_query.backends.generic_lookup import GenericLookup
-from helpers import ModeType
+from helpers import ModeType, mhz_to_hz, parse_utc_timestamp
 
 
 class SotaLookup(GenericLookup):
+    DEFAULT_BASE_URL = 'https://api2.sota.org.uk'
+    SPOT_TIME_FIELD = "timeStamp"
+
     def get_activation_type_name(self):
         return "sota"
 
     def get_lookup_url(self, spot_limit: int) -> str:
-        return f'https://api2.sota.org.uk/api/spots/{spot_limit}/all'
+        return f'{self.base_url}/api/spots/{spot_limit}/all'
 
     @staticmethod
     def str_to_timestamp(time_str: str) -> datetime:
@@ -19,14 +22,15 @@ class SotaLookup(GenericLookup):
         SOTA format: 2021-02-04T19:03:49.83
         or           2022-12-03T00:51:00
         """
-        time_str = time_str.split('.')[0]  # sometimes microseconds are present
-        return datetime.datetime.strptime(time_str, "%Y-%m-%dT%H:%M:%S").replace(tzinfo=datetime.timezone.utc)
+        return parse_utc_timestamp(time_str)  # sometimes microseconds are present, these are dropped
+
+    def get_spot_time(self, activator_json_obj) -> datetime:
+        return SotaLookup.str_to_timestamp(activator_json_obj[self.SPOT_TIME_FIELD].strip())
 
-    def convert_to_activation_info(self, activator_json_obj) -> ActivationInfo:
-        spot_time_str = activator_json_obj["timeStamp"].strip()
-        spot_timestamp = SotaLookup.str_to_timestamp(spot_time_str)
+    def convert_to_activation_info(self, activator_json_obj, spot_time: datetime = None) -> ActivationInfo:
+        spot_timestamp = spot_time or self.get_spot_time(activator_json_obj)
         callsign = activator_json_obj["activatorCallsign"].strip().upper()
-        frequency = activator_json_obj["frequency"].strip()
+        frequency = mhz_to_hz(activator_json_obj["frequency"].strip())
         mode_str = activator_json_obj["mode"].strip().upper()
         mode = ModeType(mode_str)
         description = activator_json_obj["associationCode"].strip() + "/" + activator_json_obj["summitCode"].strip()
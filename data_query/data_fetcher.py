@@ -1,25 +1,204 @@
-from data_query.backends import pota_lookup
-from data_query.backends import sota_lookup
+import datetime
+import importlib
+import logging
+import time
+
 from data_query.backends.generic_lookup import QueryError
+from data_query.poll_scheduler import PollScheduler
+from metrics import METRICS
+
+logger = logging.getLogger(__name__)
+
+ALL_LOOKUPS = [
+    "data_query.backends.sota_lookup.SotaLookup",
+    "data_query.backends.pota_lookup.PotaLookup",
+]
+"""Backends to query, in "module.class" format. They're only imported when the first fetch starts"""
+
+
+def load_lookup_class(lookup_path: str):
+    last_dot = lookup_path.rfind(".")
+    return getattr(importlib.import_module(lookup_path[0:last_dot]), lookup_path[last_dot+1:])
 
 
 class DataFetcher:
-    def __init__(self):
-        self.all_lookups = [
-            sota_lookup.SotaLookup(),
-            pota_lookup.PotaLookup()
-        ]
+    def __init__(self, concurrent=True, base_urls=None, record_file="", replay_file="", replay_speed=1.0,
+                 scheduler: PollScheduler = None, extra_lookups=(), lookup_paths=None):
+        """
+        base_urls maps an activation type name to the URL to use instead of the public API.
+        record_file captures every raw response, replay_file replays a capture instead of using the network.
+        With a scheduler, only the backends it says are due are queried; the others are served
+        from their last good response. Without one, every backend is queried each time.
+        extra_lookups are backends created by the caller, e.g. a DxClusterLookup with its connection settings.
+        lookup_paths replaces ALL_LOOKUPS, e.g. with [] when spots come from a spot feed instead.
+        """
+        self.lookup_paths = ALL_LOOKUPS if lookup_paths is None else lookup_paths
+        self.scheduler = scheduler
+        self.last_good_act_lists = {}
+        """Activation type name -> raw records of the last successful query"""
+        self.base_urls = base_urls or {}
+        self.record_file = record_file
+        self.replay_file = replay_file
+        self.replay_speed = replay_speed
+        self.extra_lookups = list(extra_lookups)
+        self.all_lookups = None  # created by get_all_lookups()
+        self.concurrent = concurrent
+        self.executor = None
+        self.in_flight = {}
+        """Lookup -> future of its query, kept after a timeout so it isn't queried again until it finishes"""
+        self.served_types = {}
+        """Backend name -> activation types of the spots in its last good response, e.g. sota and pota for a cluster"""
+        self.known_types = set()
+        """Every activation type served so far"""
+        self.last_fetch_times = {}
+        """
+        Backend name, and activation type of the spots it served -> epoch seconds of the last successful fetch.
+        A type is as fresh as the freshest backend serving it.
+        """
+
+    def get_all_lookups(self):
+        """Imports and creates the backends on first use"""
+        if self.all_lookups is None:
+            all_lookups = []
+            for lookup_path in self.lookup_paths:
+                lookup = load_lookup_class(lookup_path)()
+                base_url = self.base_urls.get(lookup.get_activation_type_name())
+                if base_url:
+                    lookup.base_url = base_url.rstrip("/")
+                all_lookups.append(lookup)
+            if self.record_file:
+                from data_query.recording import ResponseRecorder
+                recorder = ResponseRecorder(self.record_file)
+                for lookup in all_lookups:
+                    lookup.recorder = recorder
+            if self.replay_file:
+                from data_query.backends.replay_lookup import ReplayLookup
+                from data_query.recording import load_recording
+                recordings = load_recording(self.replay_file)
+                all_lookups = [ReplayLookup(lookup, recordings[lookup.get_activation_type_name()], self.replay_speed)
+                               for lookup in all_lookups if lookup.get_activation_type_name() in recordings]
+            self.all_lookups = all_lookups + self.extra_lookups
+        return self.all_lookups
+
+    def retrieve_filtered_spots_by_time(self, spot_limit, time_limit=None, now=None):
+        """now is the instant spot ages are measured from, the same one for every backend in this cycle"""
+        if now is None:
+            now = datetime.datetime.now(datetime.timezone.utc)
+        all_lookups = self.get_all_lookups()
+        to_query = all_lookups
+        if self.scheduler:
+            due = set(self.scheduler.due_backends(lookup.get_activation_type_name() for lookup in all_lookups))
+            to_query = [lookup for lookup in all_lookups if lookup.get_activation_type_name() in due]
+        if self.concurrent:
+            act_lists, errors = self.retrieve_concurrently(to_query, spot_limit)
+        else:
+            act_lists, errors = self.retrieve_sequentially(to_query, spot_limit)
 
-    def retrieve_filtered_spots_by_time(self, spot_limit, time_limit=None):
         spots = []
+        for lookup in all_lookups:
+            name = lookup.get_activation_type_name()
+            if self.scheduler:
+                METRICS.set_gauge("circuit_open", int(self.scheduler.is_circuit_open(name)), {"backend": name})
+            if lookup in act_lists:
+                self.last_good_act_lists[name] = act_lists[lookup]
+            elif name not in self.last_good_act_lists:
+                continue
+            lookup_spots = lookup.filter_results_by_time(self.last_good_act_lists[name], time_limit, now)
+            if lookup in act_lists:
+                self.served_types[name] = {name} | {spot.activation_type for spot in lookup_spots}
+                self.known_types |= self.served_types[name]
+                fetch_time = time.time()
+                for activation_type in self.served_types[name]:
+                    self.last_fetch_times[activation_type] = fetch_time
+                if self.scheduler:
+                    self.scheduler.record_success(name, {spot.identity_key() for spot in lookup_spots})
+            spots.extend(lookup_spots)
+        return spots, errors
+
+    def record_failure(self, lookup, errors, error, kind="error"):
+        logger.warning("Problem querying API for %s", type(lookup).__name__)
+        METRICS.inc("lookup_failures_total", labels={"backend": lookup.get_activation_type_name(), "kind": kind})
+        errors.append(error)
+        if self.scheduler:
+            self.scheduler.record_failure(lookup.get_activation_type_name())
+
+    def retrieve_sequentially(self, lookups, spot_limit):
+        """Returns ({lookup: raw records}, [QueryError for each lookup that failed])"""
+        act_lists = {}
         errors = []
-        for lookup in self.all_lookups:
+        for lookup in lookups:
             try:
-                act_list = lookup.query_api(spot_limit)
-                filtered_results = lookup.filter_results_by_time(act_list, time_limit)
-                spots.extend(filtered_results)
+                act_lists[lookup] = lookup.query_api(spot_limit)
             except QueryError as qe:
-                print("Problem querying API for", type(lookup).__name__)
-                errors.append(qe)
-        return spots, errors
+                self.record_failure(lookup, errors, qe)
+        return act_lists, errors
+
+    def retrieve_concurrently(self, lookups, spot_limit):
+        """
+        Queries the lookups at once, each with its own deadline (lookup.query_timeout).
+        Returns whatever finished in time, plus a QueryError for each lookup that failed or timed out.
+        A lookup whose query from an earlier refresh is still running isn't queried again, and counts as timed out:
+        two queries at once would share its session and cached response.
+        """
+        from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+        if not self.executor:
+            # extra workers so a backend stuck past its deadline doesn't block the next refresh
+            self.executor = ThreadPoolExecutor(max_workers=2 * len(self.get_all_lookups()),
+                                               thread_name_prefix="lookup")
+        act_lists = {}
+        errors = []
+        start = time.monotonic()
+        futures = []
+        for lookup in lookups:
+            previous = self.in_flight.get(lookup)
+            if previous and not previous.done():
+                logger.warning("Still querying API for %s from an earlier refresh", type(lookup).__name__)
+                self.record_failure(lookup, errors, QueryError(type(lookup).__name__), "timeout")
+                continue
+            future = self.executor.submit(lookup.query_api, spot_limit)
+            self.in_flight[lookup] = future
+            futures.append((lookup, future))
+
+        for lookup, future in futures:
+            remaining = max(0.0, start + lookup.query_timeout - time.monotonic())
+            try:
+                act_lists[lookup] = future.result(timeout=remaining)
+            except FutureTimeoutError:
+                future.cancel()  # only stops it if it hasn't started; otherwise in_flight holds it back
+                logger.warning("Timed out after %s s querying API for %s", lookup.query_timeout, type(lookup).__name__)
+                self.record_failure(lookup, errors, QueryError(type(lookup).__name__), "timeout")
+            except QueryError as qe:
+                self.record_failure(lookup, errors, qe)
+        return act_lists, errors
+
+    def get_open_circuits(self) -> set:
+        """Activation types not being polled after repeated failures, whose spots are the last good ones"""
+        if not self.scheduler:
+            return set()
+        return {lookup.get_activation_type_name() for lookup in self.get_all_lookups()
+                if self.scheduler.is_circuit_open(lookup.get_activation_type_name())}
+
+    def get_stale_types(self) -> set:
+        """
+        Activation types whose spots only come from backends the scheduler says are stale,
+        e.g. failing or with an open circuit. A backend which just wasn't due this refresh isn't stale.
+        """
+        if not self.scheduler:
+            return set()
+        names = [lookup.get_activation_type_name() for lookup in self.get_all_lookups()]
+        stale = set(self.scheduler.stale_backends(names))
+        stale_types = set().union(*(self.served_types.get(name, {name}) for name in stale))
+        fresh_types = set().union(*(types for name, types in self.served_types.items() if name not in stale))
+        return stale_types - fresh_types
+
+    def get_activation_types(self) -> set:
+        """The backends' type names and every activation type they've served, e.g. for SpotStore.merge_all()"""
+        return {lookup.get_activation_type_name() for lookup in self.get_all_lookups()} | self.known_types
 
+    def shutdown(self):
+        if self.executor:
+            self.executor.shutdown(wait=False)
+            self.executor = None
+        self.in_flight.clear()
+        for lookup in self.all_lookups or []:
+            lookup.close()
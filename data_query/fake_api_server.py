@@ -0,0 +1,154 @@
+"""
+Local stand-in for the SOTA and POTA APIs, serving responses captured with ResponseRecorder.
+
+    python -m data_query.fake_api_server recording.jsonl --port 8080 --speed 10 --latency 0.3 --error-rate 0.05
+
+Then point the app at it in config.ini:
+    [API_URLS]
+    sota = http://localhost:8080
+    pota = http://localhost:8080
+"""
+import argparse
+import hashlib
+import json
+import logging
+import random
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from data_query.backends.pota_lookup import PotaLookup
+from data_query.backends.sota_lookup import SotaLookup
+from data_query.recording import RecordingTimeline, load_recording, shift_spot_times
+
+logger = logging.getLogger(__name__)
+
+ROUTES = [
+    (re.compile(r"^/api/spots/-?\d+/all$"), SotaLookup),
+    (re.compile(r"^/spot/activator$"), PotaLookup),
+]
+"""URL path -> the lookup whose recorded responses are served there"""
+
+
+class FakeApiServer:
+    """
+    Serves each backend's recordings at the real URL paths.
+    latency is added to every response, error_rate is the fraction of requests answered with a 500,
+    and not_modified_rate is the fraction answered with a 304 even if the spots changed.
+    Unchanged responses get a 304 when the client sends back the ETag.
+    """
+    def __init__(self, recording_path, port=8080, speed=1.0, latency=0.0, error_rate=0.0, not_modified_rate=0.0,
+                 shift_times=True):
+        recordings = load_recording(recording_path)
+        self.timelines = {}
+        for _, lookup_class in ROUTES:
+            name = lookup_class().get_activation_type_name()
+            if name in recordings:
+                self.timelines[lookup_class] = RecordingTimeline(recordings[name], speed)
+        self.latency = latency
+        self.error_rate = error_rate
+        self.not_modified_rate = not_modified_rate
+        self.shift_times = shift_times
+        self.rng = random.Random()
+        self.httpd = ThreadingHTTPServer(("127.0.0.1", port), self.make_handler())
+        self.thread = None
+
+    def response_for(self, lookup_class, has_validator=True):
+        """
+        Returns (status, body, etag) for the current point in the recording.
+        A recorded 304 is only sent to a client with a validator; one without gets the last 200 instead.
+        """
+        timeline = self.timelines.get(lookup_class)
+        if not timeline:
+            return 404, "", ""
+        entry = timeline.current()
+        if entry["status"] == 304 and not has_validator:
+            entry = timeline.latest_ok()
+            if not entry:
+                return 502, "", ""
+        # spot times are shifted on each request, so the ETag is taken from the recorded body
+        etag = '"' + hashlib.sha1(entry["body"].encode()).hexdigest() + '"'
+        if entry["status"] != 200 or not self.shift_times:
+            return entry["status"], entry["body"], etag
+        act_list = json.loads(entry["body"])
+        shifted = shift_spot_times(act_list, lookup_class.SPOT_TIME_FIELD, timeline.time_shift(entry))
+        return 200, json.dumps(shifted), etag
+
+    def make_handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if server.latency:
+                    time.sleep(server.latency)
+                for pattern, lookup_class in ROUTES:
+                    if pattern.match(self.path):
+                        break
+                else:
+                    self.send_error(404)
+                    return
+                if server.rng.random() < server.error_rate:
+                    self.send_error(500, "Injected error")
+                    return
+                if self.headers.get("If-None-Match") and server.rng.random() < server.not_modified_rate:
+                    self.send_not_modified(self.headers["If-None-Match"])
+                    return
+                status, body, etag = server.response_for(lookup_class, "If-None-Match" in self.headers)
+                if status == 304:
+                    self.send_not_modified(self.headers["If-None-Match"])
+                    return
+                if status != 200:
+                    self.send_error(status)
+                    return
+                if self.headers.get("If-None-Match") == etag:
+                    self.send_not_modified(etag)
+                    return
+                data = body.encode()
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                self.send_header("ETag", etag)
+                self.end_headers()
+                self.wfile.write(data)
+
+            def send_not_modified(self, etag):
+                self.send_response(304)
+                self.send_header("ETag", etag)
+                self.end_headers()
+
+            def log_message(self, format_str, *args):
+                logger.debug("%s " + format_str, self.address_string(), *args)
+
+        return Handler
+
+    def url(self) -> str:
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self):
+        """Serves on a background thread"""
+        self.thread = threading.Thread(target=self.httpd.serve_forever, name="fake-api", daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("recording", help="file written by ResponseRecorder (record_file in config.ini)")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--speed", type=float, default=1.0, help="replay speed, 1 is real time")
+    parser.add_argument("--latency", type=float, default=0.0, help="seconds added to each response")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="fraction of requests answered with 500")
+    parser.add_argument("--not-modified-rate", type=float, default=0.0,
+                        help="fraction of conditional requests answered with 304")
+    parser.add_argument("--keep-times", action="store_true", help="serve the recorded spot times unchanged")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+    fake_server = FakeApiServer(args.recording, args.port, args.speed, args.latency, args.error_rate,
+                                args.not_modified_rate, not args.keep_times)
+    print("Serving", args.recording, "at", fake_server.url())
+    fake_server.httpd.serve_forever()
@@ -0,0 +1,137 @@
+"""
+Local stand-in for a DX cluster node, posting made-up SOTA and POTA spots among ordinary DX spots.
+
+    python -m data_query.fake_dx_cluster --port 7300 --interval 2
+
+Then point the app at it in config.ini:
+    [DX_CLUSTER]
+    host = localhost
+    port = 7300
+    callsign = N0CALL
+"""
+import argparse
+import datetime
+import logging
+import random
+import socket
+import socketserver
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+TELNET_DO_ECHO = bytes((255, 253, 1))
+"""Sent before the login prompt, like some nodes do, so clients must skip negotiation"""
+
+COMMENTS = ["SOTA W7W/LC-{0:03d} CW", "POTA K-{0:04d} SSB", "pota K-{0:04d} FT8 tnx", "G/LD-{0:03d} cw 559",
+            "UP 2 QSX", "CQ DX", "tnx qso 73"]
+BAND_CENTRES_KHZ = [7030, 10116, 14060, 14285, 18086, 21060, 28060]
+
+
+class FakeClusterServer(socketserver.ThreadingTCPServer):
+    allow_reuse_address = True
+    daemon_threads = True
+
+
+class FakeDxCluster:
+    """
+    Asks each client for its callsign, then sends it every spot posted with send_spot().
+    Lines are sometimes written in two pieces, like a slow link splitting them over packets.
+    """
+    def __init__(self, port: int = 7300, split_rate: float = 0.3):
+        self.split_rate = split_rate
+        self.rng = random.Random()
+        self.lock = threading.Lock()
+        self.connections = set()
+        self.logins = []
+        self.server = FakeClusterServer(("127.0.0.1", port), self.make_handler())
+        self.thread = None
+
+    def make_handler(self):
+        fake = self
+
+        class Handler(socketserver.StreamRequestHandler):
+            def handle(self):
+                try:
+                    self.request.sendall(TELNET_DO_ECHO + b"Welcome to the fake cluster\r\n\r\nlogin: ")
+                    callsign = self.rfile.readline().decode("ascii", "replace").strip()
+                    if not callsign:
+                        return
+                    fake.logins.append(callsign)
+                    self.request.sendall("Hello {0}\r\n{0} de FAKE >\r\n".format(callsign).encode("ascii"))
+                    with fake.lock:
+                        fake.connections.add(self.request)
+                    # spots are sent by send_spot(), this just waits for the client to leave
+                    while self.request.recv(1024):
+                        pass
+                except OSError:
+                    pass  # closed by stop() or drop_connections()
+                finally:
+                    with fake.lock:
+                        fake.connections.discard(self.request)
+
+        return Handler
+
+    def port(self) -> int:
+        return self.server.server_address[1]
+
+    def spot_line(self, callsign: str, frequency_khz: float, comment: str, spotter: str = "W1AW") -> str:
+        utc = datetime.datetime.now(datetime.timezone.utc).strftime("%H%MZ")
+        return "DX de {0}:".format(spotter).ljust(16) + "{0:>8.1f}  {1:<12} {2:<30} {3}\r\n".format(
+            frequency_khz, callsign, comment, utc)
+
+    def random_spot_line(self) -> str:
+        callsign = "K{0}{1}".format(self.rng.randint(0, 9), "".join(self.rng.choice("ABCDEFGH") for _ in range(3)))
+        frequency_khz = self.rng.choice(BAND_CENTRES_KHZ) + self.rng.randint(0, 40) + self.rng.choice([0, 0.5])
+        comment = self.rng.choice(COMMENTS).format(self.rng.randint(1, 150))
+        return self.spot_line(callsign, frequency_khz, comment)
+
+    def send_spot(self, line: str):
+        data = line.encode("ascii")
+        with self.lock:
+            connections = list(self.connections)
+        for connection in connections:
+            try:
+                if self.rng.random() < self.split_rate:
+                    split = self.rng.randint(1, len(data) - 1)
+                    connection.sendall(data[:split])
+                    time.sleep(0.01)
+                    connection.sendall(data[split:])
+                else:
+                    connection.sendall(data)
+            except OSError:
+                pass
+
+    def drop_connections(self):
+        """Closes every client connection, to exercise reconnecting"""
+        with self.lock:
+            connections = list(self.connections)
+        for connection in connections:
+            connection.shutdown(socket.SHUT_RDWR)
+
+    def start(self):
+        """Serves on a background thread"""
+        self.thread = threading.Thread(target=self.server.serve_forever, name="fake-cluster", daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+        self.drop_connections()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--port", type=int, default=7300)
+    parser.add_argument("--interval", type=float, default=2.0, help="seconds between spots")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+    fake_cluster = FakeDxCluster(args.port)
+    fake_cluster.start()
+    print("Fake DX cluster on port", fake_cluster.port())
+    try:
+        while True:
+            time.sleep(args.interval)
+            fake_cluster.send_spot(fake_cluster.random_spot_line())
+    except KeyboardInterrupt:
+        fake_cluster.stop()
@@ -0,0 +1,113 @@
+import threading
+from bisect import bisect_left, insort
+from typing import Callable, Iterable, List, Optional
+
+import band_plan
+from activation_info import ActivationInfo
+
+
+class FrequencyIndex:
+    """
+    Spots sorted by frequency, for band and nearest-frequency queries in O(log n).
+    update() only inserts and removes the spots which came or went since the last call,
+    so a refresh with few changes doesn't re-sort everything. Thread-safe.
+    """
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.entries = []  # sorted (frequency_hz, identity_key)
+        self.spots = {}  # identity_key -> spot
+
+    def __len__(self):
+        return len(self.entries)
+
+    def add(self, spot: ActivationInfo):
+        key = spot.identity_key()
+        with self.lock:
+            if key not in self.spots:
+                insort(self.entries, (spot.frequency_hz, key))
+            self.spots[key] = spot
+
+    def remove(self, spot: ActivationInfo):
+        key = spot.identity_key()
+        with self.lock:
+            if self.spots.pop(key, None) is not None:
+                del self.entries[bisect_left(self.entries, (spot.frequency_hz, key))]
+
+    def update(self, spots: Iterable[ActivationInfo]):
+        """Makes the index hold exactly spots"""
+        new_spots = {spot.identity_key(): spot for spot in spots}
+        with self.lock:
+            for key in [key for key in self.spots if key not in new_spots]:
+                spot = self.spots.pop(key)
+                del self.entries[bisect_left(self.entries, (spot.frequency_hz, key))]
+            for key, spot in new_spots.items():
+                if key not in self.spots:
+                    insort(self.entries, (spot.frequency_hz, key))
+                self.spots[key] = spot
+
+    def in_range(self, low_hz: int, high_hz: int) -> List[ActivationInfo]:
+        """Spots from low_hz to high_hz inclusive, lowest frequency first"""
+        with self.lock:
+            start = bisect_left(self.entries, (low_hz,))
+            end = bisect_left(self.entries, (high_hz + 1,))
+            return [self.spots[key] for _, key in self.entries[start:end]]
+
+    def in_band(self, band_name: str) -> List[ActivationInfo]:
+        low_hz, high_hz = band_plan.band_range(band_name)
+        return self.in_range(low_hz, high_hz)
+
+    def nearest(self, freq_hz: int, tolerance_hz: int,
+                accept: Callable[[ActivationInfo], bool] = None) -> Optional[ActivationInfo]:
+        """
+        The spot closest to freq_hz, if it's within tolerance_hz. Spots which accept() rejects are skipped,
+        e.g. ones not shown; only spots within the tolerance are looked at.
+        """
+        with self.lock:
+            right = bisect_left(self.entries, (freq_hz,))
+            left = right - 1
+            while True:
+                left_gap = freq_hz - self.entries[left][0] if left >= 0 else None
+                right_gap = self.entries[right][0] - freq_hz if right < len(self.entries) else None
+                if right_gap is not None and (left_gap is None or right_gap <= left_gap):
+                    gap, key = right_gap, self.entries[right][1]
+                    right += 1
+                elif left_gap is not None:
+                    gap, key = left_gap, self.entries[left][1]
+                    left -= 1
+                else:
+                    return None
+                if gap > tolerance_hz:
+                    return None
+                spot = self.spots[key]
+                if accept is None or accept(spot):
+                    return spot
+
+
+if __name__ == '__main__':
+    import datetime
+    import random
+    import time
+
+    from helpers import ModeType
+
+    now = datetime.datetime.now(datetime.timezone.utc)
+    rng = random.Random(0)
+    spots = [ActivationInfo("pota", now, "K{0}ABC".format(i), rng.randint(1800000, 148000000), ModeType("CW"),
+                            "K-{0:04d}".format(i)) for i in range(10000)]
+    index = FrequencyIndex()
+    index.update(spots)
+    for freq in (rng.randint(1800000, 148000000) for _ in range(1000)):
+        expected = min(spots, key=lambda spot: (abs(spot.frequency_hz - freq), spot.frequency_hz < freq))
+        found = index.nearest(freq, 10 ** 9)
+        assert abs(found.frequency_hz - freq) == abs(expected.frequency_hz - freq), (freq, found, expected)
+    band_spots = [spot for spot in spots if 14000000 <= spot.frequency_hz <= 14350000]
+    assert sorted(index.in_band("20m"), key=id) == sorted(band_spots, key=id)
+
+    start = time.perf_counter()
+    index.update(spots[100:] + spots[:50])  # 50 gone
+    print("update with 50 removed: {0:.2f} ms".format((time.perf_counter() - start) * 1000))
+    start = time.perf_counter()
+    for _ in range(10000):
+        index.nearest(14062000, 2000)
+    print("nearest: {0:.2f} us".format((time.perf_counter() - start) * 100))
+    print("FrequencyIndex matches a linear scan")
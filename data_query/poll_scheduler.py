@@ -0,0 +1,162 @@
+import logging
+import random
+import threading
+import time
+from collections import deque
+from typing import Dict, Iterable, List
+
+logger = logging.getLogger(__name__)
+
+MIN_INTERVAL_SECS = 30.0
+"""A busy backend is never polled more often than this"""
+
+SPEED_UP_FACTOR = 0.75
+SLOW_DOWN_FACTOR = 1.5
+BUSY_POLLS = 3
+"""The interval shrinks by SPEED_UP_FACTOR once this many polls in a row brought new spots"""
+
+FIRST_RETRY_SECS = 15.0
+MAX_RETRY_SECS = 600.0
+"""After a failure the backend is retried after FIRST_RETRY_SECS, doubling per failure up to MAX_RETRY_SECS"""
+
+CIRCUIT_FAILURES = 4
+"""Failures in a row which open the circuit breaker"""
+
+CIRCUIT_OPEN_SECS = 900.0
+"""How long an open circuit waits before a single trial poll"""
+
+STALE_SLACK_SECS = 60.0
+"""A backend is stale once its last good poll is this much older than its interval, or a poll is this overdue"""
+
+
+class BackendSchedule:
+    """Polling state for one backend"""
+    def __init__(self, interval_secs: float):
+        self.interval_secs = interval_secs
+        self.next_due = 0.0  # monotonic; 0 means poll now
+        self.failures = 0
+        self.circuit_open = False
+        self.last_success = None  # monotonic time of the last good poll
+        self.last_keys = None  # identity keys from the last good poll
+        self.recent_new = deque(maxlen=BUSY_POLLS)  # whether each recent poll brought new spots
+
+
+class PollScheduler:
+    """
+    Decides which backends are due for a poll, so each one runs on its own interval.
+    A backend whose polls keep bringing new spots is polled more often (down to MIN_INTERVAL_SECS),
+    and a quiet one drifts back to the base interval set from the UI.
+    Failures back off exponentially with jitter. After CIRCUIT_FAILURES in a row the circuit opens: the backend
+    isn't polled for CIRCUIT_OPEN_SECS, then gets one trial poll, and DataFetcher serves its last good spots as stale.
+    """
+    def __init__(self, base_interval_secs: float, rng: random.Random = None):
+        self.base_interval_secs = base_interval_secs
+        self.rng = rng or random.Random()
+        self.lock = threading.Lock()
+        self.backends: Dict[str, BackendSchedule] = {}
+
+    def get_backend(self, name: str) -> BackendSchedule:
+        backend = self.backends.get(name)
+        if backend is None:
+            backend = self.backends[name] = BackendSchedule(self.base_interval_secs)
+        return backend
+
+    def set_base_interval(self, base_interval_secs: float):
+        """The longest interval, from the UI. Changing it starts every backend again from the new interval"""
+        with self.lock:
+            if base_interval_secs == self.base_interval_secs:
+                return
+            self.base_interval_secs = base_interval_secs
+            latest_due = time.monotonic() + base_interval_secs
+            for backend in self.backends.values():
+                backend.interval_secs = base_interval_secs
+                backend.recent_new.clear()
+                if not backend.circuit_open:
+                    backend.next_due = min(backend.next_due, latest_due)
+
+    def make_all_due(self):
+        """For a manual refresh: every backend is polled, even one with an open circuit"""
+        with self.lock:
+            for backend in self.backends.values():
+                backend.next_due = 0.0
+
+    def make_due(self, name: str):
+        """For a backend which has pushed new spots"""
+        with self.lock:
+            self.get_backend(name).next_due = 0.0
+
+    def due_backends(self, names: Iterable[str], now: float = None) -> List[str]:
+        if now is None:
+            now = time.monotonic()
+        with self.lock:
+            return [name for name in names if self.get_backend(name).next_due <= now]
+
+    def secs_until_due(self, now: float = None) -> float:
+        """Until the next backend is due, or the base interval if none are known yet"""
+        if now is None:
+            now = time.monotonic()
+        with self.lock:
+            if not self.backends:
+                return self.base_interval_secs
+            return max(0.0, min(backend.next_due for backend in self.backends.values()) - now)
+
+    def is_circuit_open(self, name: str) -> bool:
+        with self.lock:
+            return name in self.backends and self.backends[name].circuit_open
+
+    def stale_backends(self, names: Iterable[str], now: float = None) -> List[str]:
+        """
+        Backends whose spots are older than their polling explains: never polled successfully,
+        last good poll more than STALE_SLACK_SECS past its interval (e.g. while failing), poll overdue, or circuit open.
+        A backend which just wasn't due isn't stale, whatever its interval.
+        """
+        if now is None:
+            now = time.monotonic()
+        with self.lock:
+            return [name for name in names if self.is_stale(self.get_backend(name), now)]
+
+    @staticmethod
+    def is_stale(backend: BackendSchedule, now: float) -> bool:
+        return (backend.circuit_open or backend.last_success is None
+                or now - backend.last_success > backend.interval_secs + STALE_SLACK_SECS
+                or now - backend.next_due > STALE_SLACK_SECS)
+
+    def record_success(self, name: str, spot_keys: set, now: float = None):
+        """spot_keys are the identity keys of the spots the poll returned, to tell if any are new"""
+        if now is None:
+            now = time.monotonic()
+        with self.lock:
+            backend = self.get_backend(name)
+            if backend.circuit_open:
+                logger.info("%s is answering again, closing its circuit", name)
+            backend.failures = 0
+            backend.circuit_open = False
+            backend.last_success = now
+            if backend.last_keys is not None:
+                backend.recent_new.append(bool(spot_keys - backend.last_keys))
+                if len(backend.recent_new) == BUSY_POLLS and all(backend.recent_new):
+                    backend.interval_secs = max(MIN_INTERVAL_SECS, backend.interval_secs * SPEED_UP_FACTOR)
+                elif not backend.recent_new[-1]:
+                    backend.interval_secs = min(self.base_interval_secs, backend.interval_secs * SLOW_DOWN_FACTOR)
+            backend.last_keys = spot_keys
+            backend.interval_secs = min(backend.interval_secs, self.base_interval_secs)
+            backend.next_due = now + backend.interval_secs
+            logger.debug("Next %s poll in %.0f secs", name, backend.interval_secs)
+
+    def record_failure(self, name: str, now: float = None):
+        if now is None:
+            now = time.monotonic()
+        with self.lock:
+            backend = self.get_backend(name)
+            backend.failures += 1
+            if backend.failures >= CIRCUIT_FAILURES:
+                if not backend.circuit_open:
+                    logger.warning("%s failed %d times in a row, pausing it for %.0f secs",
+                                   name, backend.failures, CIRCUIT_OPEN_SECS)
+                backend.circuit_open = True
+                delay = CIRCUIT_OPEN_SECS
+            else:
+                delay = min(MAX_RETRY_SECS, FIRST_RETRY_SECS * 2 ** (backend.failures - 1))
+            # jitter so clients that failed together don't all retry together
+            backend.next_due = now + self.rng.uniform(delay / 2, delay)
+            logger.debug("Retrying %s in %.0f secs", name, backend.next_due - now)
@@ -0,0 +1,108 @@
+import bisect
+import datetime
+import json
+import logging
+import threading
+import time
+from typing import Dict, List, Optional
+
+from helpers import parse_utc_timestamp
+
+logger = logging.getLogger(__name__)
+
+RECORDED_HEADERS = ("ETag", "Last-Modified", "Content-Type")
+
+
+class ResponseRecorder:
+    """
+    Appends each raw API response to a file, one JSON object per line:
+    {"t": epoch seconds, "backend": "sota", "url": ..., "status": 200, "headers": {...}, "body": "..."}
+    """
+    def __init__(self, path: str):
+        self.path = path
+        self.lock = threading.Lock()
+
+    def record(self, backend: str, url: str, status: int, headers, body: str):
+        entry = {"t": time.time(), "backend": backend, "url": url, "status": status,
+                 "headers": {key: headers[key] for key in RECORDED_HEADERS if key in headers},
+                 "body": body}
+        line = json.dumps(entry) + "\n"
+        with self.lock:
+            with open(self.path, "a") as recording_file:
+                recording_file.write(line)
+        logger.debug("Recorded %s response %s to %s", backend, status, self.path)
+
+
+def load_recording(path: str) -> Dict[str, List[dict]]:
+    """Returns the recorded responses for each backend, in time order"""
+    by_backend = {}
+    with open(path) as recording_file:
+        for line in recording_file:
+            line = line.strip()
+            if line:
+                entry = json.loads(line)
+                by_backend.setdefault(entry["backend"], []).append(entry)
+    for entries in by_backend.values():
+        entries.sort(key=lambda entry: entry["t"])
+    return by_backend
+
+
+class RecordingTimeline:
+    """
+    Steps through one backend's recorded responses as time passes.
+    speed=1 replays in real time, speed=10 replays ten recorded seconds per real second.
+    The clock starts on the first call to current(), and loops back to the start after the last response.
+    """
+    def __init__(self, entries: List[dict], speed: float = 1.0):
+        if not entries:
+            raise ValueError("No recorded responses")
+        self.entries = entries
+        self.speed = speed
+        self.offsets = [entry["t"] - entries[0]["t"] for entry in entries]
+        self.duration = self.offsets[-1]
+        self.started = None
+
+    def elapsed(self) -> float:
+        """Recorded seconds replayed so far"""
+        if self.started is None:
+            self.started = time.monotonic()
+        elapsed = (time.monotonic() - self.started) * self.speed
+        if self.duration > 0:
+            elapsed %= self.duration + 1
+        return elapsed
+
+    def current(self) -> dict:
+        """The latest response recorded at or before the replayed time"""
+        index = bisect.bisect_right(self.offsets, self.elapsed()) - 1
+        return self.entries[max(index, 0)]
+
+    def latest_ok(self) -> Optional[dict]:
+        """
+        The latest 200 response at or before the replayed time, e.g. for a client with nothing cached
+        when a 304 was recorded. Before the first one in this loop it's the last one of the previous loop.
+        """
+        index = max(bisect.bisect_right(self.offsets, self.elapsed()) - 1, 0)
+        # back from the current entry, then wrapping round to the end
+        for entry in self.entries[index::-1] + self.entries[:index:-1]:
+            if entry["status"] == 200:
+                return entry
+        return None
+
+    def time_shift(self, entry: dict) -> datetime.timedelta:
+        """How far to move spot times in entry so their ages match what they were when it was recorded"""
+        return datetime.datetime.now(datetime.timezone.utc) - datetime.datetime.fromtimestamp(
+            entry["t"], datetime.timezone.utc)
+
+
+def shift_spot_times(act_list: List[dict], time_field: str, shift: datetime.timedelta) -> List[dict]:
+    """Copies of the JSON records with time_field moved forward by shift, so recorded spots look fresh"""
+    shifted = []
+    for activator in act_list:
+        activator = dict(activator)
+        try:
+            spot_time = parse_utc_timestamp(activator[time_field].strip()) + shift
+            activator[time_field] = spot_time.strftime("%Y-%m-%dT%H:%M:%S")
+        except (KeyError, ValueError, AttributeError):
+            pass  # left as-is, the lookup skips invalid records
+        shifted.append(activator)
+    return shifted
@@ -0,0 +1,64 @@
+import logging
+import threading
+
+logger = logging.getLogger(__name__)
+
+
+class RefreshWorker:
+    """
+    Runs refresh jobs on a single background thread, one at a time.
+    Requesting a refresh while one is in flight joins the running one instead of queueing another.
+    on_done(result, error) is called from the worker thread, so it must hand off to the UI thread itself.
+    The worker stays busy until mark_done() is called once the result has been shown,
+    so a new refresh can't start while the previous result is still on its way to the UI.
+    """
+    def __init__(self, on_done):
+        self.on_done = on_done
+        self.condition = threading.Condition()
+        self.pending_job = None
+        self.busy = False
+        self.stopped = False
+        self.thread = threading.Thread(target=self.run, name="refresh", daemon=True)
+        self.thread.start()
+
+    def request_refresh(self, job) -> bool:
+        """Returns true if job was started, false if a refresh was already in flight"""
+        with self.condition:
+            if self.busy or self.stopped:
+                return False
+            self.pending_job = job
+            self.busy = True
+            self.condition.notify()
+            return True
+
+    def is_busy(self) -> bool:
+        with self.condition:
+            return self.busy
+
+    def run(self):
+        while True:
+            with self.condition:
+                while not self.pending_job and not self.stopped:
+                    self.condition.wait()
+                if self.stopped:
+                    return
+                job = self.pending_job
+                self.pending_job = None
+            result = None
+            error = None
+            try:
+                result = job()
+            except Exception as e:
+                logger.exception("Problem during refresh: %s", e)
+                error = e
+            self.on_done(result, error)
+
+    def mark_done(self):
+        """Called once on_done's result has been handled, e.g. from the UI thread after rendering it"""
+        with self.condition:
+            self.busy = False
+
+    def stop(self):
+        with self.condition:
+            self.stopped = True
+            self.condition.notify()
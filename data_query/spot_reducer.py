@@ -0,0 +1,117 @@
+import datetime
+from typing import Dict, Iterable, List, Set, Tuple
+
+from activation_info import ActivationInfo
+from helpers import ModeFilter
+
+
+def worked_key(spot: ActivationInfo) -> Tuple[str, str]:
+    return spot.worked_key()
+
+
+def build_worked_index(worked_spots: Iterable[ActivationInfo]) -> Set[Tuple[str, str]]:
+    return {worked_key(worked) for worked in worked_spots}
+
+
+def dedup_key(spot: ActivationInfo, show_spota_twice: bool):
+    # when show_spota_twice is set, a SOTA+POTA activation is treated as two separate activations
+    if show_spota_twice:
+        return spot.callsign, spot.activation_type
+    return spot.callsign
+
+
+def reduce_spots(spots: List[ActivationInfo], worked_spots: Iterable[ActivationInfo],
+                 mode_filters: Iterable[ModeFilter], show_spota_twice=False, now=None,
+                 drop_counts: Dict[str, int] = None) -> List[ActivationInfo]:
+    """
+    Applies the spot list rules in O(n), keeping the order of spots:
+    - only the newest spot for each callsign is kept
+    - if several newest spots have the same age, the last one for each frequency is kept
+    - spots matching a worked (callsign, park) are dropped
+    - spots with a mode outside mode_filters are dropped
+    If drop_counts is given, it's filled with how many spots each rule dropped ("duplicate", "worked", "mode").
+    """
+    if now is None:
+        now = datetime.datetime.now(datetime.timezone.utc)
+
+    # dedup key -> (newest age, {frequency: index of the last spot with that age and frequency})
+    newest = {}
+    for index, spot in enumerate(spots):
+        key = dedup_key(spot, show_spota_twice)
+        age = spot.spot_age_mins(now)
+        best = newest.get(key)
+        if best is None or age < best[0]:
+            newest[key] = (age, {spot.frequency_hz: index})
+        elif age == best[0]:
+            best[1][spot.frequency_hz] = index
+
+    keep_indexes = set()
+    for _, index_by_frequency in newest.values():
+        keep_indexes.update(index_by_frequency.values())
+
+    worked_index = build_worked_index(worked_spots)
+    allowed_modes = set(mode_filters)
+    reduced = [spot for index, spot in enumerate(spots)
+               if index in keep_indexes
+               and worked_key(spot) not in worked_index
+               and spot.mode.mode_filter in allowed_modes]
+    if drop_counts is not None:
+        kept = [spots[index] for index in keep_indexes]
+        not_worked = sum(1 for spot in kept if worked_key(spot) not in worked_index)
+        drop_counts["duplicate"] = len(spots) - len(kept)
+        drop_counts["worked"] = len(kept) - not_worked
+        drop_counts["mode"] = not_worked - len(reduced)
+    return reduced
+
+
+if __name__ == '__main__':
+    import random
+
+    from helpers import ModeType
+
+    def legacy_reduce(spots, worked_spots, mode_filters, show_spota_twice, now):
+        """The nested loops previously in ScannerView, kept to check reduce_spots against"""
+        top_spots = spots.copy()
+
+        def remove(spot):
+            for i, top in enumerate(top_spots):
+                if top is spot:
+                    del top_spots[i]
+                    return
+
+        for spot1 in top_spots.copy():
+            for spot2 in top_spots.copy():
+                if spot1 is not spot2 and spot1.callsign == spot2.callsign:
+                    if show_spota_twice and spot1.activation_type != spot2.activation_type:
+                        continue
+                    if spot1.spot_age_mins(now) > spot2.spot_age_mins(now):
+                        remove(spot1)
+                    elif spot1.spot_age_mins(now) == spot2.spot_age_mins(now):
+                        if spot1.frequency_hz == spot2.frequency_hz:
+                            remove(spot1)
+        for spot in top_spots.copy():
+            for worked in worked_spots:
+                if spot.callsign == worked.callsign and spot.description == worked.description:
+                    remove(spot)
+        for top in top_spots.copy():
+            if top.mode.mode_filter not in mode_filters:
+                remove(top)
+        return top_spots
+
+    def random_spot(rng, now):
+        spot_time = now - datetime.timedelta(minutes=rng.randint(0, 6), seconds=rng.randint(0, 59))
+        return ActivationInfo(rng.choice(["sota", "pota"]), spot_time, "K" + str(rng.randint(0, 8)),
+                              rng.choice([7032000, 14062000, 14285000]), ModeType(rng.choice(["CW", "SSB", "FT8"])),
+                              rng.choice(["W7W/LC-001", "K-1234 Park"]))
+
+    rng = random.Random(1)
+    check_now = datetime.datetime.now(datetime.timezone.utc)
+    for trial in range(2000):
+        test_spots = [random_spot(rng, check_now) for _ in range(rng.randint(0, 30))]
+        test_worked = [random_spot(rng, check_now) for _ in range(rng.randint(0, 3))]
+        test_filters = rng.sample(list(ModeFilter), rng.randint(1, len(ModeFilter)))
+        for twice in (False, True):
+            expected = legacy_reduce(test_spots, test_worked, test_filters, twice, check_now)
+            actual = reduce_spots(test_spots, test_worked, test_filters, twice, check_now)
+            assert [id(s) for s in expected] == [id(s) for s in actual], "mismatch in trial " + str(trial)
+    print("reduce_spots matches the legacy loops")
@@ -0,0 +1,88 @@
+import logging
+from typing import Dict, Iterable, List, Tuple
+
+from activation_info import ActivationInfo
+
+logger = logging.getLogger(__name__)
+
+
+def activation_key(spot: ActivationInfo) -> Tuple[str, str, str]:
+    """Which activation a spot is for: the same activator at the same summit or park, on any frequency"""
+    return spot.activation_type, spot.callsign, spot.description
+
+
+class SpotDelta:
+    """What changed between two refreshes"""
+    def __init__(self):
+        self.added: List[ActivationInfo] = []
+        self.removed: List[ActivationInfo] = []
+        self.changed: List[Tuple[ActivationInfo, ActivationInfo]] = []
+        """(old, new) for an activator who moved frequency or changed mode"""
+        self.respotted: List[ActivationInfo] = []
+        """Spotted again on the same frequency and mode"""
+
+    def is_empty(self) -> bool:
+        return not (self.added or self.removed or self.changed or self.respotted)
+
+    def new_spots(self) -> List[ActivationInfo]:
+        """Every spot not seen before: the added, changed and re-spotted ones"""
+        return self.added + [new for _, new in self.changed] + self.respotted
+
+    def extend(self, other):
+        self.added.extend(other.added)
+        self.removed.extend(other.removed)
+        self.changed.extend(other.changed)
+        self.respotted.extend(other.respotted)
+
+    def summary(self) -> str:
+        parts = [(len(self.added), "new"), (len(self.changed), "moved"), (len(self.respotted), "re-spotted"),
+                 (len(self.removed), "gone")]
+        return ", ".join("{0} {1}".format(count, label) for count, label in parts if count) or "no changes"
+
+
+class SpotStore:
+    """
+    The current spot of each activation, kept between refreshes.
+    merge() takes a backend's latest spots and returns only what changed since its last merge,
+    so work after a refresh (history, alerts) can be proportional to the change rather than the spot count.
+    Runs on the refresh thread only.
+    """
+    def __init__(self):
+        self.spots_by_type: Dict[str, Dict[tuple, ActivationInfo]] = {}
+
+    def merge(self, activation_type: str, spots: Iterable[ActivationInfo]) -> SpotDelta:
+        """spots is everything the backend returned for activation_type; activations missing from it are removed"""
+        delta = SpotDelta()
+        current = self.spots_by_type.setdefault(activation_type, {})
+        seen = set()
+        # oldest first, so several spots of one activation in a batch are merged in the order they happened
+        for spot in sorted(spots, key=lambda s: s.spot_time):
+            key = activation_key(spot)
+            seen.add(key)
+            old = current.get(key)
+            if old is None:
+                delta.added.append(spot)
+            elif spot.spot_time <= old.spot_time:
+                continue  # merged already
+            elif spot.frequency_hz != old.frequency_hz or spot.mode is not old.mode:
+                delta.changed.append((old, spot))
+            else:
+                delta.respotted.append(spot)
+            current[key] = spot
+        for key in [key for key in current if key not in seen]:
+            delta.removed.append(current.pop(key))
+        return delta
+
+    def merge_all(self, spots: Iterable[ActivationInfo], activation_types: Iterable[str]) -> SpotDelta:
+        """Merges a refresh's spots from every backend; activation_types are all the backends' type names"""
+        spots_by_type = {activation_type: [] for activation_type in activation_types}
+        for spot in spots:
+            spots_by_type.setdefault(spot.activation_type, []).append(spot)
+        delta = SpotDelta()
+        for activation_type, type_spots in spots_by_type.items():
+            delta.extend(self.merge(activation_type, type_spots))
+        logger.debug("Merged spots: %s", delta.summary())
+        return delta
+
+    def current_spots(self) -> List[ActivationInfo]:
+        return [spot for spots in self.spots_by_type.values() for spot in spots.values()]
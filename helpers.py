@@ -15,6 +15,14 @@ def is_todays_date(yyyymmdd) -> bool:
     return now_yyyymmdd == yyyymmdd
 
 
+def parse_utc_timestamp(time_str: str) -> datetime.datetime:
+    """
+    Parses the start of an ISO-style timestamp like 2021-02-04T19:03:49.83 as UTC.
+    Anything after the seconds (fractions, a zone suffix) is ignored.
+    """
+    return datetime.datetime.fromisoformat(time_str[:19]).replace(tzinfo=datetime.timezone.utc)
+
+
 def local_file_path(sourcefile: str, filename: str) -> str:
     """Returns the full path to filename, at the same level as sourcefile"""
     return str(Path(sourcefile).resolve().parent) + os.sep + filename
@@ -24,18 +32,19 @@ DATA_MODES = ["PSK31", "RTTY", "MFSK", "JT65", "JT9", "FT8", "FT4", "JS8CALL"]
 """Add other modes to this list which count as as ModeFilter.DATA"""
 
 
-class ModeType:
-    def __init__(self, mode_str: str):
-        self.mode_str = mode_str
-        for filter_option in ModeFilter:
-            if mode_str.upper() == filter_option.value.upper():
-                self.mode_filter = filter_option
-                return
-        for data_mode in DATA_MODES:
-            if mode_str.upper() == data_mode.upper():
-                self.mode_filter = ModeFilter.DATA
-                return
-        self.mode_filter = ModeFilter.OTHER
+def mhz_to_hz(mhz: str) -> int:
+    """Parses a frequency like "14.062" - raises ValueError if it isn't a number"""
+    return int(round(float(mhz) * 1000000))
+
+
+def khz_to_hz(khz: str) -> int:
+    return int(round(float(khz) * 1000))
+
+
+def format_mhz(hz: int) -> str:
+    """Formats like "14.062" or "14.0625", with at least three decimal places"""
+    fraction = "{0:06d}".format(hz % 1000000).rstrip("0").ljust(3, "0")
+    return str(hz // 1000000) + "." + fraction
 
 
 class ModeFilter(Enum):
@@ -48,6 +57,30 @@ class ModeFilter(Enum):
     OTHER = "Other"
 
 
+class ModeType:
+    """
+    Flyweight: ModeType("CW") returns the same shared instance every time,
+    so each mode string is only classified once per process
+    """
+    __slots__ = ("mode_str", "mode_filter")
+
+    _instances = {}
+
+    def __new__(cls, mode_str: str):
+        instance = cls._instances.get(mode_str)
+        if instance is None:
+            instance = super().__new__(cls)
+            instance.mode_str = mode_str
+            instance.mode_filter = MODE_FILTER_TABLE.get(mode_str.upper(), ModeFilter.OTHER)
+            instance = cls._instances.setdefault(mode_str, instance)
+        return instance
+
+
+MODE_FILTER_TABLE = {data_mode.upper(): ModeFilter.DATA for data_mode in DATA_MODES}
+MODE_FILTER_TABLE.update({filter_option.value.upper(): filter_option for filter_option in ModeFilter})
+"""Upper-case mode string -> ModeFilter, anything missing is ModeFilter.OTHER"""
+
+
 def in_mode_filters(mode: ModeType, mode_filters: List[ModeFilter]) -> bool:
     for allowed_mode in mode_filters:
         if mode.mode_filter == allowed_mode:
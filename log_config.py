@@ -0,0 +1,28 @@
+import logging
+import sys
+
+TRACE = 5
+"""More detailed than DEBUG, used for dumping full API payloads"""
+logging.addLevelName(TRACE, "TRACE")
+
+LOG_FORMAT = "%(asctime)s %(levelname)s %(name)s: %(message)s"
+
+
+def configure_logging(level_name: str = "INFO", sink: str = "stderr"):
+    """
+    level_name is TRACE, DEBUG, INFO, WARNING or ERROR.
+    sink is "stdout", "stderr" or the path of a file to append to.
+    """
+    level = logging.getLevelName(level_name.upper())
+    bad_level = not isinstance(level, int)
+    if bad_level:
+        level = logging.INFO
+    if sink == "stdout":
+        handler = logging.StreamHandler(sys.stdout)
+    elif sink == "stderr":
+        handler = logging.StreamHandler(sys.stderr)
+    else:
+        handler = logging.FileHandler(sink)
+    logging.basicConfig(level=level, format=LOG_FORMAT, handlers=[handler], force=True)
+    if bad_level:
+        logging.getLogger(__name__).warning("Unknown log level %s, using INFO", level_name)
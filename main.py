@@ -1,3 +1,6 @@
+import datetime
+import logging
+import queue
 import time
 import tkinter as tk
 from tkinter import ttk
@@ -5,11 +8,22 @@ from typing import List
 
 import helpers
 from activation_info import ActivationInfo
-from data_query import data_fetcher
+from band_plan import BAND_NAMES
+from data_query import data_fetcher, spot_reducer
+from data_query.frequency_index import FrequencyIndex
+from data_query.spot_store import SpotStore
+from data_query.poll_scheduler import PollScheduler
+from data_query.refresh_worker import RefreshWorker
+from log_config import configure_logging
+from metrics import METRICS, MetricsExporter
 from rig.rig_control import Rig
-from storage import worked_history
+from rig.rig_worker import RigWorker
+from rig.spot_scanner import DEFAULT_DWELL_SECS, SCAN_ORDERS, SpotScanner
+from storage import spot_snapshot, worked_history
 from storage.settings import Settings
 
+logger = logging.getLogger(__name__)
+
 SHOW_SPOTA_TWICE = False
 """If true, a combination SOTA+POTA spot will show separate listings"""
 
@@ -17,18 +31,27 @@ MAX_SPOTS_QUERY = 50
 
 RIG_CONFIG_FILE = helpers.local_file_path(__file__, "rig.cfg")
 
+UI_POLL_MS = 50
+"""How often the Tk thread picks up work handed back from background threads"""
+
+AGE_TICK_MS = 60000
+"""How often the Age column is updated between refreshes"""
+
+MIN_POLL_DELAY_MS = 1000
+PUSH_DELAY_MS = 500
+"""Pushed spots arriving within this are shown together"""
 
-def matches_worked(spot: ActivationInfo, worked_spot: ActivationInfo):
-    """If the call and park match"""
-    return spot.callsign == worked_spot.callsign \
-        and spot.description == worked_spot.description
-    #       and spot.mode == worked_spot.mode
+ALL_BANDS = "All"
 
+FOLLOW_VFO_MS = 1000
+VFO_TOLERANCE_HZ = 2000
+"""With Follow VFO on, the spot nearest the rig's frequency is highlighted if it's within this"""
 
-def get_row_for_table(spot: ActivationInfo):
-    return [spot_age_mins(spot), spot.callsign,
+
+def get_row_for_table(spot: ActivationInfo, now=None):
+    return (spot.spot_age_mins(now), spot.callsign,
             spot.description,
-            spot.frequency, spot.mode.mode_str]
+            spot.frequency_mhz(), spot.mode.mode_str)
 
 
 def setup_headers(ac, tv, column_labels, column_widths):
@@ -37,35 +60,163 @@ def setup_headers(ac, tv, column_labels, column_widths):
         tv.heading(ac[i], text=column_labels[i])
 
 
-def spot_age_mins(spot):
-    return spot.spot_age_mins()
-
-
 def get_tags_for_spot(spot):
     return spot.activation_type,
 
 
-def fill_treeview(tv, spots):
-    tv.delete(*tv.get_children())
-    spots.sort(key=spot_age_mins)
-    for index, spot in enumerate(spots):
-        tv.insert('', 'end', values=get_row_for_table(spot), iid=index, tags=get_tags_for_spot(spot))
-    # the tags from get_tags_for_spot() can be used to distinguish rows - must match spot.activation_type
-    tv.tag_configure('sota', background='lightblue')
-    # tv.tag_configure('pota', background='white')
+def get_iid_for_spot(spot: ActivationInfo) -> str:
+    """Row id which stays the same for a spot across refreshes"""
+    return "|".join(str(part) for part in spot.identity_key())
+
+
+class SpotTreeview:
+    """
+    Keeps a Treeview in sync with a list of spots, sorted by age.
+    Rows are keyed by get_iid_for_spot(), so only new, vanished, moved or changed rows cost Tk calls,
+    and selection and scroll position survive a refresh.
+    """
+    def __init__(self, tv):
+        self.tv = tv
+        self.columns = tv['columns']
+        self.order = []  # row ids in display order
+        self.row_values = {}  # row id -> values last written to the Treeview
+        self.row_tags = {}
+        self.spots_by_iid = {}
+        # the tags from get_tags_for_spot() can be used to distinguish rows - must match spot.activation_type
+        tv.tag_configure('sota', background='lightblue')
+        # tv.tag_configure('pota', background='white')
+        tv.tag_configure('stale', foreground='gray')
+        tv.tag_configure('on_vfo', background='khaki')
+        self.highlighted = None  # row id tagged on_vfo
+
+    def spot_for_iid(self, iid) -> ActivationInfo:
+        return self.spots_by_iid[iid]
+
+    def fill(self, spots, now=None, stale_types=()):
+        """
+        Sorts spots by age (in place) and applies the differences to the Treeview.
+        Spots with an activation_type in stale_types are greyed out.
+        """
+        if now is None:
+            now = datetime.datetime.now(datetime.timezone.utc)
+        spots.sort(key=lambda spot: spot.spot_age_mins(now))
+
+        spots_by_iid = {}
+        new_order = []
+        for spot in spots:
+            iid = get_iid_for_spot(spot)
+            if iid in spots_by_iid:  # exact duplicate, which still needs its own row
+                iid += "#" + str(len(new_order))
+            spots_by_iid[iid] = spot
+            new_order.append(iid)
+
+        for iid in self.order:
+            if iid not in spots_by_iid:
+                self.tv.delete(iid)
+                del self.row_values[iid]
+                del self.row_tags[iid]
+        current = [iid for iid in self.order if iid in spots_by_iid]
+
+        for index, iid in enumerate(new_order):
+            spot = spots_by_iid[iid]
+            values = get_row_for_table(spot, now)
+            tags = get_tags_for_spot(spot)
+            if spot.activation_type in stale_types:
+                tags += ('stale',)
+            if iid == self.highlighted:
+                tags += ('on_vfo',)
+            old_values = self.row_values.get(iid)
+            if old_values is None:
+                self.tv.insert('', index, iid=iid, values=values, tags=tags)
+                current.insert(index, iid)
+            else:
+                if index >= len(current) or current[index] != iid:
+                    self.tv.move(iid, '', index)
+                    current.remove(iid)
+                    current.insert(index, iid)
+                self.update_cells(iid, old_values, values)
+                if self.row_tags[iid] != tags:
+                    self.tv.item(iid, tags=tags)
+            self.row_values[iid] = values
+            self.row_tags[iid] = tags
+
+        self.order = new_order
+        self.spots_by_iid = spots_by_iid
+
+    def highlight(self, iid):
+        """Tags one row on_vfo, e.g. the spot the rig is tuned to; None clears it"""
+        if iid == self.highlighted:
+            return
+        previous = self.highlighted
+        self.highlighted = iid
+        if previous in self.row_tags:
+            self.row_tags[previous] = tuple(tag for tag in self.row_tags[previous] if tag != 'on_vfo')
+            self.tv.item(previous, tags=self.row_tags[previous])
+        if iid in self.row_tags:
+            self.row_tags[iid] += ('on_vfo',)
+            self.tv.item(iid, tags=self.row_tags[iid])
+
+    def update_cells(self, iid, old_values, values):
+        for column, old_value, value in zip(self.columns, old_values, values):
+            if old_value != value:
+                self.tv.set(iid, column, value)
+
+    def refresh_ages(self, now=None):
+        """Updates only the Age column. Every age grows at the same rate, so the order stays valid"""
+        if now is None:
+            now = datetime.datetime.now(datetime.timezone.utc)
+        for iid in self.order:
+            old_values = self.row_values[iid]
+            values = (self.spots_by_iid[iid].spot_age_mins(now),) + old_values[1:]
+            self.update_cells(iid, old_values, values)
+            self.row_values[iid] = values
 
 
 class ScannerView:
     def __init__(self, settings: Settings, rig_control: Rig):
         self.settings = settings
         self.rig_control = rig_control
-        self.data_fetcher = data_fetcher.DataFetcher()
+        self.rig_worker = RigWorker(rig_control, self.on_tuned, on_vfo=self.on_vfo_read)
+        self.spot_scanner = SpotScanner(self.rig_worker, self.on_scan_hop)
+        self.metrics_exporter = None
+        if settings.metrics_file:
+            self.metrics_exporter = MetricsExporter(settings.metrics_file, settings.metrics_format,
+                                                    settings.metrics_interval_secs)
+            self.metrics_exporter.start()
+        self.memory_watchdog = None
+        extra_lookups = []
+        lookup_paths = None
+        if settings.spot_feed_url:
+            from data_query.backends.feed_lookup import FeedLookup
+            extra_lookups.append(FeedLookup(settings.spot_feed_url, self.on_spot_pushed))
+            lookup_paths = []
+        elif settings.dx_cluster_host:
+            from data_query.backends.dx_cluster_lookup import DxClusterLookup
+            extra_lookups.append(DxClusterLookup(settings.dx_cluster_host, settings.dx_cluster_port,
+                                                 settings.dx_cluster_callsign, self.on_spot_pushed))
+        self.pushed_refresh = None  # the after() id of a refresh for pushed spots
+        self.data_fetcher = data_fetcher.DataFetcher(base_urls=settings.api_base_urls, record_file=settings.record_file,
+                                                     replay_file=settings.replay_file,
+                                                     replay_speed=settings.replay_speed,
+                                                     scheduler=PollScheduler(settings.refresh_interval * 60),
+                                                     extra_lookups=extra_lookups, lookup_paths=lookup_paths)
+        self.ui_calls = queue.Queue()
+        self.refresh_worker = RefreshWorker(self.on_refresh_done)
         self.top_spots = []
-        self.worked_spots = worked_history.load_worked_history()  # we've worked this activator+park already
+        self.stale_types = set()
+        self.snapshot_spots = []  # from the last session, listed until a backend serving them answers
+        self.snapshot_fetch_times = {}
+        self.snapshot_on_disk = False  # whether the snapshot file has spots, only used on the refresh thread
+        self.frequency_index = FrequencyIndex()  # of top_spots, for the band filter and Follow VFO
+        self.vfo_hz = None
+        self.vfo_poll = None  # the after() id of the next VFO read
+        self.spot_store = SpotStore()  # only used on the refresh thread
+        self.worked_log = worked_history.WorkedLog()
+        self.spot_history = None  # opened by the first refresh, so sqlite isn't loaded before the window shows
+        # we've worked this activator+park already today
+        self.worked_spots = self.worked_log.spots_worked_on(helpers.get_yyyymmdd_now())
         self.root = tk.Tk()
-        iconfile = helpers.local_file_path(__file__, "icon.png")
-        img = tk.Image("photo", file=iconfile)
-        self.root.tk.call('wm', 'iconphoto', self.root._w, img)
+        self.root.after_idle(self.load_icon)
         self.root.title("SOTA/POTA spots")
         tk.Label(self.root, text='Active spots').pack()
         column_labels = ('Age', 'Call', 'Summit/Park', 'MHz', 'Mode')
@@ -80,6 +231,7 @@ class ScannerView:
         verscrlbar1.pack(side='right', fill='both')
 
         self.tv_top.pack()
+        self.spots_top = SpotTreeview(self.tv_top)
         self.tv_top.bind('<Double-1>', self.go_to_freq)  # double-click
         self.tv_top.bind('<Double-3>', self.on_worked)  # double-right-click
         self.tv_top.configure(yscrollcommand=verscrlbar1.set)
@@ -97,7 +249,11 @@ class ScannerView:
                            command=on_mode_click).pack(side='left')
         frame_options.pack()
 
-        tk.Button(self.root, text="Refresh", command=self.do_refresh_query).pack()
+        buttons_frame = tk.Frame(self.root)
+        tk.Button(buttons_frame, text="Refresh", command=self.do_refresh_query).pack(side='left')
+        tk.Button(buttons_frame, text="Stats", command=self.show_stats).pack(side='left')
+        buttons_frame.pack()
+        self.stats_panel = None
 
         interval_frame = tk.Frame(self.root)
         tk.Label(interval_frame, text='Interval (mins)').pack(side='left')
@@ -111,6 +267,27 @@ class ScannerView:
         tk.Entry(max_age_frame, textvariable=self.max_age_val, width=3).pack(side='left')
         max_age_frame.pack()
 
+        scan_frame = tk.Frame(self.root)
+        self.scan_button_text = tk.StringVar(value="Scan")
+        tk.Button(scan_frame, textvariable=self.scan_button_text, command=self.toggle_scan).pack(side='left')
+        tk.Label(scan_frame, text='by').pack(side='left')
+        self.scan_order_val = tk.StringVar(value=settings.scan_order)
+        tk.OptionMenu(scan_frame, self.scan_order_val, *SCAN_ORDERS).pack(side='left')
+        tk.Label(scan_frame, text='Dwell (secs)').pack(side='left')
+        self.scan_dwell_val = tk.StringVar(value=settings.scan_dwell_secs)
+        tk.Entry(scan_frame, textvariable=self.scan_dwell_val, width=3).pack(side='left')
+        scan_frame.pack()
+
+        band_frame = tk.Frame(self.root)
+        tk.Label(band_frame, text='Band').pack(side='left')
+        self.band_val = tk.StringVar(value=ALL_BANDS)
+        tk.OptionMenu(band_frame, self.band_val, ALL_BANDS, *BAND_NAMES,
+                      command=lambda _: self.show_top_spots()).pack(side='left')
+        self.follow_vfo_val = tk.BooleanVar(value=False)
+        tk.Checkbutton(band_frame, text='Follow VFO', variable=self.follow_vfo_val,
+                       command=self.toggle_follow_vfo).pack(side='left')
+        band_frame.pack()
+
         tk.Label(self.root).pack()  # spacing
         tk.Label(self.root, text='Worked spots today').pack()
 
@@ -122,6 +299,7 @@ class ScannerView:
         verscrlbar2.pack(side='right', fill='both')
 
         self.tv_bottom.pack()
+        self.spots_bottom = SpotTreeview(self.tv_bottom)
         self.tv_bottom.bind('<Double-1>', self.go_to_freq)
         self.tv_bottom.bind('<Double-3>', self.move_to_top_table)
         self.tv_top.configure(yscrollcommand=verscrlbar1.set)
@@ -136,19 +314,61 @@ class ScannerView:
         self.feedback_label.pack()
 
         self.root.protocol("WM_DELETE_WINDOW", self.cleanup)
-        self.lookups_and_fill_grid()
-
-        self.next_query = self.root.after(self.get_poll_interval_ms(), self.do_refresh_query)
+        self.root.bind('<F12>', self.show_memory_report)
+        if settings.memory_watchdog:
+            self.start_memory_watchdog()
+        self.root.after(UI_POLL_MS, self.pump_ui_calls)
+        self.root.after(AGE_TICK_MS, self.tick_ages)
+        self.show_snapshot()
+        self.start_refresh()
+        # import the rig module and open its connection now, instead of on the first double-click
+        self.rig_worker.connect()
+
+        self.next_query = self.root.after(self.get_poll_interval_ms(), self.poll_due_backends)
 
         self.root.mainloop()
 
+    def load_icon(self):
+        iconfile = helpers.local_file_path(__file__, "icon.png")
+        self.icon_img = tk.Image("photo", file=iconfile)  # kept so the image isn't deleted
+        self.root.tk.call('wm', 'iconphoto', self.root._w, self.icon_img)
+
     def do_refresh_query(self):
+        """The Refresh button: queries every backend now"""
         self.settings.save_other_preferences(self.get_poll_interval_ms(), self.get_max_age())
-        self.feedback("Doing query...")
+        self.data_fetcher.scheduler.make_all_due()
+        self.poll_due_backends()
+
+    def poll_due_backends(self):
+        """Refreshes, querying the backends the scheduler says are due and reusing the others' last spots"""
+        self.data_fetcher.scheduler.set_base_interval(self.get_poll_interval_ms() / 1000)
+        self.start_refresh()
+        # fill_grid() sets the real time once the scheduler has this refresh's results
+        self.schedule_next_poll(self.get_poll_interval_ms())
+
+    def on_spot_pushed(self, backend_name):
+        """Called on a push backend's thread when a spot arrives"""
+        self.run_on_ui(self.refresh_pushed, backend_name)
+
+    def refresh_pushed(self, backend_name):
+        """Refreshes just backend_name shortly, so a burst of pushed spots costs one refresh"""
+        self.data_fetcher.scheduler.make_due(backend_name)
+        if self.pushed_refresh is None:
+            self.pushed_refresh = self.root.after(PUSH_DELAY_MS, self.start_pushed_refresh)
+
+    def start_pushed_refresh(self):
+        if self.refresh_worker.is_busy():
+            # the running refresh may have missed the new spots, so go again after it
+            self.pushed_refresh = self.root.after(PUSH_DELAY_MS, self.start_pushed_refresh)
+            return
+        self.pushed_refresh = None
+        self.start_refresh()
+
+    def schedule_next_poll(self, delay_ms):
         self.root.after_cancel(self.next_query)
-        self.lookups_and_fill_grid()
-        self.next_query = self.root.after(self.get_poll_interval_ms(), self.do_refresh_query)
-        print("Next refresh is in", self.get_poll_interval_ms(), "ms")
+        delay_ms = max(MIN_POLL_DELAY_MS, delay_ms)
+        self.next_query = self.root.after(delay_ms, self.poll_due_backends)
+        logger.info("Next refresh is in %d ms", delay_ms)
 
     def get_poll_interval_ms(self):
         MS_IN_MIN = 60000
@@ -156,14 +376,14 @@ class ScannerView:
             interval = abs(float(self.interval_val.get()))
             return int(interval * MS_IN_MIN)
         except ValueError:
-            print("Invalid interval_val, defaulting to 1 min")
+            logger.warning("Invalid interval_val, defaulting to 1 min")
             return 1 * MS_IN_MIN
 
     def get_max_age(self) -> int:
         try:
             return abs(int(self.max_age_val.get()))
         except ValueError:
-            print("Invalid max_age_val, defaulting to", self.settings.max_age)
+            logger.warning("Invalid max_age_val, defaulting to %s", self.settings.max_age)
             return self.settings.max_age
 
     def show_last_updated(self, successful):
@@ -171,7 +391,7 @@ class ScannerView:
         self.last_updated_var.set(status + " at " + time.strftime("%H:%M:%S"))
 
     def feedback(self, text):
-        print(text)
+        logger.info("%s", text)
         self.feedback_var.set(text)
         self.feedback_label.update()
 
@@ -182,58 +402,183 @@ class ScannerView:
                 mode_filters.append(mode_filter)
         return mode_filters
 
-    def lookups_and_fill_grid(self):
-        query_spots, query_errors = self.data_fetcher.retrieve_filtered_spots_by_time(spot_limit=MAX_SPOTS_QUERY,
-                                                                                      time_limit=self.get_max_age())
-
-        self.top_spots = query_spots.copy()
-
-        # remove older entries for same call
-        for spot1 in self.top_spots.copy():
-            for spot2 in self.top_spots.copy():
-                if spot1 != spot2 and spot1.callsign == spot2.callsign:
-                    # special case where it's a POTA+SOTA activation
-                    if SHOW_SPOTA_TWICE and spot1.activation_type != spot2.activation_type:
-                        # when flag is true, spots are considered different types so don't need to eliminate one
-                        continue
-
-                    if spot_age_mins(spot1) > spot_age_mins(spot2):
-                        print("removing older spot from same call", "spot1:", spot1.to_string(), "spot2:",
-                              spot2.to_string())
-                        if spot1 in self.top_spots:
-                            self.top_spots.remove(spot1)
-                    elif spot_age_mins(spot1) == spot_age_mins(spot2):
-                        if spot1.frequency == spot2.frequency:
-                            if spot1 in self.top_spots:
-                                self.top_spots.remove(spot1)
-                        else:
-                            # just keep both around in this case
-                            pass
+    def run_on_ui(self, func, *args):
+        """Thread-safe: queues func to be called on the Tk thread"""
+        self.ui_calls.put((func, args))
+
+    def pump_ui_calls(self):
+        while True:
+            try:
+                func, args = self.ui_calls.get_nowait()
+            except queue.Empty:
+                break
+            func(*args)
+        self.root.after(UI_POLL_MS, self.pump_ui_calls)
+
+    def show_snapshot(self):
+        """Shows the spots saved by the last session, while the first query runs"""
+        snapshot_spots, fetch_times = spot_snapshot.load_snapshot()
+        if not snapshot_spots:
+            return
+        self.snapshot_spots = snapshot_spots
+        self.snapshot_fetch_times = fetch_times
+        self.snapshot_on_disk = True
+        now = datetime.datetime.now(datetime.timezone.utc)
+        max_age = self.get_max_age()
+        self.top_spots = [spot for spot in snapshot_spots
+                          if spot.spot_age_mins(now) <= max_age and not self.worked_log.worked_today(spot)]
+        # until a backend serving them answers
+        self.stale_types = {spot.activation_type for spot in self.top_spots}
+        self.show_top_spots(now)
+        self.spots_bottom.fill(self.worked_spots, now)
+        self.feedback("Showing saved spots")
+
+    def show_top_spots(self, now=None):
+        """Shows top_spots in the top table, only those in the chosen band if there is one. Scanning follows it"""
+        self.frequency_index.update(self.top_spots)
+        band = self.band_val.get()
+        shown = self.top_spots if band == ALL_BANDS else self.frequency_index.in_band(band)
+        self.spots_top.fill(shown, now, stale_types=self.stale_types)
+        self.spot_scanner.update_spots(shown)
+        if self.follow_vfo_val.get():
+            self.show_vfo(self.vfo_hz)
+
+    def toggle_follow_vfo(self):
+        if self.follow_vfo_val.get():
+            self.poll_vfo()
+            return
+        if self.vfo_poll:
+            self.root.after_cancel(self.vfo_poll)
+            self.vfo_poll = None
+        self.spots_top.highlight(None)
+
+    def poll_vfo(self):
+        # reads already waiting are merged by the worker, so a slow rig doesn't build a backlog
+        self.rig_worker.read_vfo()
+        self.vfo_poll = self.root.after(FOLLOW_VFO_MS, self.poll_vfo)
+
+    def on_vfo_read(self, freq_hz):
+        """Called on the rig thread"""
+        self.run_on_ui(self.show_vfo, freq_hz)
+
+    def show_vfo(self, freq_hz):
+        """Highlights the shown spot nearest the rig's frequency"""
+        self.vfo_hz = freq_hz
+        if not self.follow_vfo_val.get():
+            return
+        spot = None
+        if freq_hz is not None:
+            spot = self.frequency_index.nearest(freq_hz, VFO_TOLERANCE_HZ,
+                                                accept=lambda s: self.tv_top.exists(get_iid_for_spot(s)))
+        self.spots_top.highlight(get_iid_for_spot(spot) if spot else None)
+
+    def tick_ages(self):
+        now = datetime.datetime.now(datetime.timezone.utc)
+        self.spots_top.refresh_ages(now)
+        self.spots_bottom.refresh_ages(now)
+        self.root.after(AGE_TICK_MS, self.tick_ages)
+
+    def start_refresh(self):
+        """Starts a background query, unless one is already running"""
+        # Tk variables are only read here, on the Tk thread
+        max_age = self.get_max_age()
+        mode_filters = self.get_mode_filters()
+        worked_spots = [worked for worked in self.worked_spots if worked.worked_today()]
+
+        def job():
+            return self.lookups_and_reduce(max_age, mode_filters, worked_spots)
+
+        if self.refresh_worker.request_refresh(job):
+            self.feedback("Doing query...")
+        else:
+            self.feedback("Query already in progress...")
+
+    def on_refresh_done(self, result, error):
+        """Called on the refresh thread"""
+        self.run_on_ui(self.finish_refresh, result, error)
+
+    def finish_refresh(self, result, error):
+        try:
+            self.fill_grid(result, error)
+        finally:
+            # only now can the next refresh start, so results are shown in the order they were requested
+            self.refresh_worker.mark_done()
+
+    def lookups_and_reduce(self, max_age, mode_filters, worked_spots):
+        """Runs on the refresh thread, so must not touch any Tk objects"""
+        now = datetime.datetime.now(datetime.timezone.utc)
+        with METRICS.timer("fetch_seconds"):
+            query_spots, query_errors = self.data_fetcher.retrieve_filtered_spots_by_time(
+                spot_limit=MAX_SPOTS_QUERY, time_limit=max_age, now=now)
+        with METRICS.timer("merge_seconds"):
+            delta = self.spot_store.merge_all(query_spots, self.data_fetcher.get_activation_types())
+        if not delta.is_empty():
+            logger.info("Refresh: %s", delta.summary())
+        if not self.spot_history:
+            self.open_spot_history()
+        self.spot_history.add_spots(delta.new_spots())
+
+        # e.g. starting offline: the last session's spots stay listed, marked stale, until a backend for them answers
+        fetched = set(self.data_fetcher.last_fetch_times)
+        carried_spots = [spot for spot in self.snapshot_spots
+                         if spot.activation_type not in fetched and spot.spot_age_mins(now) <= max_age]
+        drop_counts = {}
+        with METRICS.timer("reduce_seconds"):
+            top_spots = spot_reducer.reduce_spots(query_spots + carried_spots, worked_spots, mode_filters,
+                                                  SHOW_SPOTA_TWICE, now, drop_counts)
+        for rule, dropped in drop_counts.items():
+            METRICS.inc("spots_dropped_total", dropped, {"rule": rule})
+        METRICS.set_gauge("spots_shown", len(top_spots))
+        # with nothing fetched yet, the snapshot on disk is still the best there is
+        if self.data_fetcher.last_fetch_times and (top_spots or not self.snapshot_on_disk):
+            fetch_times = {name: fetch_time for name, fetch_time in self.snapshot_fetch_times.items()
+                           if name not in fetched}
+            fetch_times.update(self.data_fetcher.last_fetch_times)
+            try:
+                spot_snapshot.save_snapshot(top_spots, fetch_times)
+                self.snapshot_on_disk = bool(top_spots)
+            except OSError as e:
+                logger.warning("Couldn't save snapshot: %s", e)
+        carried_types = {spot.activation_type for spot in carried_spots}
+        return top_spots, query_errors, carried_types, delta
+
+    def open_spot_history(self):
+        from storage.spot_history_db import SpotHistoryDB
+        self.spot_history = SpotHistoryDB(retention_days=self.settings.history_retention_days)
+
+    def fill_grid(self, result, error):
+        """Shows the result of lookups_and_reduce, on the Tk thread"""
+        self.schedule_next_poll(int(self.data_fetcher.scheduler.secs_until_due() * 1000))
+        if error:
+            self.feedback("Problem during refresh: " + str(error))
+            self.show_last_updated(False)
+            return
+        top_spots, query_errors, carried_types, delta = result
 
         # remove outdated entries from worked_spots (after a new UTC day)
         for worked in self.worked_spots.copy():
             if not worked.worked_today():
                 self.worked_spots.remove(worked)
 
-        # remove worked ones from result
-        for spot in self.top_spots.copy():
-            for worked in self.worked_spots.copy():
-                if matches_worked(spot, worked) and spot in self.top_spots:  # could have already been removed
-                    self.top_spots.remove(spot)
-
-        # remove wrong mode (filter these last so that we'll know if a spot was abandoned for another mode)
-        for top in self.top_spots.copy():
-            if not helpers.in_mode_filters(top.mode, self.get_mode_filters()):
-                self.top_spots.remove(top)
+        # spots could have been marked worked while the query was running
+        self.top_spots = [spot for spot in top_spots if not self.worked_log.worked_today(spot)]
 
-        fill_treeview(self.tv_top, self.top_spots)
-        fill_treeview(self.tv_bottom, self.worked_spots)
+        # a backend paused after repeated failures still shows its last spots, marked stale
+        paused_backends = self.data_fetcher.get_open_circuits()
+        self.stale_types = self.data_fetcher.get_stale_types() | carried_types
+        with METRICS.timer("render_seconds"):
+            self.show_top_spots()
+            self.spots_bottom.fill(self.worked_spots)
 
-        if query_errors:
+        if paused_backends:
+            self.feedback("Not querying " + ", ".join(sorted(paused_backends)) +
+                          " after repeated errors, showing older spots")
+            self.show_last_updated(False)
+        elif query_errors:
             self.feedback("Problem querying API!" + '\n' + str([err.args[0] for err in query_errors]))
             self.show_last_updated(False)
         else:
-            self.feedback("Finished lookup")
+            self.feedback("Finished lookup: " + delta.summary())
             self.show_last_updated(True)
 
     # https://stackoverflow.com/a/25217053
@@ -254,39 +599,49 @@ class ScannerView:
             # no action required
             pass
 
-    def move_from_to(self, from_tv, event, from_spots, to_spots, moving_down):
+    def move_from_to(self, from_view, event, from_spots, to_spots, moving_down):
+        from_tv = from_view.tv
         self.highlight_right_clicked(from_tv, event)
         item = from_tv.selection()[0]
         vals = from_tv.item(item, 'values')
         self.feedback("Moving " + vals[1])
-        row_index = int(item)
-        to_move = from_spots[row_index]
+        to_move = from_view.spot_for_iid(item)
+        previous_worked_day = to_move.worked_day
         if moving_down:
             to_move.worked_day = helpers.get_yyyymmdd_now()
         else:
             to_move.worked_day = ''
         to_spots.append(to_move)
         from_spots.remove(to_move)
-        fill_treeview(self.tv_top, self.top_spots)
-        fill_treeview(self.tv_bottom, self.worked_spots)
+        self.show_top_spots()
+        self.spots_bottom.fill(self.worked_spots)
         self.feedback("Moved " + vals[1])
+        return to_move, previous_worked_day
 
     def on_worked(self, event):
-        self.move_from_to(self.tv_top, event, self.top_spots, self.worked_spots, True)
-        worked_history.save_worked_history(self.worked_spots)
+        worked, _ = self.move_from_to(self.spots_top, event, self.top_spots, self.worked_spots, True)
+        self.worked_log.add(worked)
 
     def move_to_top_table(self, event):
-        self.move_from_to(self.tv_bottom, event, self.worked_spots, self.top_spots, False)
-        worked_history.save_worked_history(self.worked_spots)
+        unworked, worked_day = self.move_from_to(self.spots_bottom, event, self.worked_spots, self.top_spots, False)
+        self.worked_log.remove(unworked, worked_day)
 
     def go_to_freq(self, event):
         item = event.widget.selection()[0]
-        vals = event.widget.item(item, 'values')
-        print("Event on", vals)
-        freq_mhz = vals[3]
-        freq_hz = int(float(freq_mhz) * 1000000)
+        spot_view = self.spots_top if event.widget is self.tv_top else self.spots_bottom
+        spot = spot_view.spot_for_iid(item)
+        logger.debug("Event on %s", spot)
+        freq_mhz = spot.frequency_mhz()
+        freq_hz = spot.frequency_hz
         self.feedback("Setting freq to " + str(freq_mhz))
-        set_vfo_result = self.rig_control.set_vfo(freq_hz)
+        self.rig_worker.tune(freq_hz)
+
+    def on_tuned(self, freq_hz, set_vfo_result):
+        """Called on the rig thread"""
+        self.run_on_ui(self.show_tune_result, freq_hz, set_vfo_result)
+
+    def show_tune_result(self, freq_hz, set_vfo_result):
+        freq_mhz = helpers.format_mhz(freq_hz)
         if set_vfo_result.success:
             self.feedback("Freq was set to " + str(freq_mhz))
         elif set_vfo_result.error_msg:
@@ -294,16 +649,78 @@ class ScannerView:
         else:  # unknown if it changed
             self.feedback("")
 
+    def get_scan_dwell_secs(self):
+        try:
+            return abs(float(self.scan_dwell_val.get()))
+        except ValueError:
+            logger.warning("Invalid scan_dwell_val, defaulting to %s secs", DEFAULT_DWELL_SECS)
+            return DEFAULT_DWELL_SECS
+
+    def toggle_scan(self):
+        if self.spot_scanner.is_running():
+            self.spot_scanner.stop()
+            self.scan_button_text.set("Scan")
+            self.feedback("Scan stopped")
+            return
+        order = self.scan_order_val.get()
+        dwell_secs = self.get_scan_dwell_secs()
+        self.settings.save_scan_preferences(order, dwell_secs)
+        self.spot_scanner.start(order, dwell_secs)
+        self.scan_button_text.set("Stop scan")
+
+    def on_scan_hop(self, spot):
+        """Called on the scan thread"""
+        self.run_on_ui(self.show_scan_hop, spot)
+
+    def show_scan_hop(self, spot):
+        iid = get_iid_for_spot(spot)
+        if self.tv_top.exists(iid):
+            self.tv_top.selection_set(iid)
+            self.tv_top.see(iid)
+        self.feedback("Scanning: " + spot.callsign + " on " + spot.frequency_mhz())
+
+    def show_stats(self):
+        if self.stats_panel and self.stats_panel.is_open():
+            self.stats_panel.raise_window()
+            return
+        from stats_panel import StatsPanel
+        self.stats_panel = StatsPanel(self.root)
+
+    def start_memory_watchdog(self):
+        from memory_watchdog import MemoryWatchdog
+        self.memory_watchdog = MemoryWatchdog(self.settings.memory_interval_secs)
+        self.memory_watchdog.start()
+
+    def show_memory_report(self, event=None):
+        """F12: starts the memory watchdog, or logs its latest sample if it's running"""
+        if not self.memory_watchdog:
+            self.start_memory_watchdog()
+            self.feedback("Memory watchdog started, press F12 again for a report")
+            return
+        logger.info("Memory report:\n%s", self.memory_watchdog.report())
+        self.feedback("Memory report written to the log")
+
     def cleanup(self):
-        print("cleanup")
-        self.rig_control.cleanup_rig()
+        logger.info("cleanup")
+        if self.metrics_exporter:
+            self.metrics_exporter.stop()
+        if self.memory_watchdog:
+            self.memory_watchdog.stop()
+        self.spot_scanner.stop()
+        self.refresh_worker.stop()
+        self.rig_worker.stop()
+        self.data_fetcher.shutdown()
+        self.worked_log.close()
+        if self.spot_history:
+            self.spot_history.close()
         self.root.destroy()
 
 
 if __name__ == '__main__':
     my_settings = Settings()
+    configure_logging(my_settings.log_level, my_settings.log_sink)
     my_rig = Rig.rig_factory(RIG_CONFIG_FILE)
     if my_rig:
         ScannerView(my_settings, my_rig)
     else:
-        print("Problem with rig configuration in", RIG_CONFIG_FILE)
+        logger.error("Problem with rig configuration in %s", RIG_CONFIG_FILE)
@@ -0,0 +1,157 @@
+"""
+Watches memory use of a long-running session, to catch slow leaks.
+
+Every interval it records RSS, live objects per type (from gc) and a tracemalloc snapshot.
+An allocation site, object type or RSS that grows in every one of the last GROWTH_SAMPLES intervals,
+by at least MIN_GROWTH_BYTES, MIN_GROWTH_OBJECTS or MIN_RSS_GROWTH_BYTES overall, is reported as sustained growth.
+"""
+import gc
+import logging
+import threading
+import time
+import tracemalloc
+from collections import Counter, deque
+from typing import Dict, List
+
+from metrics import METRICS
+
+logger = logging.getLogger(__name__)
+
+GROWTH_SAMPLES = 4
+"""Intervals in a row something must grow in to be flagged"""
+
+MIN_GROWTH_BYTES = 256 * 1024
+MIN_RSS_GROWTH_BYTES = 4 * 1024 * 1024
+MIN_GROWTH_OBJECTS = 1000
+
+TRACEBACK_FRAMES = 5
+"""Frames kept per allocation; sites are grouped by the innermost one"""
+
+IGNORED_FILES = ("<frozen importlib._bootstrap>", "<frozen importlib._bootstrap_external>", tracemalloc.__file__)
+
+
+def read_rss_bytes() -> int:
+    """Resident set size from /proc on Linux, or the peak RSS where /proc isn't available"""
+    try:
+        with open("/proc/self/status") as status:
+            for line in status:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    try:
+        import resource
+        import sys
+        max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return max_rss if sys.platform == "darwin" else max_rss * 1024
+    except ImportError:  # Windows
+        return 0
+
+
+def count_objects_by_type() -> Dict[str, int]:
+    return dict(Counter(type(obj).__name__ for obj in gc.get_objects()))
+
+
+class MemorySample:
+    def __init__(self, rss_bytes: int, traced_bytes: int, bytes_by_site: Dict[str, int],
+                 objects_by_type: Dict[str, int]):
+        self.taken_at = time.time()
+        self.rss_bytes = rss_bytes
+        self.traced_bytes = traced_bytes
+        self.bytes_by_site = bytes_by_site
+        self.objects_by_type = objects_by_type
+
+
+def take_sample() -> MemorySample:
+    snapshot = tracemalloc.take_snapshot().filter_traces(
+        [tracemalloc.Filter(False, filename) for filename in IGNORED_FILES])
+    bytes_by_site = {str(stat.traceback[0]): stat.size for stat in snapshot.statistics("lineno")}
+    return MemorySample(read_rss_bytes(), tracemalloc.get_traced_memory()[0], bytes_by_site,
+                        count_objects_by_type())
+
+
+def sustained_growth(values: List[int], min_growth: int) -> bool:
+    return (len(values) > GROWTH_SAMPLES
+            and all(later > earlier for earlier, later in zip(values, values[1:]))
+            and values[-1] - values[0] >= min_growth)
+
+
+class MemoryWatchdog:
+    """
+    Samples memory on a background thread every interval_secs. tracemalloc is started by start(),
+    and slows allocation down a little, so this is for debugging sessions rather than always on.
+    """
+    def __init__(self, interval_secs: float = 300.0):
+        self.interval_secs = interval_secs
+        self.samples = deque(maxlen=GROWTH_SAMPLES + 1)
+        self.lock = threading.Lock()
+        self.stop_event = threading.Event()
+        self.thread = None
+
+    def is_running(self) -> bool:
+        return self.thread is not None and self.thread.is_alive()
+
+    def start(self):
+        if self.is_running():
+            return
+        if not tracemalloc.is_tracing():
+            tracemalloc.start(TRACEBACK_FRAMES)
+        self.stop_event.clear()
+        self.thread = threading.Thread(target=self.run, name="memory-watchdog", daemon=True)
+        self.thread.start()
+        logger.info("Memory watchdog sampling every %s secs", self.interval_secs)
+
+    def run(self):
+        while True:
+            self.sample()
+            if self.stop_event.wait(self.interval_secs):
+                return
+
+    def sample(self) -> List[str]:
+        """Takes a sample now, and returns (and logs) any sustained growth found"""
+        sample = take_sample()
+        METRICS.set_gauge("rss_bytes", sample.rss_bytes)
+        METRICS.set_gauge("traced_bytes", sample.traced_bytes)
+        with self.lock:
+            self.samples.append(sample)
+            warnings = self.find_growth()
+        for warning in warnings:
+            logger.warning("Memory growth: %s", warning)
+        return warnings
+
+    def find_growth(self) -> List[str]:
+        samples = list(self.samples)
+        warnings = []
+        rss = [sample.rss_bytes for sample in samples]
+        if sustained_growth(rss, MIN_RSS_GROWTH_BYTES):
+            warnings.append("RSS up {0:.1f} MB".format((rss[-1] - rss[0]) / 1e6))
+        for site in samples[-1].bytes_by_site:
+            sizes = [sample.bytes_by_site.get(site, 0) for sample in samples]
+            if sustained_growth(sizes, MIN_GROWTH_BYTES):
+                warnings.append("{0} up {1:.1f} kB".format(site, (sizes[-1] - sizes[0]) / 1e3))
+        for type_name in samples[-1].objects_by_type:
+            counts = [sample.objects_by_type.get(type_name, 0) for sample in samples]
+            if sustained_growth(counts, MIN_GROWTH_OBJECTS):
+                warnings.append("{0} objects up {1}".format(type_name, counts[-1] - counts[0]))
+        return warnings
+
+    def report(self, top: int = 10) -> str:
+        """The latest sample: RSS, the largest allocation sites and the most numerous object types"""
+        with self.lock:
+            if not self.samples:
+                return "No memory samples yet"
+            latest = self.samples[-1]
+            growth = self.find_growth()
+        lines = ["RSS {0:.1f} MB, traced {1:.1f} MB".format(latest.rss_bytes / 1e6, latest.traced_bytes / 1e6)]
+        lines.extend("  {0:.1f} kB  {1}".format(size / 1e3, site) for site, size in
+                     sorted(latest.bytes_by_site.items(), key=lambda item: item[1], reverse=True)[:top])
+        lines.extend("  {0:>8}  {1}".format(count, type_name) for type_name, count in
+                     sorted(latest.objects_by_type.items(), key=lambda item: item[1], reverse=True)[:top])
+        lines.extend("Growing: " + warning for warning in growth)
+        return "\n".join(lines)
+
+    def stop(self):
+        self.stop_event.set()
+        if self.thread:
+            self.thread.join()
+        tracemalloc.stop()
@@ -0,0 +1,172 @@
+"""
+Counters, gauges and histograms for the refresh pipeline, kept in memory in METRICS.
+MetricsExporter writes them to a file in Prometheus text format (for node_exporter's textfile collector) or JSON.
+"""
+import json
+import logging
+import os
+import threading
+import time
+from bisect import bisect_left
+from collections import deque
+from contextlib import contextmanager
+from typing import Dict, Tuple
+
+logger = logging.getLogger(__name__)
+
+PREFIX = "sota_pota_scanner_"
+
+SECONDS_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+BYTES_BUCKETS = (1000, 10000, 50000, 100000, 250000, 500000, 1000000, 5000000)
+
+WINDOW = 200
+"""Recent observations kept per histogram for the percentiles in the stats panel"""
+
+
+def label_key(labels: dict) -> Tuple[Tuple[str, str], ...]:
+    return tuple(sorted((name, str(value)) for name, value in (labels or {}).items()))
+
+
+def format_labels(key, extra: str = "") -> str:
+    parts = ['{0}="{1}"'.format(name, value.replace('"', '\\"')) for name, value in key]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+class RollingHistogram:
+    """Cumulative bucket counts since startup, for export, and the last WINDOW values, for percentiles"""
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.bucket_counts = [0] * (len(buckets) + 1)  # the last one is +Inf
+        self.count = 0
+        self.total = 0.0
+        self.recent = deque(maxlen=WINDOW)
+
+    def observe(self, value: float):
+        self.bucket_counts[bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.total += value
+        self.recent.append(value)
+
+    def percentile(self, fraction: float) -> float:
+        if not self.recent:
+            return 0.0
+        ordered = sorted(self.recent)
+        return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+    def summary(self) -> dict:
+        return {"count": self.count, "sum": self.total, "p50": self.percentile(0.5), "p90": self.percentile(0.9),
+                "max": max(self.recent, default=0.0)}
+
+
+class Metrics:
+    """Thread-safe registry; every metric name can be split by labels like backend="pota" """
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.counters: Dict[str, Dict[tuple, float]] = {}
+        self.gauges: Dict[str, Dict[tuple, float]] = {}
+        self.histograms: Dict[str, Dict[tuple, RollingHistogram]] = {}
+
+    def inc(self, name: str, amount: float = 1, labels: dict = None):
+        with self.lock:
+            series = self.counters.setdefault(name, {})
+            key = label_key(labels)
+            series[key] = series.get(key, 0) + amount
+
+    def set_gauge(self, name: str, value: float, labels: dict = None):
+        with self.lock:
+            self.gauges.setdefault(name, {})[label_key(labels)] = value
+
+    def observe(self, name: str, value: float, labels: dict = None, buckets=SECONDS_BUCKETS):
+        with self.lock:
+            series = self.histograms.setdefault(name, {})
+            key = label_key(labels)
+            histogram = series.get(key)
+            if histogram is None:
+                histogram = series[key] = RollingHistogram(buckets)
+            histogram.observe(value)
+
+    @contextmanager
+    def timer(self, name: str, labels: dict = None):
+        """Observes the seconds spent in the with block, even if it raises"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - start, labels)
+
+    def to_prometheus(self) -> str:
+        lines = []
+        with self.lock:
+            for name, series in sorted(self.counters.items()):
+                lines.append("# TYPE {0}{1} counter".format(PREFIX, name))
+                lines.extend("{0}{1}{2} {3}".format(PREFIX, name, format_labels(key), value)
+                             for key, value in sorted(series.items()))
+            for name, series in sorted(self.gauges.items()):
+                lines.append("# TYPE {0}{1} gauge".format(PREFIX, name))
+                lines.extend("{0}{1}{2} {3}".format(PREFIX, name, format_labels(key), value)
+                             for key, value in sorted(series.items()))
+            for name, series in sorted(self.histograms.items()):
+                lines.append("# TYPE {0}{1} histogram".format(PREFIX, name))
+                for key, histogram in sorted(series.items()):
+                    cumulative = 0
+                    for bound, bucket_count in zip(histogram.buckets + ("+Inf",), histogram.bucket_counts):
+                        cumulative += bucket_count
+                        lines.append("{0}{1}_bucket{2} {3}".format(
+                            PREFIX, name, format_labels(key, 'le="{0}"'.format(bound)), cumulative))
+                    lines.append("{0}{1}_sum{2} {3}".format(PREFIX, name, format_labels(key), histogram.total))
+                    lines.append("{0}{1}_count{2} {3}".format(PREFIX, name, format_labels(key), histogram.count))
+        return "\n".join(lines) + "\n"
+
+    def to_dict(self) -> dict:
+        with self.lock:
+            return {
+                "counters": {name: {format_labels(key): value for key, value in series.items()}
+                             for name, series in self.counters.items()},
+                "gauges": {name: {format_labels(key): value for key, value in series.items()}
+                           for name, series in self.gauges.items()},
+                "histograms": {name: {format_labels(key): histogram.summary() for key, histogram in series.items()}
+                               for name, series in self.histograms.items()},
+            }
+
+
+METRICS = Metrics()
+
+
+class MetricsExporter:
+    """Rewrites path with the current METRICS every interval_secs, on a background thread"""
+    def __init__(self, path: str, export_format: str = "prometheus", interval_secs: float = 30.0,
+                 metrics: Metrics = METRICS):
+        self.path = path
+        self.export_format = export_format
+        self.interval_secs = interval_secs
+        self.metrics = metrics
+        self.stop_event = threading.Event()
+        self.thread = threading.Thread(target=self.run, name="metrics-export", daemon=True)
+
+    def start(self):
+        self.thread.start()
+        logger.info("Writing %s metrics to %s every %s secs", self.export_format, self.path, self.interval_secs)
+
+    def run(self):
+        while not self.stop_event.wait(self.interval_secs):
+            self.write()
+
+    def write(self):
+        if self.export_format == "json":
+            text = json.dumps(self.metrics.to_dict(), indent=1, sort_keys=True)
+        else:
+            text = self.metrics.to_prometheus()
+        # written aside and renamed, so a scraper never reads half a file
+        temp_path = self.path + ".tmp"
+        try:
+            with open(temp_path, 'w') as metrics_file:
+                metrics_file.write(text)
+            os.replace(temp_path, self.path)
+        except OSError as e:
+            logger.warning("Couldn't write metrics to %s: %s", self.path, e)
+
+    def stop(self):
+        self.stop_event.set()
+        self.write()
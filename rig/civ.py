@@ -0,0 +1,206 @@
+"""
+Icom CI-V framing: FE FE <to> <from> <command> [data...] FD
+
+The parser works on whatever bytes have arrived so far, so frames split across reads, the echo of our own
+commands, OK/NG acks and unsolicited transceive frames can all be told apart on the same port.
+"""
+import logging
+import time
+from typing import Callable, List, NamedTuple, Optional
+
+logger = logging.getLogger(__name__)
+
+PREAMBLE = 0xFE
+END = 0xFD
+OK = 0xFB
+NG = 0xFA
+BROADCAST = 0x00
+
+CMD_TRANSCEIVE_FREQ = 0x00
+CMD_TRANSCEIVE_MODE = 0x01
+CMD_READ_FREQ = 0x03
+CMD_READ_MODE = 0x04
+CMD_SET_FREQ = 0x05
+CMD_SET_MODE = 0x06
+
+IC7300_ADDRESS = 0x94
+CONTROLLER_ADDRESS = 0xE0
+
+MODE_CODES = {"LSB": 0x00, "USB": 0x01, "AM": 0x02, "CW": 0x03, "RTTY": 0x04, "FM": 0x05, "CW-R": 0x07,
+              "RTTY-R": 0x08}
+MODE_NAMES = {code: name for name, code in MODE_CODES.items()}
+
+HAMLIB_MODES = {"LSB": "LSB", "USB": "USB", "AM": "AM", "CW": "CW", "RTTY": "RTTY", "FM": "FM", "CWR": "CW-R",
+                "RTTYR": "RTTY-R", "PKTUSB": "USB", "PKTLSB": "LSB"}
+"""Hamlib mode name -> MODE_CODES key. The data modes map to plain USB/LSB, since DATA is a separate setting"""
+
+MAX_FRAME_LEN = 64
+"""Longer than any frame we use; a preamble with no FD within this many bytes is treated as noise"""
+
+
+class Frame(NamedTuple):
+    to_address: int
+    from_address: int
+    command: int
+    data: bytes
+
+    def is_ack(self) -> bool:
+        return self.command in (OK, NG) and not self.data
+
+
+class CivError(Exception):
+    pass
+
+
+def encode_frame(to_address: int, from_address: int, command: int, data: bytes = b"") -> bytes:
+    return bytes([PREAMBLE, PREAMBLE, to_address, from_address, command]) + bytes(data) + bytes([END])
+
+
+def freq_to_bcd(freq_hz: int) -> bytes:
+    """
+    For a frequency like 7.123.456 we need to send "reversed" data like:
+    ["0x56","0x34","0x12","0x07","0x00"]
+    """
+    digits = "{0:010d}".format(freq_hz)
+    return bytes(int(digits[i - 2:i], 16) for i in range(10, 0, -2))
+
+
+def bcd_to_freq(data: bytes) -> int:
+    freq_hz = 0
+    for byte in reversed(data):
+        high, low = byte >> 4, byte & 0x0F
+        if high > 9 or low > 9:
+            raise CivError("Not BCD: " + data.hex())
+        freq_hz = freq_hz * 100 + high * 10 + low
+    return freq_hz
+
+
+def set_freq_frame(freq_hz: int, radio_address: int = IC7300_ADDRESS) -> bytes:
+    return encode_frame(radio_address, CONTROLLER_ADDRESS, CMD_SET_FREQ, freq_to_bcd(freq_hz))
+
+
+def read_freq_frame(radio_address: int = IC7300_ADDRESS) -> bytes:
+    return encode_frame(radio_address, CONTROLLER_ADDRESS, CMD_READ_FREQ)
+
+
+def set_mode_frame(mode: str, radio_address: int = IC7300_ADDRESS) -> bytes:
+    """mode is a key of MODE_CODES, the radio keeps its current filter"""
+    return encode_frame(radio_address, CONTROLLER_ADDRESS, CMD_SET_MODE, bytes([MODE_CODES[mode]]))
+
+
+class FrameParser:
+    """Collects bytes and splits off complete frames, skipping noise and half frames from a collision"""
+    def __init__(self):
+        self.buffer = bytearray()
+
+    def feed(self, data: bytes) -> List[Frame]:
+        self.buffer.extend(data)
+        frames = []
+        while True:
+            start = self.buffer.find(bytes([PREAMBLE, PREAMBLE]))
+            if start == -1:
+                # keep a trailing FE, it may be the first half of the next preamble
+                del self.buffer[:-1 if self.buffer.endswith(bytes([PREAMBLE])) else len(self.buffer)]
+                return frames
+            del self.buffer[:start]
+            body_start = 2
+            while body_start < len(self.buffer) and self.buffer[body_start] == PREAMBLE:
+                body_start += 1  # radios may send more than two FEs
+            end = self.buffer.find(bytes([END]), body_start)
+            if end == -1:
+                if len(self.buffer) > MAX_FRAME_LEN:
+                    del self.buffer[:2]
+                    continue
+                return frames
+            body = bytes(self.buffer[body_start:end])
+            next_preamble = body.find(bytes([PREAMBLE]))
+            if next_preamble != -1:
+                # a new frame started before this one ended
+                del self.buffer[:body_start + next_preamble]
+                continue
+            del self.buffer[:end + 1]
+            if len(body) < 3:
+                logger.debug("Skipping short frame %s", body.hex())
+                continue
+            frames.append(Frame(body[0], body[1], body[2], body[3:]))
+
+
+class CivConnection:
+    """
+    Sends commands over a pyserial-like port (write, flush, read, in_waiting, timeout)
+    and waits for the matching reply. Waits end as soon as the reply arrives, or at a deadline.
+    Transceive frames the radio broadcasts by itself (e.g. after the VFO knob is turned) go to on_transceive.
+    """
+    def __init__(self, port, radio_address: int = IC7300_ADDRESS,
+                 on_transceive: Optional[Callable[[Frame], None]] = None):
+        self.port = port
+        self.radio_address = radio_address
+        self.on_transceive = on_transceive
+        self.parser = FrameParser()
+
+    def read_frames(self, deadline: float) -> List[Frame]:
+        """Waits until at least one complete frame has arrived, or the deadline. Returns the frames"""
+        while True:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return []
+            self.port.timeout = remaining
+            data = self.port.read(1)
+            if not data:
+                return []
+            waiting = self.port.in_waiting
+            if waiting:
+                data += self.port.read(waiting)
+            frames = self.parser.feed(data)
+            if frames:
+                return frames
+
+    def transact(self, frame: bytes, timeout: float, reply_command: Optional[int] = None) -> Frame:
+        """
+        Writes frame and returns the radio's reply to it: an OK/NG ack,
+        or for a read command the frame with reply_command.
+        Raises CivError if there's no reply before timeout.
+        """
+        deadline = time.monotonic() + timeout
+        self.drain()  # so a late reply to an earlier command isn't taken for this one's
+        self.port.write(frame)
+        self.port.flush()
+        while True:
+            frames = self.read_frames(deadline)
+            if not frames:
+                raise CivError("No response from radio")
+            for received in frames:
+                if received.from_address != self.radio_address:
+                    continue  # the echo of what we sent, or another controller
+                if received.to_address != BROADCAST and (received.is_ack() or received.command == reply_command):
+                    return received
+                self.handle_unsolicited(received)
+
+    def drain(self):
+        """Handles whatever has arrived since the last command"""
+        waiting = self.port.in_waiting
+        if waiting:
+            for received in self.parser.feed(self.port.read(waiting)):
+                if received.from_address == self.radio_address:
+                    self.handle_unsolicited(received)
+
+    def handle_unsolicited(self, received: Frame):
+        if received.to_address == BROADCAST and self.on_transceive:
+            self.on_transceive(received)
+        else:
+            logger.debug("Ignoring frame %s", received)
+
+    def set_freq(self, freq_hz: int, timeout: float) -> bool:
+        """True if the radio acked the new frequency, False if it refused it"""
+        reply = self.transact(set_freq_frame(freq_hz, self.radio_address), timeout)
+        return reply.command == OK
+
+    def read_freq(self, timeout: float) -> int:
+        reply = self.transact(read_freq_frame(self.radio_address), timeout, CMD_READ_FREQ)
+        if reply.command == NG:
+            raise CivError("Radio refused frequency read")
+        return bcd_to_freq(reply.data)
+
+    def set_mode(self, mode: str, timeout: float) -> bool:
+        reply = self.transact(set_mode_frame(mode, self.radio_address), timeout)
+        return reply.command == OK
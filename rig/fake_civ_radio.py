@@ -0,0 +1,122 @@
+"""
+Pretends to be an IC-7300 on a pseudo-terminal, for trying Serial7300Rig without a radio (Linux/macOS).
+
+    python -m rig.fake_civ_radio --reply-delay 0.02 --transceive-every 5
+
+Then put the printed device path in rig.cfg:
+    [Serial7300Rig]
+    SERIAL_PORT = /dev/pts/5
+"""
+import argparse
+import logging
+import os
+import select
+import threading
+import time
+import tty
+
+from rig import civ
+
+logger = logging.getLogger(__name__)
+
+LOWEST_HZ = 30000
+HIGHEST_HZ = 74800000
+"""The 7300 answers NG to frequencies outside its receive range"""
+
+
+class FakeCivRadio:
+    """
+    Answers set/read frequency and set mode commands like the radio does with "CI-V USB Echo Back" on:
+    each command is echoed, then acked with OK/NG or answered with data after reply_delay.
+    transceive() broadcasts a frequency change, as when the VFO knob is turned.
+    """
+    def __init__(self, address: int = civ.IC7300_ADDRESS, echo: bool = True, reply_delay: float = 0.0,
+                 freq_hz: int = 7074000, mode: str = "USB"):
+        self.address = address
+        self.echo = echo
+        self.reply_delay = reply_delay
+        self.freq_hz = freq_hz
+        self.mode = mode
+        self.master_fd, self.slave_fd = os.openpty()
+        tty.setraw(self.slave_fd)
+        self.device_path = os.ttyname(self.slave_fd)
+        self.parser = civ.FrameParser()
+        self.write_lock = threading.Lock()
+        self.stopped = False
+        self.thread = threading.Thread(target=self.run, name="fake-civ-radio", daemon=True)
+
+    def start(self):
+        self.thread.start()
+
+    def run(self):
+        while not self.stopped:
+            readable, _, _ = select.select([self.master_fd], [], [], 0.1)
+            if not readable:
+                continue
+            try:
+                data = os.read(self.master_fd, 256)
+            except OSError:
+                return
+            for frame in self.parser.feed(data):
+                self.handle(frame)
+
+    def handle(self, frame: civ.Frame):
+        if frame.to_address != self.address:
+            return
+        if self.echo:
+            self.send(civ.encode_frame(frame.to_address, frame.from_address, frame.command, frame.data))
+        if self.reply_delay:
+            time.sleep(self.reply_delay)
+        if frame.command == civ.CMD_SET_FREQ:
+            freq_hz = civ.bcd_to_freq(frame.data)
+            if not LOWEST_HZ <= freq_hz <= HIGHEST_HZ:
+                self.reply(frame, civ.NG)
+                return
+            self.freq_hz = freq_hz
+            self.reply(frame, civ.OK)
+        elif frame.command == civ.CMD_READ_FREQ:
+            self.reply(frame, civ.CMD_READ_FREQ, civ.freq_to_bcd(self.freq_hz))
+        elif frame.command == civ.CMD_SET_MODE and frame.data and frame.data[0] in civ.MODE_NAMES:
+            self.mode = civ.MODE_NAMES[frame.data[0]]
+            self.reply(frame, civ.OK)
+        else:
+            self.reply(frame, civ.NG)
+
+    def reply(self, frame: civ.Frame, command: int, data: bytes = b""):
+        self.send(civ.encode_frame(frame.from_address, self.address, command, data))
+
+    def transceive(self, freq_hz: int):
+        """Moves the VFO from the radio's side, and broadcasts the change"""
+        self.freq_hz = freq_hz
+        self.send(civ.encode_frame(civ.BROADCAST, self.address, civ.CMD_TRANSCEIVE_FREQ, civ.freq_to_bcd(freq_hz)))
+
+    def send(self, data: bytes):
+        with self.write_lock:
+            os.write(self.master_fd, data)
+
+    def stop(self):
+        self.stopped = True
+        self.thread.join(1)
+        os.close(self.master_fd)
+        os.close(self.slave_fd)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--no-echo", action="store_true", help="don't echo commands back")
+    parser.add_argument("--reply-delay", type=float, default=0.0, help="seconds before each reply")
+    parser.add_argument("--transceive-every", type=float, default=0.0,
+                        help="seconds between unsolicited frequency broadcasts, 0 for none")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+    radio = FakeCivRadio(echo=not args.no_echo, reply_delay=args.reply_delay)
+    radio.start()
+    print("Fake IC-7300 at", radio.device_path)
+    try:
+        while True:
+            time.sleep(args.transceive_every or 3600)
+            if args.transceive_every:
+                radio.transceive(radio.freq_hz + 1000)
+                print("VFO moved to", radio.freq_hz)
+    except KeyboardInterrupt:
+        radio.stop()
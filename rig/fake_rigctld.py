@@ -0,0 +1,123 @@
+"""
+Local stand-in for rigctld, answering the commands RigctldRig sends.
+
+    python -m rig.fake_rigctld --port 4532 --latency 0.05
+
+Then select RigctldRig in rig.cfg with HOST = localhost.
+"""
+import argparse
+import logging
+import socket
+import socketserver
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+MODES = {"USB", "LSB", "CW", "CWR", "RTTY", "RTTYR", "AM", "FM", "WFM", "PKTUSB", "PKTLSB", "PKTFM"}
+
+RIG_EINVAL = -1
+RIG_ENIMPL = -4
+
+
+class FakeRigctldServer(socketserver.ThreadingTCPServer):
+    allow_reuse_address = True
+    daemon_threads = True
+
+
+class FakeRigctld:
+    """
+    Keeps a frequency and mode, and answers F, f, M and m like rigctld's default protocol.
+    latency is added once per batch of commands read from the socket, like a network round trip.
+    """
+    def __init__(self, port: int = 4532, latency: float = 0.0, freq_hz: int = 14074000, mode: str = "USB"):
+        self.latency = latency
+        self.freq_hz = freq_hz
+        self.mode = mode
+        self.batches = 0
+        self.lock = threading.Lock()
+        self.connections = set()
+        self.server = FakeRigctldServer(("127.0.0.1", port), self.make_handler())
+        self.thread = None
+
+    def answer(self, line: str) -> str:
+        parts = line.split()
+        if not parts:
+            return ""
+        with self.lock:
+            if parts[0] == "F" and len(parts) == 2:
+                try:
+                    self.freq_hz = int(float(parts[1]))
+                except ValueError:
+                    return "RPRT {0}\n".format(RIG_EINVAL)
+                return "RPRT 0\n"
+            if parts[0] == "f":
+                return "{0}\n".format(self.freq_hz)
+            if parts[0] == "M" and len(parts) >= 2:
+                if parts[1] not in MODES:
+                    return "RPRT {0}\n".format(RIG_EINVAL)
+                self.mode = parts[1]
+                return "RPRT 0\n"
+            if parts[0] == "m":
+                return "{0}\n2400\n".format(self.mode)
+        return "RPRT {0}\n".format(RIG_ENIMPL)
+
+    def make_handler(self):
+        fake = self
+
+        class Handler(socketserver.StreamRequestHandler):
+            def handle(self):
+                fake.connections.add(self.request)
+                try:
+                    self.serve_commands()
+                except OSError:
+                    pass  # closed by stop()
+                finally:
+                    fake.connections.discard(self.request)
+
+            def serve_commands(self):
+                while True:
+                    data = self.request.recv(4096)
+                    if not data:
+                        return
+                    # a client may split a command over two reads
+                    while not data.endswith(b"\n"):
+                        more = self.request.recv(4096)
+                        if not more:
+                            return
+                        data += more
+                    fake.batches += 1
+                    if fake.latency:
+                        time.sleep(fake.latency)
+                    lines = data.decode().splitlines()
+                    if "q" in lines:
+                        return
+                    self.wfile.write("".join(fake.answer(line) for line in lines).encode())
+
+        return Handler
+
+    def port(self) -> int:
+        return self.server.server_address[1]
+
+    def start(self):
+        """Serves on a background thread"""
+        self.thread = threading.Thread(target=self.server.serve_forever, name="fake-rigctld", daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        """Stops listening and drops the open connections, like rigctld exiting"""
+        self.server.shutdown()
+        self.server.server_close()
+        for connection in list(self.connections):
+            connection.shutdown(socket.SHUT_RDWR)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--port", type=int, default=4532)
+    parser.add_argument("--latency", type=float, default=0.0, help="seconds added to each round trip")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+    fake_rigctld = FakeRigctld(args.port, args.latency)
+    print("Fake rigctld on port", fake_rigctld.port())
+    fake_rigctld.server.serve_forever()
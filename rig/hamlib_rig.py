@@ -1,7 +1,15 @@
+import logging
 import time
 import Hamlib
 from rig.rig_control import Rig, FreqChangeResult
 
+logger = logging.getLogger(__name__)
+
+CONFIRM_TIMEOUT_SECS = 0.5
+"""How long to keep reading the frequency back after setting it"""
+
+CONFIRM_POLL_SECS = 0.02
+
 
 class HamlibRig(Rig):
     def __init__(self, device_id: str, rig_model: int):
@@ -9,8 +17,8 @@ class HamlibRig(Rig):
         self.device_id = device_id
         self.rig_model = rig_model
 
-    def set_vfo(self, freq_hz: int) -> FreqChangeResult:
-        """Returns true if VFO was set to freq_hz"""
+    def connect(self):
+        """Opens the Hamlib connection if it isn't already. Returns an error message on failure"""
         if not self.my_rig:
             Hamlib.rig_set_debug(Hamlib.RIG_DEBUG_ERR)
             self.my_rig = Hamlib.Rig(self.rig_model)
@@ -21,21 +29,43 @@ class HamlibRig(Rig):
 
             self.my_rig.open()
             if self.my_rig.error_status:
-                print(Hamlib.rigerror(self.my_rig.error_status))
+                logger.error("%s", Hamlib.rigerror(self.my_rig.error_status))
                 self.cleanup_rig()
-                return FreqChangeResult(error_msg="Problem opening Hamlib connection")
+                return "Problem opening Hamlib connection"
+        return None
 
-        self.my_rig.set_freq(Hamlib.RIG_VFO_CURR, freq_hz)
+    def set_vfo(self, freq_hz: int, mode: str = None) -> FreqChangeResult:
+        """Returns true if VFO was set to freq_hz"""
+        error_msg = self.connect()
+        if error_msg:
+            return FreqChangeResult(error_msg=error_msg)
 
-        time.sleep(.2)
+        if mode:
+            self.my_rig.set_mode(Hamlib.rig_parse_mode(mode))
+        self.my_rig.set_freq(Hamlib.RIG_VFO_CURR, freq_hz)
 
-        new_freq = self.my_rig.get_freq(Hamlib.RIG_VFO_CURR)
-        print("get_freq result: " + str(new_freq))
+        # read back until the radio reports the new frequency, instead of a fixed wait
+        deadline = time.monotonic() + CONFIRM_TIMEOUT_SECS
+        while True:
+            new_freq = self.my_rig.get_freq(Hamlib.RIG_VFO_CURR)
+            logger.debug("get_freq result: %s", new_freq)
+            if int(new_freq) == freq_hz or time.monotonic() >= deadline:
+                break
+            time.sleep(CONFIRM_POLL_SECS)
         if int(new_freq) != freq_hz:
             self.cleanup_rig()
             return FreqChangeResult(error_msg="Problem changing freq")
         return FreqChangeResult(success=True)
 
+    def get_vfo(self):
+        if self.connect():
+            return None
+        freq = self.my_rig.get_freq(Hamlib.RIG_VFO_CURR)
+        if self.my_rig.error_status:
+            logger.debug("get_freq: %s", Hamlib.rigerror(self.my_rig.error_status))
+            return None
+        return int(freq)
+
     def cleanup_rig(self):
         if self.my_rig:
             self.my_rig.close()
@@ -1,6 +1,26 @@
 import importlib
+import logging
+import threading
 from configparser import ConfigParser
 
+from band_plan import band_for_freq
+from helpers import DATA_MODES
+
+logger = logging.getLogger(__name__)
+
+
+def hamlib_mode_for(spot_mode: str, freq_hz: int):
+    """Hamlib mode name to tune a spot in, or None if the spot's mode doesn't tell us (the rig's mode is kept)"""
+    spot_mode = spot_mode.upper()
+    if spot_mode == "SSB":
+        # 60m channels are USB, unlike the rest of the bands below 10 MHz
+        return "USB" if freq_hz >= 10000000 or band_for_freq(freq_hz) == "60m" else "LSB"
+    if spot_mode in ("CW", "AM", "FM", "RTTY"):
+        return spot_mode
+    if spot_mode in (data_mode.upper() for data_mode in DATA_MODES):
+        return "PKTUSB"
+    return None
+
 
 class FreqChangeResult:
     """Holds the result of a frequency change. Can represent success, an error, or False+None means an unknown result"""
@@ -16,32 +36,80 @@ class Rig:
         try:
             rig_module, rig_class, params_dict = rig_config_reader.read_config()
         except Exception as e:
-            print("Error parsing config file:", e)
+            logger.error("Error parsing config file: %s", e)
             return None
 
-        print("Creating instance of class:", rig_class, "from module:", rig_module)
-        print("Parameters are", params_dict)
-        try:
-            module_ = importlib.import_module(rig_module)
-            rig_instance = getattr(module_, rig_class)(**params_dict)
-        except Exception as e:
-            print("Problem creating instance:", e)
-            return None
-        print("Created Rig instance:", rig_instance.__class__.__name__)
-        return rig_instance
+        # the rig module (and Hamlib or pyserial) is only imported on first use
+        return LazyRig(rig_module, rig_class, params_dict)
 
-    def set_vfo(self, freq_hz: int) -> FreqChangeResult:
+    def connect(self):
+        """Opens the connection ahead of the first set_vfo(), if the rig keeps one. Returns an error message or None"""
+        return None
+
+    def set_vfo(self, freq_hz: int, mode: str = None) -> FreqChangeResult:
+        """mode is a Hamlib mode name like "CW", "USB" or "PKTUSB", None leaves the rig's mode alone"""
         return FreqChangeResult(error_msg="Unspecified rig type")
 
+    def get_vfo(self):
+        """The current VFO frequency in Hz, or None if it can't be read"""
+        return None
+
     def cleanup_rig(self):
         pass
 
 
+class LazyRig(Rig):
+    """Creates the configured Rig the first time it's used, so its module isn't imported at startup"""
+    def __init__(self, rig_module: str, rig_class: str, params_dict: dict):
+        self.rig_module = rig_module
+        self.rig_class = rig_class
+        self.params_dict = params_dict
+        self.rig_instance = None
+        self.error_msg = None
+        self.lock = threading.Lock()
+
+    def get_rig(self):
+        """The real Rig, or None if it couldn't be created"""
+        with self.lock:
+            if not self.rig_instance and not self.error_msg:
+                logger.info("Creating instance of class: %s from module: %s", self.rig_class, self.rig_module)
+                logger.debug("Parameters are %s", self.params_dict)
+                try:
+                    module_ = importlib.import_module(self.rig_module)
+                    self.rig_instance = getattr(module_, self.rig_class)(**self.params_dict)
+                except Exception as e:
+                    logger.error("Problem creating instance: %s", e)
+                    self.error_msg = "Problem creating " + self.rig_class + ": " + str(e)
+                    return None
+                logger.info("Created Rig instance: %s", self.rig_instance.__class__.__name__)
+            return self.rig_instance
+
+    def connect(self):
+        rig = self.get_rig()
+        if not rig:
+            return self.error_msg
+        return rig.connect()
+
+    def set_vfo(self, freq_hz: int, mode: str = None) -> FreqChangeResult:
+        rig = self.get_rig()
+        if not rig:
+            return FreqChangeResult(error_msg=self.error_msg)
+        return rig.set_vfo(freq_hz, mode)
+
+    def get_vfo(self):
+        rig = self.get_rig()
+        return rig.get_vfo() if rig else None
+
+    def cleanup_rig(self):
+        if self.rig_instance:
+            self.rig_instance.cleanup_rig()
+
+
 class DummyRig(Rig):
     def __init__(self):
-        print("Dummy rig initialized")
+        logger.info("Dummy rig initialized")
 
-    def set_vfo(self, freq_hz: int):
+    def set_vfo(self, freq_hz: int, mode: str = None):
         return FreqChangeResult(error_msg="Rig control not configured")
 
     def cleanup_rig(self):
@@ -0,0 +1,129 @@
+import logging
+import threading
+import time
+
+from rig.rig_control import Rig, FreqChangeResult
+
+logger = logging.getLogger(__name__)
+
+IDLE_TIMEOUT_SECS = 120
+"""The rig connection is closed after this long without a command, so other apps can use the port"""
+
+CLOSE = "close"
+CONNECT = "connect"
+READ_VFO = "read_vfo"
+TUNE = "tune"
+STOP = "stop"
+
+
+class RigWorker:
+    """
+    Runs every command for a Rig on one background thread, so slow rig I/O never blocks the UI.
+    Only the latest tune request is kept: one arriving while another is waiting replaces it.
+    The rig keeps its connection open between commands, until IDLE_TIMEOUT_SECS pass without one.
+    on_tuned(freq_hz, FreqChangeResult) is called from the worker thread, so it must hand off to the UI thread itself.
+    The same goes for on_vfo(freq_hz or None), called with the result of each read_vfo().
+    """
+    def __init__(self, rig: Rig, on_tuned, idle_timeout: float = IDLE_TIMEOUT_SECS, on_vfo=None):
+        self.rig = rig
+        self.on_tuned = on_tuned
+        self.on_vfo = on_vfo
+        self.idle_timeout = idle_timeout
+        self.condition = threading.Condition()
+        self.pending_tune = None  # (freq_hz, mode)
+        self.connect_requested = False
+        self.vfo_requested = False
+        self.stopped = False
+        self.last_used = None  # monotonic time of the last command, None when the connection is closed
+        self.thread = threading.Thread(target=self.run, name="rig", daemon=True)
+        self.thread.start()
+
+    def tune(self, freq_hz: int, mode: str = None):
+        """Asks for the VFO (and mode, if given) to be set, replacing any tune request that hasn't started yet"""
+        with self.condition:
+            if self.pending_tune is not None:
+                logger.debug("Dropping tune to %d, superseded by %d", self.pending_tune[0], freq_hz)
+            self.pending_tune = freq_hz, mode
+            self.condition.notify()
+
+    def connect(self):
+        """Asks for the rig to be created and connected ahead of the first tune"""
+        with self.condition:
+            self.connect_requested = True
+            self.condition.notify()
+
+    def read_vfo(self):
+        """Asks for the VFO frequency to be read, after any tune. Requests made before it's read are merged"""
+        with self.condition:
+            self.vfo_requested = True
+            self.condition.notify()
+
+    def wait_for_command(self):
+        """Returns the next thing to do: (CLOSE/CONNECT/TUNE/READ_VFO/STOP, (freq_hz, mode) to tune to)"""
+        with self.condition:
+            while (self.pending_tune is None and not self.connect_requested and not self.vfo_requested
+                   and not self.stopped):
+                if self.last_used is None:
+                    self.condition.wait()
+                    continue
+                idle_left = self.last_used + self.idle_timeout - time.monotonic()
+                if idle_left <= 0:
+                    self.last_used = None
+                    return CLOSE, None
+                self.condition.wait(idle_left)
+            if self.stopped:
+                return STOP, None
+            tune = self.pending_tune
+            self.pending_tune = None
+            if tune is not None:
+                return TUNE, tune
+            if self.connect_requested:
+                self.connect_requested = False
+                return CONNECT, None
+            self.vfo_requested = False
+            return READ_VFO, None
+
+    def run(self):
+        while True:
+            command, tune = self.wait_for_command()
+            if command == STOP:
+                break
+            elif command == CLOSE:
+                logger.info("Closing rig connection after %d secs idle", self.idle_timeout)
+                self.run_command(self.rig.cleanup_rig)
+                with self.condition:
+                    self.last_used = None
+            elif command == CONNECT:
+                error_msg = self.run_command(self.rig.connect)
+                if error_msg:
+                    logger.warning("Couldn't connect to rig: %s", error_msg)
+            elif command == READ_VFO:
+                freq_hz = self.run_command(self.rig.get_vfo)
+                if self.on_vfo:
+                    self.on_vfo(freq_hz)
+            else:
+                freq_hz, mode = tune
+                result = self.run_command(self.rig.set_vfo, freq_hz, mode)
+                if result is None:
+                    result = FreqChangeResult(error_msg="Problem talking to rig")
+                self.on_tuned(freq_hz, result)
+        self.rig.cleanup_rig()
+
+    def run_command(self, command, *args):
+        with self.condition:
+            self.last_used = time.monotonic()
+        try:
+            return command(*args)
+        except Exception as e:
+            logger.exception("Rig command failed: %s", e)
+            return None
+        finally:
+            with self.condition:
+                self.last_used = time.monotonic()
+
+    def stop(self, timeout: float = 5):
+        """Closes the rig connection on the worker thread, after any command that's running"""
+        with self.condition:
+            self.stopped = True
+            self.condition.notify()
+        self.thread.join(timeout)
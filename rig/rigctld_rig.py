@@ -0,0 +1,128 @@
+import logging
+import socket
+import time
+from typing import List
+
+from rig.rig_control import Rig, FreqChangeResult
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_PORT = 4532
+
+REPLY_TIMEOUT_SECS = 2.0
+"""Longest wait for rigctld to answer a pipeline of commands"""
+
+MIN_BACKOFF_SECS = 0.5
+MAX_BACKOFF_SECS = 30.0
+"""After a failed connection, the next attempt waits this long, doubling each time"""
+
+
+class RigctldError(Exception):
+    pass
+
+
+class RigctldRig(Rig):
+    """
+    Talks to rigctld (Hamlib's network daemon) directly over TCP, so no Hamlib bindings are needed.
+    The connection stays open between commands. set_vfo sends set mode, set frequency and get frequency
+    together and then reads the three replies, so a tune costs one round trip.
+    """
+    def __init__(self, host: str = "localhost", port: int = DEFAULT_PORT):
+        self.host = host
+        self.port = port
+        self.sock = None
+        self.reader = None
+        self.backoff_secs = 0.0
+        self.next_attempt = 0.0
+
+    def connect(self):
+        """Opens the connection if it isn't already. Returns an error message on failure"""
+        if self.sock:
+            return None
+        wait_secs = self.next_attempt - time.monotonic()
+        if wait_secs > 0:
+            return "rigctld unavailable, retrying in {0:.1f} secs".format(wait_secs)
+        try:
+            self.sock = socket.create_connection((self.host, self.port), timeout=REPLY_TIMEOUT_SECS)
+        except OSError as e:
+            self.backoff_secs = min(max(self.backoff_secs * 2, MIN_BACKOFF_SECS), MAX_BACKOFF_SECS)
+            self.next_attempt = time.monotonic() + self.backoff_secs
+            logger.error("Can't connect to rigctld at %s:%s: %s", self.host, self.port, e)
+            return "Can't connect to rigctld: " + str(e)
+        self.sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        self.reader = self.sock.makefile("rb")
+        self.backoff_secs = 0.0
+        logger.info("Connected to rigctld at %s:%s", self.host, self.port)
+        return None
+
+    def send_commands(self, commands: List[str]) -> List[str]:
+        """Writes all the commands at once, then reads one reply line per command"""
+        self.sock.sendall("".join(command + "\n" for command in commands).encode())
+        replies = []
+        for _ in commands:
+            line = self.reader.readline()
+            if not line:
+                raise RigctldError("rigctld closed the connection")
+            replies.append(line.decode().strip())
+        return replies
+
+    def pipeline(self, commands: List[str]) -> List[str]:
+        """send_commands(), reconnecting once if the open connection turns out to be dead"""
+        error_msg = self.connect()
+        if error_msg:
+            raise RigctldError(error_msg)
+        try:
+            return self.send_commands(commands)
+        except (OSError, RigctldError) as e:
+            logger.warning("rigctld connection lost (%s), reconnecting", e)
+            self.cleanup_rig()
+        error_msg = self.connect()
+        if error_msg:
+            raise RigctldError(error_msg)
+        try:
+            return self.send_commands(commands)
+        except (OSError, RigctldError):
+            self.cleanup_rig()
+            raise
+
+    def set_vfo(self, freq_hz: int, mode: str = None) -> FreqChangeResult:
+        commands = ["F {0}".format(freq_hz), "f"]
+        if mode:
+            commands.insert(0, "M {0} 0".format(mode))  # passband 0 keeps the radio's default for the mode
+        try:
+            replies = self.pipeline(commands)
+        except (OSError, RigctldError) as e:
+            return FreqChangeResult(error_msg=str(e))
+        logger.debug("rigctld replies: %s", replies)
+        for command, reply in zip(commands[:-1], replies):
+            if reply != "RPRT 0":
+                return FreqChangeResult(error_msg="rigctld refused '{0}': {1}".format(command, reply))
+        try:
+            new_freq = int(float(replies[-1]))
+        except ValueError:
+            return FreqChangeResult(error_msg="rigctld couldn't read the frequency: " + replies[-1])
+        if new_freq != freq_hz:
+            return FreqChangeResult(error_msg="Radio is on {0} Hz".format(replies[-1]))
+        return FreqChangeResult(success=True)
+
+    def get_vfo(self):
+        try:
+            reply = self.pipeline(["f"])[0]
+            return int(float(reply))
+        except (OSError, RigctldError, ValueError) as e:
+            logger.debug("Couldn't read the frequency: %s", e)
+            return None
+
+    def cleanup_rig(self):
+        if self.sock:
+            self.reader.close()
+            self.sock.close()
+        self.sock = None
+        self.reader = None
+
+
+if __name__ == '__main__':
+    rig = RigctldRig()
+    result = rig.set_vfo(7012345, "CW")
+    print("success:", result.success, "error:", result.error_msg)
+    rig.cleanup_rig()
@@ -1,58 +1,92 @@
+import logging
+
 import serial
 from serial import SerialException
 
+from rig import civ
 from rig.rig_control import Rig, FreqChangeResult
 
+logger = logging.getLogger(__name__)
 
-def format_freq_set_cmd(hz_int: int) -> bytearray:
-    """
-    For a frequency like 7.123.456 we need to send "reversed" data like:
-    ["0x00","0x56","0x34","0x12","0x07","0x00"]
-    """
-    hz = str(hz_int)
-    while len(hz) < 8:
-        hz = '0' + hz
-    hex_str = "FE FE 94 E0 00 {0} {1} {2} {3} 00 FD".format(hz[6:8], hz[4:6], hz[2:4], hz[0:2])
-    return bytearray.fromhex(hex_str)
+REPLY_TIMEOUT_SECS = 0.5
+"""Longest wait for each ack or read-back; a reply usually arrives within a few milliseconds"""
 
 
 class Serial7300Rig(Rig):
-    def __init__(self, serial_port, baud_rate):
+    def __init__(self, serial_port, baud_rate, civ_address=civ.IC7300_ADDRESS):
         self.ser = None
+        self.civ = None
         self.serial_port = serial_port
         self.baud_rate = baud_rate
+        # "0x94" from rig.cfg
+        self.civ_address = int(civ_address, 16) if isinstance(civ_address, str) else civ_address
 
-    def set_vfo(self, freq_hz: int) -> FreqChangeResult:
-        # reconnecting every time so other apps can use the port
+    def connect(self):
+        """Opens the serial port if it isn't already. The RigWorker closes it again when idle"""
+        if self.ser and self.ser.is_open:
+            return None
         try:
             self.ser = serial.Serial(self.serial_port, self.baud_rate)
         except SerialException as se:
-            print(se)
-            return FreqChangeResult(error_msg=se.strerror)
+            logger.error("%s", se)
+            self.ser = None
+            return se.strerror or str(se)
         self.ser.setDTR(False)
         self.ser.setRTS(False)
+        self.civ = civ.CivConnection(self.ser, self.civ_address, on_transceive=self.on_transceive)
+        return None
 
-        self.send_freq_set_cmd(freq_hz)
-        self.ser.close()
-
-        # returning unknown type; could read back the frequency to make sure it matches
-        return FreqChangeResult()
+    def set_vfo(self, freq_hz: int, mode: str = None) -> FreqChangeResult:
+        """Sets the frequency, waits for the radio's ack, then reads the frequency back to confirm it"""
+        error_msg = self.connect()
+        if error_msg:
+            return FreqChangeResult(error_msg=error_msg)
+        try:
+            logger.debug("setting freq to %d, mode %s", freq_hz, mode)
+            civ_mode = civ.HAMLIB_MODES.get(mode)
+            if civ_mode and not self.civ.set_mode(civ_mode, REPLY_TIMEOUT_SECS):
+                return FreqChangeResult(error_msg="Radio refused mode " + mode)
+            if not self.civ.set_freq(freq_hz, REPLY_TIMEOUT_SECS):
+                return FreqChangeResult(error_msg="Radio refused the frequency")
+            new_freq = self.civ.read_freq(REPLY_TIMEOUT_SECS)
+        except civ.CivError as ce:
+            logger.error("%s", ce)
+            return FreqChangeResult(error_msg=str(ce))
+        except SerialException as se:
+            logger.error("%s", se)
+            self.cleanup_rig()  # reopened on the next call
+            return FreqChangeResult(error_msg=str(se))
+        logger.debug("read back freq %d", new_freq)
+        if new_freq != freq_hz:
+            return FreqChangeResult(error_msg="Radio is on {0} Hz".format(new_freq))
+        return FreqChangeResult(success=True)
 
-    def send_freq_set_cmd(self, freq_hz: int) -> None:
-        """Sends the command to set the frequency, and reads the reponse (echo or empty)"""
-        freq_cmd = format_freq_set_cmd(freq_hz)
+    def get_vfo(self):
+        if self.connect():
+            return None
+        try:
+            return self.civ.read_freq(REPLY_TIMEOUT_SECS)
+        except civ.CivError as ce:
+            logger.debug("%s", ce)
+            return None
+        except SerialException as se:
+            logger.error("%s", se)
+            self.cleanup_rig()
+            return None
 
-        print("setting freq to", freq_hz, "with freq_cmd", freq_cmd)
-        self.ser.write(freq_cmd)
-        self.ser.flush()
+    def on_transceive(self, frame: civ.Frame):
+        if frame.command == civ.CMD_TRANSCEIVE_FREQ:
+            logger.debug("Radio moved to %d", civ.bcd_to_freq(frame.data))
 
-        set_response = self.ser.read(self.ser.in_waiting)
-        print("set_response", set_response)
-    
     def cleanup_rig(self):
-        pass
+        if self.ser:
+            self.ser.close()
+        self.ser = None
+        self.civ = None
 
 
 if __name__ == '__main__':
     rig = Serial7300Rig("COM3", 115200)
-    rig.set_vfo(7012345)
+    result = rig.set_vfo(7012345)
+    print("success:", result.success, "error:", result.error_msg)
+    rig.cleanup_rig()
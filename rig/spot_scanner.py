@@ -0,0 +1,114 @@
+import logging
+import threading
+import time
+from collections import deque
+from typing import List
+
+from activation_info import ActivationInfo
+from band_plan import BANDS, band_for_freq
+from rig.rig_control import hamlib_mode_for
+from rig.rig_worker import RigWorker
+
+logger = logging.getLogger(__name__)
+
+SCAN_ORDERS = ("age", "band", "freq")
+
+DEFAULT_DWELL_SECS = 10.0
+
+MIN_DWELL_SECS = 1.0
+
+BAND_RANK = {name: rank for rank, (name, _, _) in enumerate(BANDS)}
+
+
+def order_spots(spots: List[ActivationInfo], order: str) -> List[ActivationInfo]:
+    """
+    Newest first for "age", low to high frequency for "freq".
+    "band" goes through the bands in BANDS order, and by frequency within each band.
+    """
+    if order == "age":
+        return sorted(spots, key=lambda spot: spot.spot_time, reverse=True)
+    if order == "band":
+        return sorted(spots, key=lambda spot: (BAND_RANK.get(band_for_freq(spot.frequency_hz), len(BANDS)),
+                                               spot.frequency_hz))
+    return sorted(spots, key=lambda spot: spot.frequency_hz)
+
+
+class SpotScanner:
+    """
+    Steps the rig through the active spots on its own thread, dwelling dwell_secs on each.
+    Hops are scheduled against the monotonic clock from when the scan started, so they don't drift,
+    and tuning goes through the RigWorker, so neither rig I/O nor the UI delays the schedule.
+    The next spot and its mode are worked out right after each hop, and checked again at hop time:
+    a spot that a refresh moved or dropped, or that was marked worked, is skipped.
+    on_hop(spot) is called from the scan thread, so it must hand off to the UI thread itself.
+    """
+    def __init__(self, rig_worker: RigWorker, on_hop):
+        self.rig_worker = rig_worker
+        self.on_hop = on_hop
+        self.lock = threading.Lock()
+        self.live_spots = []
+        self.live_keys = set()
+        self.stop_event = threading.Event()
+        self.thread = None
+
+    def update_spots(self, spots: List[ActivationInfo]):
+        """The current top list, after a refresh or a spot being marked worked"""
+        with self.lock:
+            self.live_spots = list(spots)
+            self.live_keys = {spot.identity_key() for spot in spots}
+
+    def is_running(self) -> bool:
+        return self.thread is not None and self.thread.is_alive()
+
+    def start(self, order: str, dwell_secs: float):
+        self.stop()
+        self.stop_event = threading.Event()
+        self.thread = threading.Thread(target=self.run, args=(order, max(dwell_secs, MIN_DWELL_SECS),
+                                                              self.stop_event), name="scan", daemon=True)
+        self.thread.start()
+        logger.info("Scanning by %s, %.1f secs per spot", order, dwell_secs)
+
+    def stop(self):
+        if self.is_running():
+            self.stop_event.set()
+            self.thread.join()
+            logger.info("Scan stopped")
+
+    def is_live(self, spot: ActivationInfo) -> bool:
+        with self.lock:
+            return spot.identity_key() in self.live_keys
+
+    def next_spot(self, plan: deque, order: str):
+        """Takes the next live spot from plan, starting a new pass when it runs out. None if there are no spots"""
+        for _ in range(2):
+            while plan:
+                spot = plan.popleft()
+                if self.is_live(spot):
+                    return spot
+            with self.lock:
+                plan.extend(order_spots(self.live_spots, order))
+        return None
+
+    def prepare(self, plan: deque, order: str):
+        spot = self.next_spot(plan, order)
+        if spot is None:
+            return None
+        return spot, hamlib_mode_for(spot.mode.mode_str, spot.frequency_hz)
+
+    def run(self, order: str, dwell_secs: float, stop_event: threading.Event):
+        plan = deque()
+        prepared = self.prepare(plan, order)
+        next_hop = time.monotonic()
+        while not stop_event.wait(max(0.0, next_hop - time.monotonic())):
+            if prepared and not self.is_live(prepared[0]):
+                prepared = self.prepare(plan, order)  # changed since it was prepared
+            if prepared:
+                spot, mode = prepared
+                self.rig_worker.tune(spot.frequency_hz, mode)
+                self.on_hop(spot)
+            next_hop += dwell_secs
+            late = time.monotonic() - next_hop
+            if late > 0:
+                # e.g. after the computer slept: skip the missed hops rather than rushing through them
+                next_hop += dwell_secs * (int(late // dwell_secs) + 1)
+            prepared = self.prepare(plan, order)
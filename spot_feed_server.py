@@ -0,0 +1,263 @@
+"""
+Headless mode which polls the spot APIs once for many operators, e.g. every laptop at a multi-station event.
+
+    python -m spot_feed_server --port 8765 --max-age 60
+
+GET /spots returns the current spot of each activation as JSON, with an ETag so unchanged polls get a 304.
+GET /events is a server-sent events stream with the delta of each refresh that changed anything.
+Other instances use it instead of the public APIs with:
+    [SPOT_FEED]
+    url = http://192.168.1.10:8765
+Worked spots, mode filters and duplicate removal still happen in each instance, so each operator's view is their own.
+"""
+import argparse
+import datetime
+import hashlib
+import json
+import logging
+import queue
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import List
+
+from activation_info import ActivationInfo
+from data_query import data_fetcher
+from data_query.poll_scheduler import PollScheduler
+from data_query.spot_store import SpotDelta, SpotStore
+from log_config import configure_logging
+from storage.settings import Settings
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_PORT = 8765
+SPOT_LIMIT = 50
+
+MIN_POLL_SECS = 1.0
+PUSH_DELAY_SECS = 0.5
+"""Pushed spots arriving within this are published together"""
+
+KEEPALIVE_SECS = 15
+"""An event stream with nothing to send gets a comment this often, so idle proxies and clients don't drop it"""
+
+MAX_QUEUED_EVENTS = 100
+"""A subscriber this far behind is disconnected; it fetches /spots again when it reconnects"""
+
+
+def body_etag(body: bytes) -> str:
+    """From the content rather than the version, which starts again at 0 when the server restarts"""
+    return '"' + hashlib.sha1(body).hexdigest() + '"'
+
+
+def delta_to_dict(delta: SpotDelta, version: int) -> dict:
+    return {"version": version,
+            "added": [spot.to_dict() for spot in delta.added],
+            "removed": [spot.to_dict() for spot in delta.removed],
+            "changed": [{"old": old.to_dict(), "new": new.to_dict()} for old, new in delta.changed],
+            "respotted": [spot.to_dict() for spot in delta.respotted]}
+
+
+class SpotFeed:
+    """
+    The published spots, serialized once per change rather than per request,
+    and the event queue of each /events subscriber. Thread-safe.
+    """
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.version = 0
+        self.body = b"[]"
+        self.etag = body_etag(self.body)
+        self.subscribers = set()
+
+    def publish(self, spots: List[ActivationInfo], delta: SpotDelta):
+        body = json.dumps([spot.to_dict() for spot in spots]).encode()
+        etag = body_etag(body)
+        with self.lock:
+            self.version += 1
+            self.body = body
+            self.etag = etag
+            event = "id: {0}\nevent: delta\ndata: {1}\n\n".format(
+                self.version, json.dumps(delta_to_dict(delta, self.version))).encode()
+            subscribers = list(self.subscribers)
+        for subscriber in subscribers:
+            try:
+                subscriber.put_nowait(event)
+            except queue.Full:
+                logger.info("Event subscriber fell behind, disconnecting it")
+                self.unsubscribe(subscriber)
+
+    def current(self):
+        """(body, etag) of the latest spots"""
+        with self.lock:
+            return self.body, self.etag
+
+    def subscribe(self) -> queue.Queue:
+        subscriber = queue.Queue(maxsize=MAX_QUEUED_EVENTS)
+        with self.lock:
+            self.subscribers.add(subscriber)
+        return subscriber
+
+    def is_subscribed(self, subscriber: queue.Queue) -> bool:
+        with self.lock:
+            return subscriber in self.subscribers
+
+    def unsubscribe(self, subscriber: queue.Queue):
+        with self.lock:
+            self.subscribers.discard(subscriber)
+
+    def close(self):
+        """Ends every event stream"""
+        with self.lock:
+            subscribers = list(self.subscribers)
+            self.subscribers.clear()
+        for subscriber in subscribers:
+            subscriber.put(None)
+
+
+def make_handler(feed: SpotFeed):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def do_GET(self):
+            if self.path == "/spots":
+                self.send_spots()
+            elif self.path == "/events":
+                self.send_events()
+            else:
+                self.send_error(404)
+
+        def send_spots(self):
+            body, etag = feed.current()
+            if self.headers.get("If-None-Match") == etag:
+                self.send_response(304)
+                self.send_header("ETag", etag)
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+                return
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.send_header("ETag", etag)
+            self.end_headers()
+            self.wfile.write(body)
+
+        def send_events(self):
+            subscriber = feed.subscribe()
+            self.send_response(200)
+            self.send_header("Content-Type", "text/event-stream")
+            self.send_header("Cache-Control", "no-cache")
+            # chunked, so clients can hand over each event as it arrives instead of reading to the end
+            self.send_header("Transfer-Encoding", "chunked")
+            self.end_headers()
+            self.close_connection = True
+            try:
+                self.write_chunk(b": connected\n\n")
+                while True:
+                    try:
+                        event = subscriber.get(timeout=KEEPALIVE_SECS)
+                    except queue.Empty:
+                        event = b": keepalive\n\n"
+                    # None is queued by close(), and a subscriber which fell behind is dropped by publish()
+                    if event is None or not feed.is_subscribed(subscriber):
+                        self.write_chunk(b"")  # the last chunk
+                        return
+                    self.write_chunk(event)
+            except OSError:
+                pass  # the client went away
+            finally:
+                feed.unsubscribe(subscriber)
+
+        def write_chunk(self, data: bytes):
+            self.wfile.write(b"%x\r\n%s\r\n" % (len(data), data))
+            self.wfile.flush()
+
+        def log_message(self, format_str, *args):
+            logger.debug("%s " + format_str, self.address_string(), *args)
+
+    return Handler
+
+
+class SpotFeedServer:
+    """
+    Polls the backends like the app does, merges each refresh into a SpotStore and publishes the result.
+    A DX cluster in the settings pushes its spots through straight away.
+    """
+    def __init__(self, settings: Settings, port: int = DEFAULT_PORT, host: str = "", max_age: int = 60):
+        self.max_age = max_age
+        self.feed = SpotFeed()
+        self.wake = threading.Event()
+        self.stop_event = threading.Event()
+        extra_lookups = []
+        if settings.dx_cluster_host:
+            from data_query.backends.dx_cluster_lookup import DxClusterLookup
+            extra_lookups.append(DxClusterLookup(settings.dx_cluster_host, settings.dx_cluster_port,
+                                                 settings.dx_cluster_callsign, self.on_spot_pushed))
+        self.data_fetcher = data_fetcher.DataFetcher(base_urls=settings.api_base_urls, record_file=settings.record_file,
+                                                     replay_file=settings.replay_file,
+                                                     replay_speed=settings.replay_speed,
+                                                     scheduler=PollScheduler(settings.refresh_interval * 60),
+                                                     extra_lookups=extra_lookups)
+        self.spot_store = SpotStore()
+        self.httpd = ThreadingHTTPServer((host, port), make_handler(self.feed))
+        self.http_thread = None
+
+    def url(self) -> str:
+        host, port = self.httpd.server_address[:2]
+        return "http://{0}:{1}".format(host or "localhost", port)
+
+    def on_spot_pushed(self, backend_name):
+        """Called on a push backend's thread when a spot arrives"""
+        self.data_fetcher.scheduler.make_due(backend_name)
+        self.wake.set()
+
+    def start(self):
+        """Serves HTTP on a background thread"""
+        self.http_thread = threading.Thread(target=self.httpd.serve_forever, name="spot-feed-http", daemon=True)
+        self.http_thread.start()
+        logger.info("Spot feed at %s", self.url())
+
+    def refresh(self):
+        now = datetime.datetime.now(datetime.timezone.utc)
+        spots, errors = self.data_fetcher.retrieve_filtered_spots_by_time(SPOT_LIMIT, self.max_age, now)
+        delta = self.spot_store.merge_all(spots, self.data_fetcher.get_activation_types())
+        if errors:
+            logger.warning("Problem querying %s", [error.args[0] for error in errors])
+        if not delta.is_empty() or self.feed.version == 0:
+            self.feed.publish(self.spot_store.current_spots(), delta)
+            logger.info("Published: %s", delta.summary())
+
+    def poll_forever(self):
+        while not self.stop_event.is_set():
+            self.wake.clear()
+            try:
+                self.refresh()
+            except Exception as e:
+                # like RefreshWorker, one bad refresh mustn't stop the feed for every subscriber
+                logger.exception("Problem during refresh: %s", e)
+            delay = max(MIN_POLL_SECS, self.data_fetcher.scheduler.secs_until_due())
+            if self.wake.wait(delay) and not self.stop_event.is_set():
+                time.sleep(PUSH_DELAY_SECS)
+
+    def stop(self):
+        self.stop_event.set()
+        self.wake.set()
+        self.feed.close()
+        self.httpd.shutdown()
+        self.httpd.server_close()
+        self.data_fetcher.shutdown()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument("--host", default="", help="address to listen on, default all")
+    parser.add_argument("--max-age", type=int, default=60, help="minutes; clients can only filter within this")
+    args = parser.parse_args()
+    my_settings = Settings()
+    configure_logging(my_settings.log_level, my_settings.log_sink)
+    feed_server = SpotFeedServer(my_settings, args.port, args.host, args.max_age)
+    feed_server.start()
+    try:
+        feed_server.poll_forever()
+    except KeyboardInterrupt:
+        feed_server.stop()
@@ -0,0 +1,53 @@
+import tkinter as tk
+
+from metrics import METRICS, Metrics
+
+REFRESH_MS = 2000
+
+
+def format_value(name: str, value: float) -> str:
+    if name.endswith("_seconds"):
+        return "{0:.1f} ms".format(value * 1000)
+    if name.endswith("_bytes"):
+        return "{0:.1f} kB".format(value / 1000)
+    return "{0:g}".format(value)
+
+
+def format_metrics(metrics_dict: dict) -> str:
+    lines = ["{0:<44} {1:>6} {2:>10} {3:>10} {4:>10}".format("timings (last 200)", "count", "p50", "p90", "max")]
+    for name, series in sorted(metrics_dict["histograms"].items()):
+        for labels, summary in sorted(series.items()):
+            lines.append("{0:<44} {1:>6} {2:>10} {3:>10} {4:>10}".format(
+                name + labels, summary["count"], format_value(name, summary["p50"]),
+                format_value(name, summary["p90"]), format_value(name, summary["max"])))
+    lines.append("")
+    for section in ("counters", "gauges"):
+        for name, series in sorted(metrics_dict[section].items()):
+            for labels, value in sorted(series.items()):
+                lines.append("{0:<44} {1:>10g}".format(name + labels, value))
+    return "\n".join(lines)
+
+
+class StatsPanel:
+    """Window showing the refresh metrics, updated every REFRESH_MS while it's open"""
+    def __init__(self, root, metrics: Metrics = METRICS):
+        self.metrics = metrics
+        self.window = tk.Toplevel(root)
+        self.window.title("Refresh stats")
+        self.text = tk.Text(self.window, width=90, height=30, font="TkFixedFont")
+        self.text.pack(fill='both', expand=True)
+        self.update()
+
+    def is_open(self) -> bool:
+        return bool(self.window.winfo_exists())
+
+    def update(self):
+        if not self.is_open():
+            return
+        self.text.delete("1.0", tk.END)
+        self.text.insert(tk.END, format_metrics(self.metrics.to_dict()))
+        self.window.after(REFRESH_MS, self.update)
+
+    def raise_window(self):
+        self.window.deiconify()
+        self.window.lift()
@@ -1,8 +1,11 @@
+import logging
 from configparser import ConfigParser
 
 import helpers
 from helpers import ModeFilter
 
+logger = logging.getLogger(__name__)
+
 
 class Settings:
     CONFIG_FILE = helpers.local_file_path(__file__, "config.ini")
@@ -10,6 +13,17 @@ class Settings:
     SETTINGS_SECTION = "SETTINGS"
     REFRESH_INTERVAL_KEY = "refresh_interval"
     MAX_AGE_KEY = "max_age"
+    LOGGING_SECTION = "LOGGING"
+    LOG_LEVEL_KEY = "level"
+    LOG_SINK_KEY = "sink"
+    API_URLS_SECTION = "API_URLS"
+    RECORDING_SECTION = "RECORDING"
+    SPOT_HISTORY_SECTION = "SPOT_HISTORY"
+    SCAN_SECTION = "SCAN"
+    METRICS_SECTION = "METRICS"
+    DEBUG_SECTION = "DEBUG"
+    DX_CLUSTER_SECTION = "DX_CLUSTER"
+    SPOT_FEED_SECTION = "SPOT_FEED"
 
     def __init__(self):
         config = ConfigParser()
@@ -18,6 +32,33 @@ class Settings:
 
         self.refresh_interval = config.getint(self.SETTINGS_SECTION, self.REFRESH_INTERVAL_KEY, fallback=2)
         self.max_age = config.getint(self.SETTINGS_SECTION, self.MAX_AGE_KEY, fallback=30)
+        # level is TRACE/DEBUG/INFO/WARNING/ERROR, sink is stdout, stderr or a file path
+        self.log_level = config.get(self.LOGGING_SECTION, self.LOG_LEVEL_KEY, fallback="INFO")
+        self.log_sink = config.get(self.LOGGING_SECTION, self.LOG_SINK_KEY, fallback="stderr")
+        # activation type ("sota", "pota") -> base URL to use instead of the public API
+        self.api_base_urls = dict(config[self.API_URLS_SECTION]) if config.has_section(self.API_URLS_SECTION) else {}
+        # record_file captures raw API responses, replay_file serves them back instead of using the network
+        self.record_file = config.get(self.RECORDING_SECTION, "record_file", fallback="")
+        self.replay_file = config.get(self.RECORDING_SECTION, "replay_file", fallback="")
+        self.replay_speed = config.getfloat(self.RECORDING_SECTION, "replay_speed", fallback=1.0)
+        # days of spots kept in the history database, 0 keeps them all
+        self.history_retention_days = config.getint(self.SPOT_HISTORY_SECTION, "retention_days", fallback=30)
+        # scan order is age, band or freq
+        self.scan_order = config.get(self.SCAN_SECTION, "order", fallback="age")
+        self.scan_dwell_secs = config.getfloat(self.SCAN_SECTION, "dwell_secs", fallback=10.0)
+        # metrics are written to file (prometheus or json format) when it's set
+        self.metrics_file = config.get(self.METRICS_SECTION, "file", fallback="")
+        self.metrics_format = config.get(self.METRICS_SECTION, "format", fallback="prometheus")
+        self.metrics_interval_secs = config.getfloat(self.METRICS_SECTION, "interval_secs", fallback=30.0)
+        # a DX cluster node to take SOTA/POTA spots from as they're posted, when host is set
+        self.dx_cluster_host = config.get(self.DX_CLUSTER_SECTION, "host", fallback="")
+        self.dx_cluster_port = config.getint(self.DX_CLUSTER_SECTION, "port", fallback=7300)
+        self.dx_cluster_callsign = config.get(self.DX_CLUSTER_SECTION, "callsign", fallback="")
+        # a spot_feed_server to take spots from instead of the public APIs and DX cluster, when url is set
+        self.spot_feed_url = config.get(self.SPOT_FEED_SECTION, "url", fallback="")
+        # samples memory use every memory_interval_secs and logs sustained growth, F12 also starts it
+        self.memory_watchdog = config.getboolean(self.DEBUG_SECTION, "memory_watchdog", fallback=False)
+        self.memory_interval_secs = config.getfloat(self.DEBUG_SECTION, "memory_interval_secs", fallback=300.0)
 
         self.mode_filters = []
         for mode in ModeFilter:
@@ -34,7 +75,7 @@ class Settings:
             config.set(self.MODE_SECTION, mode_key, str(mode_filters_dict[mode_key].get()))
         with open(self.CONFIG_FILE, 'w') as f:
             config.write(f)
-        print("Updated mode filters in", self.CONFIG_FILE)
+        logger.debug("Updated mode filters in %s", self.CONFIG_FILE)
 
     def save_other_preferences(self, refresh_interval_ms, max_age):
         config = ConfigParser()
@@ -46,4 +87,15 @@ class Settings:
         config.set(self.SETTINGS_SECTION, self.MAX_AGE_KEY, str(max_age))
         with open(self.CONFIG_FILE, 'w') as f:
             config.write(f)
-        print("Updated interval and max age in", self.CONFIG_FILE)
+        logger.debug("Updated interval and max age in %s", self.CONFIG_FILE)
+
+    def save_scan_preferences(self, order, dwell_secs):
+        config = ConfigParser()
+        config.read(self.CONFIG_FILE)
+        if not config.has_section(self.SCAN_SECTION):
+            config.add_section(self.SCAN_SECTION)
+        config.set(self.SCAN_SECTION, "order", order)
+        config.set(self.SCAN_SECTION, "dwell_secs", str(dwell_secs))
+        with open(self.CONFIG_FILE, 'w') as f:
+            config.write(f)
+        logger.debug("Updated scan order and dwell in %s", self.CONFIG_FILE)
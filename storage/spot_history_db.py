@@ -0,0 +1,225 @@
+import datetime
+import logging
+import queue
+import sqlite3
+import threading
+import time
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import helpers
+from activation_info import ActivationInfo
+from band_plan import band_for_freq
+
+logger = logging.getLogger(__name__)
+
+# To put it at the same level as this file
+SPOT_HISTORY_FILE = helpers.local_file_path(__file__, "spot_history.db")
+
+RETENTION_DAYS = 30
+"""Spots older than this are purged. 0 keeps them forever"""
+
+PURGE_INTERVAL_SECS = 3600
+"""How often the writer thread purges spots older than the retention window"""
+
+MAX_BATCH = 5000
+"""Most spots written in one transaction"""
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS spots (
+    id INTEGER PRIMARY KEY,
+    activation_type TEXT NOT NULL,
+    callsign TEXT NOT NULL,
+    reference TEXT NOT NULL,
+    description TEXT NOT NULL,
+    frequency_hz INTEGER NOT NULL,
+    band TEXT NOT NULL,
+    mode TEXT NOT NULL,
+    spot_time INTEGER NOT NULL,
+    UNIQUE (activation_type, callsign, description, frequency_hz, mode, spot_time)
+);
+CREATE INDEX IF NOT EXISTS spots_callsign ON spots (callsign, spot_time);
+CREATE INDEX IF NOT EXISTS spots_reference ON spots (reference, spot_time);
+CREATE INDEX IF NOT EXISTS spots_band ON spots (band, spot_time);
+CREATE INDEX IF NOT EXISTS spots_time ON spots (spot_time);
+CREATE TABLE IF NOT EXISTS band_hour_activity (
+    day TEXT NOT NULL,
+    hour INTEGER NOT NULL,
+    band TEXT NOT NULL,
+    spots INTEGER NOT NULL,
+    PRIMARY KEY (day, hour, band)
+);
+"""
+
+INSERT_SPOT = """
+INSERT OR IGNORE INTO spots (activation_type, callsign, reference, description, frequency_hz, band, mode, spot_time)
+VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+"""
+
+COUNT_SPOT = """
+INSERT INTO band_hour_activity (day, hour, band, spots) VALUES (?, ?, ?, 1)
+ON CONFLICT (day, hour, band) DO UPDATE SET spots = spots + 1
+"""
+
+OUT_OF_BAND = "other"
+
+
+def spot_row(spot: ActivationInfo) -> tuple:
+    return (spot.activation_type, spot.callsign, spot.reference(), spot.description, spot.frequency_hz,
+            band_for_freq(spot.frequency_hz) or OUT_OF_BAND, spot.mode.mode_str, int(spot.spot_time.timestamp()))
+
+
+def utc_day_and_hour(epoch_secs: int) -> Tuple[str, int]:
+    spot_time = datetime.datetime.fromtimestamp(epoch_secs, datetime.timezone.utc)
+    return spot_time.strftime("%Y%m%d"), spot_time.hour
+
+
+class SpotHistoryDB:
+    """
+    Keeps every spot the backends return, for questions a single refresh can't answer.
+    add_spots() only queues the spots; a writer thread inserts them in batches, one transaction per batch.
+    The database is opened, and its schema created, on the writer thread, so creating this doesn't wait on disk.
+    It's in WAL mode, so queries on their own connection aren't blocked by the writer.
+    A re-spot seen by several refreshes is stored once, and each newly stored spot adds one to the
+    band_hour_activity count for its band and UTC hour, so the activity queries don't scan the spots table.
+    """
+    def __init__(self, path: str = SPOT_HISTORY_FILE, retention_days: int = RETENTION_DAYS):
+        self.path = path
+        self.retention_days = retention_days
+        self.pending = queue.Queue()
+        self.read_lock = threading.Lock()
+        self.read_connection = None
+        self.ready = threading.Event()  # set once the writer has created the schema
+        self.writer = threading.Thread(target=self.run_writer, name="spot-history", daemon=True)
+        self.writer.start()
+
+    def connect(self):
+        connection = sqlite3.connect(self.path, timeout=10, check_same_thread=False)
+        connection.execute("PRAGMA synchronous=NORMAL")
+        return connection
+
+    def add_spots(self, spots: Iterable[ActivationInfo]):
+        """Queues spots to be written, without waiting for the database"""
+        spots = list(spots)
+        if spots:
+            self.pending.put(spots)
+
+    def create_schema(self, connection):
+        try:
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.executescript(SCHEMA)
+        except sqlite3.Error as e:
+            logger.error("Problem creating %s: %s", self.path, e)
+        finally:
+            self.ready.set()
+
+    def run_writer(self):
+        connection = self.connect()
+        self.create_schema(connection)
+        last_purge = 0
+        while True:
+            batch = self.pending.get()
+            stopping = batch is None
+            batch = batch or []
+            # take whatever else has queued up meanwhile, so a burst goes in one transaction
+            while len(batch) < MAX_BATCH:
+                try:
+                    more = self.pending.get_nowait()
+                except queue.Empty:
+                    break
+                if more is None:
+                    stopping = True
+                    break
+                batch.extend(more)
+            try:
+                if batch:
+                    self.write_batch(connection, batch)
+                if self.retention_days and time.monotonic() - last_purge > PURGE_INTERVAL_SECS:
+                    self.purge(connection)
+                    last_purge = time.monotonic()
+            except sqlite3.Error as e:
+                logger.error("Problem writing %s: %s", self.path, e)
+            except Exception as e:
+                # the thread must keep going, or pending would grow forever
+                logger.exception("Problem writing %s: %s", self.path, e)
+            if stopping:
+                connection.close()
+                return
+
+    def write_batch(self, connection, spots: List[ActivationInfo]):
+        added = 0
+        with connection:
+            for spot in spots:
+                row = spot_row(spot)
+                if connection.execute(INSERT_SPOT, row).rowcount:
+                    added += 1
+                    day, hour = utc_day_and_hour(row[-1])
+                    connection.execute(COUNT_SPOT, (day, hour, row[5]))
+        logger.debug("%d of %d spots were new in %s", added, len(spots), self.path)
+
+    def purge(self, connection):
+        cutoff = time.time() - self.retention_days * 86400
+        cutoff_day, _ = utc_day_and_hour(int(cutoff))
+        with connection:
+            deleted = connection.execute("DELETE FROM spots WHERE spot_time < ?", (cutoff,)).rowcount
+            connection.execute("DELETE FROM band_hour_activity WHERE day < ?", (cutoff_day,))
+        if deleted:
+            logger.info("Purged %d spots older than %d days from %s", deleted, self.retention_days, self.path)
+
+    def query(self, sql: str, params: tuple = ()) -> list:
+        self.ready.wait()
+        with self.read_lock:
+            if not self.read_connection:
+                self.read_connection = self.connect()
+            return self.read_connection.execute(sql, params).fetchall()
+
+    def band_activity(self, days: int = 7) -> Dict[str, int]:
+        """Band -> spots over the last days, from the hourly aggregates"""
+        since_day, _ = utc_day_and_hour(int(time.time() - days * 86400))
+        rows = self.query("SELECT band, SUM(spots) FROM band_hour_activity WHERE day >= ? GROUP BY band",
+                          (since_day,))
+        return dict(rows)
+
+    def hourly_activity(self, band: Optional[str] = None, days: int = 7) -> Dict[int, int]:
+        """UTC hour -> spots over the last days, for one band or all of them"""
+        since_day, _ = utc_day_and_hour(int(time.time() - days * 86400))
+        if band:
+            rows = self.query("SELECT hour, SUM(spots) FROM band_hour_activity WHERE day >= ? AND band = ? "
+                              "GROUP BY hour", (since_day, band))
+        else:
+            rows = self.query("SELECT hour, SUM(spots) FROM band_hour_activity WHERE day >= ? GROUP BY hour",
+                              (since_day,))
+        return dict(rows)
+
+    def activation_days(self, reference: str) -> List[Tuple[str, str]]:
+        """(yyyymmdd, callsign) for each day someone was spotted at a summit or park, newest first"""
+        rows = self.query("SELECT DISTINCT strftime('%Y%m%d', spot_time, 'unixepoch'), callsign FROM spots "
+                          "WHERE reference = ? ORDER BY 1 DESC", (reference,))
+        return rows
+
+    def last_qsy(self, callsign: str) -> Optional[Tuple[datetime.datetime, int, int]]:
+        """(when, from Hz, to Hz) for the activator's latest change of frequency, or None if there wasn't one"""
+        rows = self.query("SELECT spot_time, frequency_hz FROM spots WHERE callsign = ? ORDER BY spot_time DESC",
+                          (callsign,))
+        for (spot_time, to_hz), (_, from_hz) in zip(rows, rows[1:]):
+            if from_hz != to_hz:
+                return datetime.datetime.fromtimestamp(spot_time, datetime.timezone.utc), from_hz, to_hz
+        return None
+
+    def close(self):
+        """Writes out anything still queued"""
+        self.pending.put(None)
+        self.writer.join(timeout=10)
+        with self.read_lock:
+            if self.read_connection:
+                self.read_connection.close()
+                self.read_connection = None
+
+
+if __name__ == '__main__':
+    def print_activity():
+        history_db = SpotHistoryDB()
+        print("Spots by band over the last week:", history_db.band_activity())
+        print("Spots by UTC hour over the last week:", sorted(history_db.hourly_activity().items()))
+        history_db.close()
+
+    print_activity()
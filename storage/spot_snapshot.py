@@ -0,0 +1,51 @@
+import json
+import logging
+import os
+import time
+from typing import Dict, List, Tuple
+
+import helpers
+from activation_info import ActivationInfo
+
+logger = logging.getLogger(__name__)
+
+# To put it at the same level as this file
+SNAPSHOT_FILE = helpers.local_file_path(__file__, "snapshot.json")
+
+SNAPSHOT_TTL_MINS = 60
+"""A snapshot older than this isn't shown at startup"""
+
+
+def save_snapshot(spots: List[ActivationInfo], fetch_times: Dict[str, float]):
+    """
+    Writes the last reduced spot list, with the time each backend was last fetched (epoch seconds).
+    Written to a temporary file first so a crash can't leave a half-written snapshot.
+    """
+    snapshot = {"saved_at": time.time(), "fetch_times": fetch_times, "spots": [spot.to_string() for spot in spots]}
+    temp_file = SNAPSHOT_FILE + ".tmp"
+    with open(temp_file, 'w') as snapshot_file:
+        json.dump(snapshot, snapshot_file)
+    os.replace(temp_file, SNAPSHOT_FILE)
+    logger.debug("Snapshot of %d spots saved to %s", len(spots), SNAPSHOT_FILE)
+
+
+def load_snapshot() -> Tuple[List[ActivationInfo], Dict[str, float]]:
+    """
+    Reads the spots saved by save_snapshot() and the backend fetch times.
+    Returns empty results if there's no snapshot, it's unreadable, or it's older than SNAPSHOT_TTL_MINS.
+    """
+    try:
+        with open(SNAPSHOT_FILE) as snapshot_file:
+            snapshot = json.load(snapshot_file)
+        if time.time() - snapshot["saved_at"] > SNAPSHOT_TTL_MINS * 60:
+            logger.info("Snapshot is older than %d mins, not showing it", SNAPSHOT_TTL_MINS)
+            return [], {}
+        spots = [ActivationInfo.from_string(line) for line in snapshot["spots"]]
+        logger.info("Read %d spots from snapshot", len(spots))
+        return spots, snapshot["fetch_times"]
+    except FileNotFoundError:
+        logger.info("No snapshot found: %s", SNAPSHOT_FILE)
+        return [], {}
+    except (ValueError, KeyError, TypeError, IndexError) as e:
+        logger.warning("Invalid format of %s %s - ignoring it", SNAPSHOT_FILE, e)
+        return [], {}
@@ -1,11 +1,28 @@
+import logging
+import os
+import threading
 from typing import List
 
 import helpers
 from activation_info import ActivationInfo
 from helpers import get_yyyymmdd_now, is_todays_date
 
+logger = logging.getLogger(__name__)
+
 # To put it at the same level as this file
 HISTORY_FILE = helpers.local_file_path(__file__, "worked.dat")
+"""Older format, which only kept the current day. Read once to migrate it to WORKED_LOG_FILE"""
+
+WORKED_LOG_FILE = helpers.local_file_path(__file__, "worked.log")
+
+FLUSH_INTERVAL_SECS = 2.0
+"""Appends are batched and written (with fsync) at most this often"""
+
+COMPACT_MIN_DEAD_RECORDS = 200
+"""The log is rewritten once it has at least this many dead records, and more dead records than live ones"""
+
+ADDED = "+"
+REMOVED = "-"
 
 
 def load_worked_history() -> List[ActivationInfo]:
@@ -17,44 +34,189 @@ def load_worked_history() -> List[ActivationInfo]:
         with open(HISTORY_FILE) as history_file:
             saved_timestamp = history_file.readline().strip()
             if not is_todays_date(saved_timestamp):
-                print("History file is older, from", saved_timestamp, "- starting fresh")
+                logger.info("History file is older, from %s - starting fresh", saved_timestamp)
                 return []
-            print("Reading history file from", saved_timestamp)
+            logger.info("Reading history file from %s", saved_timestamp)
             history = []
             for line in history_file:
                 history_element = ActivationInfo.from_string(line.strip())
                 history.append(history_element)
-            print(len(history), "items in history file")
+            logger.info("%d items in history file", len(history))
             return history
     except FileNotFoundError:
-        print("No history file found:", HISTORY_FILE, "- starting fresh")
+        logger.info("No history file found: %s - starting fresh", HISTORY_FILE)
         return []
-    except TypeError as te:
-        print("Invalid format of", HISTORY_FILE, te, "- starting fresh")
+    except (TypeError, ValueError) as te:
+        logger.warning("Invalid format of %s %s - starting fresh", HISTORY_FILE, te)
         return []
 
 
-def save_worked_history(history: List[ActivationInfo]):
-    """Writes the entries worked today to a file"""
-    yyyymmdd = get_yyyymmdd_now()
-    with open(HISTORY_FILE, 'w') as history_file:
-        history_file.write(yyyymmdd + "\n")
-        for hist_item in history:
-            # don't save to file if the entry is from the previous day
-            if hist_item.worked_day == yyyymmdd:
-                history_file.write(hist_item.to_string() + "\n")
-    print("History saved to", HISTORY_FILE)
+class WorkedLog:
+    """
+    Append-only log of worked spots, kept across days.
+    Each line is "+|" or "-|" followed by ActivationInfo.to_string(), for marking and unmarking a spot as worked.
+    Marking a spot only appends to a buffer, which a background thread writes out every FLUSH_INTERVAL_SECS.
+    The same thread rewrites the file without dead records once enough of them pile up.
+    Lookups go through in-memory indexes by worked_key() and by UTC day, so they don't depend on history size.
+    """
+    def __init__(self, path: str = WORKED_LOG_FILE):
+        self.path = path
+        self.index_lock = threading.Lock()
+        self.file_lock = threading.Lock()
+        self.by_day = {}  # yyyymmdd -> {worked_key: ActivationInfo}
+        self.days_by_key = {}  # worked_key -> set of yyyymmdd
+        self.pending_lines = []
+        self.dead_records = 0
+        self.stop_event = threading.Event()
+        self.load()
+        self.flusher = threading.Thread(target=self.run_flusher, name="worked-log", daemon=True)
+        self.flusher.start()
+
+    def load(self):
+        if not os.path.exists(self.path):
+            self.migrate_history_file()
+            return
+        records = 0
+        with open(self.path) as log_file:
+            for line in log_file:
+                line = line.strip()
+                if not line:
+                    continue
+                records += 1
+                try:
+                    spot = ActivationInfo.from_string(line[2:])
+                except (TypeError, ValueError, IndexError) as e:
+                    logger.warning("Skipping invalid line in %s: %s %s", self.path, line, e)
+                    continue
+                if line[0] == ADDED:
+                    self.index_add(spot)
+                elif line[0] == REMOVED:
+                    self.index_remove(spot, spot.worked_day)
+        self.dead_records = records - self.count_live()
+        logger.info("%d worked spots over %d days in %s", self.count_live(), len(self.by_day), self.path)
+
+    def migrate_history_file(self):
+        for spot in load_worked_history():
+            self.add(spot)
+
+    def count_live(self) -> int:
+        return sum(len(spots) for spots in self.by_day.values())
+
+    def index_add(self, spot: ActivationInfo):
+        day_spots = self.by_day.setdefault(spot.worked_day, {})
+        key = spot.worked_key()
+        if key in day_spots:
+            self.dead_records += 1  # superseded
+        day_spots[key] = spot
+        self.days_by_key.setdefault(key, set()).add(spot.worked_day)
+
+    def index_remove(self, spot: ActivationInfo, day: str) -> bool:
+        key = spot.worked_key()
+        day_spots = self.by_day.get(day, {})
+        if key not in day_spots:
+            return False
+        del day_spots[key]
+        if not day_spots:
+            del self.by_day[day]
+        days = self.days_by_key[key]
+        days.discard(day)
+        if not days:
+            del self.days_by_key[key]
+        self.dead_records += 2  # the removal and the record it cancels
+        return True
+
+    def add(self, spot: ActivationInfo):
+        """Records spot as worked on spot.worked_day"""
+        spot = spot.with_worked_day(spot.worked_day)  # the caller's spot could be changed later
+        with self.index_lock:
+            self.index_add(spot)
+            self.pending_lines.append(ADDED + "|" + spot.to_string() + "\n")
+
+    def remove(self, spot: ActivationInfo, day: str):
+        """Unmarks spot as worked on day"""
+        with self.index_lock:
+            if self.index_remove(spot, day):
+                self.pending_lines.append(REMOVED + "|" + spot.with_worked_day(day).to_string() + "\n")
+
+    def worked_today(self, spot: ActivationInfo) -> bool:
+        key = spot.worked_key()
+        today = get_yyyymmdd_now()
+        with self.index_lock:
+            return key in self.by_day.get(today, {})
+
+    def worked_ever(self, spot: ActivationInfo) -> bool:
+        key = spot.worked_key()
+        with self.index_lock:
+            return key in self.days_by_key
+
+    def days_worked(self, spot: ActivationInfo) -> List[str]:
+        key = spot.worked_key()
+        with self.index_lock:
+            return sorted(self.days_by_key.get(key, ()))
+
+    def spots_worked_on(self, day: str) -> List[ActivationInfo]:
+        with self.index_lock:
+            return list(self.by_day.get(day, {}).values())
+
+    def run_flusher(self):
+        while not self.stop_event.wait(FLUSH_INTERVAL_SECS):
+            try:
+                self.flush()
+                if self.needs_compacting():
+                    self.compact()
+            except OSError as e:
+                logger.error("Problem writing %s: %s", self.path, e)
+            except Exception as e:
+                # the thread must keep going, or marked spots would only be written at close()
+                logger.exception("Problem writing %s: %s", self.path, e)
+
+    def needs_compacting(self) -> bool:
+        with self.index_lock:
+            return self.dead_records >= COMPACT_MIN_DEAD_RECORDS and self.dead_records > self.count_live()
+
+    def flush(self):
+        """Appends the buffered records, and waits until they're on disk"""
+        with self.file_lock:
+            with self.index_lock:
+                lines = self.pending_lines
+                self.pending_lines = []
+            if not lines:
+                return
+            with open(self.path, 'a') as log_file:
+                log_file.write("".join(lines))
+                log_file.flush()
+                os.fsync(log_file.fileno())
+            logger.debug("%d worked records appended to %s", len(lines), self.path)
+
+    def compact(self):
+        """Rewrites the log with only the live records"""
+        with self.file_lock:
+            with self.index_lock:
+                # the snapshot covers anything still pending, later adds are appended to the new file
+                lines = [ADDED + "|" + spot.to_string() + "\n"
+                         for day in sorted(self.by_day) for spot in self.by_day[day].values()]
+                self.pending_lines = []
+                self.dead_records = 0
+            temp_path = self.path + ".tmp"
+            with open(temp_path, 'w') as log_file:
+                log_file.write("".join(lines))
+                log_file.flush()
+                os.fsync(log_file.fileno())
+            os.replace(temp_path, self.path)
+            logger.info("Compacted %s to %d records", self.path, len(lines))
+
+    def close(self):
+        self.stop_event.set()
+        self.flush()
 
 
 if __name__ == '__main__':
     def test_load():
-        history = load_worked_history()
-        print("Fetched history:", len(history))
+        worked_log = WorkedLog()
+        history = worked_log.spots_worked_on(get_yyyymmdd_now())
+        print("Fetched history for today:", len(history), "over", len(worked_log.by_day), "days")
         for hist_item in history:
             print(hist_item)
-
-
-    def test_save():
-        save_worked_history([])
+        worked_log.close()
 
     test_load()